@@ -1,5 +1,6 @@
 import os
 import re
+import sys
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
@@ -17,8 +18,15 @@ csv_path = os.path.join(output_folder, archivo)
 
 headers = {"User-Agent": "Mozilla/5.0"}
 
+# Caché HTTP compartida (http_cache.py está en la raíz del repositorio): el CSV y
+# las páginas ya descargados sólo se revalidan con ETag/Last-Modified
+raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, raiz)
+from http_cache import HTTP_CACHE_DIR, HTTPCache
+cache = HTTPCache(os.path.join(raiz, HTTP_CACHE_DIR))
+
 print(f"⬇️ Descargando CSV desde {url_csv}...")
-resp = requests.get(url_csv, headers=headers)
+resp = cache.get(url_csv, requests, headers=headers)
 if resp.status_code != 200:
     print(f"❌ Error {resp.status_code} al descargar el CSV.")
     exit()
@@ -60,7 +68,7 @@ for url, titulo in zip(urls, titulos):
     if not extension.lower() == ".pdf":
         print(f"🔍 Buscando PDF real en {url}...")
         try:
-            r_page = requests.get(url, headers=headers, timeout=20)
+            r_page = cache.get(url, requests, headers=headers, timeout=20)
             if r_page.status_code == 200:
                 url_page = url
                 soup = BeautifulSoup(r_page.content, "lxml")
@@ -108,3 +116,5 @@ for url, titulo in zip(urls, titulos):
         print(f"⚠️ Error al descargar {url}: {e}")
 
 print("\n🎉 Proceso completado.")
+stats = cache.stats()
+print(f"🗄️  Caché HTTP: {stats['revalidated']} sin cambios (304, {stats['bytes_saved'] / 1e6:.1f} MB no descargados) · {stats['fetched']} descargadas")
@@ -1,5 +1,6 @@
 import os
 import re
+import sys
 import requests
 import pandas as pd
 
@@ -17,8 +18,16 @@ csv_path = os.path.join(output_folder, archivo)
 
 headers = {"User-Agent": "Mozilla/5.0"}
 
+# Caché HTTP compartida (http_cache.py está en la raíz del repositorio): el CSV
+# ya descargado sólo se revalida con ETag/Last-Modified. Los papers se guardan
+# en output_folder, así que se descargan sin pasar por la caché
+raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, raiz)
+from http_cache import HTTP_CACHE_DIR, HTTPCache
+cache = HTTPCache(os.path.join(raiz, HTTP_CACHE_DIR))
+
 print(f"⬇️ Descargando CSV desde {url_csv}...")
-resp = requests.get(url_csv, headers=headers)
+resp = cache.get(url_csv, requests, headers=headers)
 if resp.status_code != 200:
     print(f"❌ Error {resp.status_code} al descargar el CSV.")
     exit()
@@ -82,3 +91,5 @@ for idx, (url, titulo) in enumerate(zip(urls, titulos), start=1):
         print(f"⚠️ Error al descargar {url}: {e}")
 
 print("\n🎉 Proceso completado.")
+stats = cache.stats()
+print(f"🗄️  Caché HTTP: {stats['revalidated']} sin cambios (304, {stats['bytes_saved'] / 1e6:.1f} MB no descargados) · {stats['fetched']} descargadas")
@@ -0,0 +1,271 @@
+"""
+Descarga concurrente y reanudable de los PDFs de PMC
+
+En vez de abrir un navegador por artículo, la URL del PDF se obtiene
+directamente del id de PMC (.../pmc/articles/PMC<id>/pdf/, como en mk3.py) y
+se descarga con metadata_harvester: un cliente HTTP con conexiones
+reutilizadas, varias descargas simultáneas, límites por servidor (NCBI pide
+3 peticiones/s) y reintentos ante 429/5xx. Nada de time.sleep fijos.
+
+Si PMC responde con una página HTML en lugar del PDF, se sigue su meta
+citation_pdf_url. Solo cuando tampoco hay enlace (páginas que exigen
+JavaScript) el artículo queda como "necesita navegador"; con --selenium esos
+pocos se descargan al final con Chrome headless.
+
+Cada resultado se añade al manifiesto (<salida>/manifest.jsonl) en cuanto
+termina: al volver a ejecutar se saltan los PDFs ya descargados que siguen en
+disco y se reintentan los fallidos y los pendientes.
+
+Uso: python DOWNLOADPAPER/descarga_pdfs_pmc.py [--csv URL_O_RUTA] [--output nasa_pdfs]
+         [--concurrency 8] [--per-host 4] [--rate 3] [--selenium] [--base-url http://127.0.0.1:8766]
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from functools import partial
+from urllib.parse import urljoin
+
+import httpx
+import pandas as pd
+from bs4 import BeautifulSoup
+from tqdm import tqdm
+
+# http_cache.py y metadata_harvester.py están en la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from http_cache import HTTP_CACHE_DIR, HTTPCache
+from metadata_harvester import USER_AGENT, Harvester, harvest_to_jsonl, rebase_url
+
+CSV_URL = "https://raw.githubusercontent.com/jgalazka/SB_publications/main/SB_publication_PMC.csv"
+PMC_PDF_URL = "https://www.ncbi.nlm.nih.gov/pmc/articles/{pmc_id}/pdf/"
+MANIFEST = 'manifest.jsonl'
+SELENIUM_TIMEOUT = 60
+
+
+class NeedsBrowser(Exception):
+    """PMC respondió con una página sin enlace directo al PDF"""
+
+
+def pmc_id(url):
+    match = re.search(r'(PMC\d+)', url)
+    return match.group(1) if match else None
+
+
+def pdf_url(article_url):
+    return PMC_PDF_URL.format(pmc_id=pmc_id(article_url))
+
+
+def es_pdf(content):
+    return content.startswith(b'%PDF')
+
+
+def enlace_pdf(html, base_url):
+    """URL absoluta del meta citation_pdf_url de una página, o None"""
+    soup = BeautifulSoup(html, 'html.parser')
+    meta = soup.find('meta', attrs={'name': 'citation_pdf_url'})
+    if meta and meta.get('content'):
+        return urljoin(base_url, meta['content'])
+    return None
+
+
+class PDFHarvester(Harvester):
+    """Harvester cuyo fetch() devuelve el PDF del artículo de PMC en lugar de su página"""
+
+    async def fetch(self, client, url):
+        target = pdf_url(url)
+        content = await super().fetch(client, target)
+        if es_pdf(content):
+            return content
+        link = enlace_pdf(content, target)
+        if link:
+            content = await super().fetch(client, link)
+            if es_pdf(content):
+                return content
+        raise NeedsBrowser(f"{target} no devuelve un PDF")
+
+
+def nombre_archivo(titulo, pmc):
+    """Título seguro como nombre de archivo + id de PMC (evita choques entre títulos repetidos)"""
+    seguro = "".join(c for c in titulo if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '_')[:100]
+    return f"{seguro}_{pmc}.pdf" if seguro else f"{pmc}.pdf"
+
+
+def guardar_pdf(content, url, carpeta, titulos):
+    """Escribe el PDF (vía .part + rename, nunca queda a medias) y devuelve su registro del manifiesto"""
+    archivo = nombre_archivo(titulos.get(url, ''), pmc_id(url))
+    ruta = os.path.join(carpeta, archivo)
+    with open(ruta + '.part', 'wb') as f:
+        f.write(content)
+    os.replace(ruta + '.part', ruta)
+    return {'file': archivo, 'bytes': len(content)}
+
+
+def leer_manifiesto(path):
+    """url -> última entrada del manifiesto ({'record': ...} o {'error': ...})"""
+    estado = {}
+    if not os.path.exists(path):
+        return estado
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # última línea cortada si el proceso murió
+            estado[entry['url']] = entry
+    return estado
+
+
+def cargar_csv(origen):
+    """CSV local o remoto (el remoto pasa por la caché HTTP y solo se revalida)"""
+    if not origen.startswith('http'):
+        return pd.read_csv(origen)
+    cache = HTTPCache(os.path.join(RAIZ, HTTP_CACHE_DIR))
+    response = cache.get(origen, httpx, headers={'User-Agent': USER_AGENT}, timeout=30, follow_redirects=True)
+    if response.status_code != 200:
+        raise RuntimeError(f"Error {response.status_code} al descargar el CSV")
+    return pd.read_csv(io.BytesIO(response.content))
+
+
+def esperar_descarga(carpeta, antes, timeout):
+    """Primer PDF nuevo y completo en `carpeta`, o None si no aparece en `timeout` segundos"""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        nuevos = set(os.listdir(carpeta)) - antes
+        pdfs = [n for n in nuevos if n.lower().endswith('.pdf')]
+        if pdfs and not any(n.endswith('.crdownload') for n in nuevos):
+            return os.path.join(carpeta, pdfs[0])
+        time.sleep(0.5)
+    return None
+
+
+def descargar_con_selenium(urls, carpeta, titulos, manifest_path, base_url=None):
+    """Último recurso: Chrome headless descarga los PDFs que exigen un navegador"""
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+    except ImportError:
+        print("   ❌ Selenium no está instalado: pip install selenium")
+        return
+
+    descargas = os.path.join(carpeta, '_selenium')
+    os.makedirs(descargas, exist_ok=True)
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_experimental_option('prefs', {
+        'download.default_directory': os.path.abspath(descargas),
+        'download.prompt_for_download': False,
+        'plugins.always_open_pdf_externally': True,
+    })
+    driver = webdriver.Chrome(options=options)
+    try:
+        with open(manifest_path, 'a', encoding='utf-8') as manifest:
+            for url in tqdm(urls):
+                target = rebase_url(pdf_url(url), base_url) if base_url else pdf_url(url)
+                antes = set(os.listdir(descargas))
+                driver.get(target)
+                descargado = esperar_descarga(descargas, antes, SELENIUM_TIMEOUT)
+                valido = False
+                if descargado:
+                    with open(descargado, 'rb') as f:
+                        valido = es_pdf(f.read(8))
+                if valido:
+                    archivo = nombre_archivo(titulos.get(url, ''), pmc_id(url))
+                    ruta = os.path.join(carpeta, archivo)
+                    shutil.move(descargado, ruta)
+                    entry = {'url': url, 'record': {'file': archivo, 'bytes': os.path.getsize(ruta), 'via': 'selenium'}}
+                else:
+                    entry = {'url': url, 'error': f"Selenium: no se descargó un PDF en {SELENIUM_TIMEOUT} s"}
+                manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                manifest.flush()
+    finally:
+        driver.quit()
+
+
+def descargar_pdfs(args):
+    print("\n" + "="*60)
+    print("📄 DESCARGA DE PDFs DE PMC")
+    print("="*60 + "\n")
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = os.path.join(args.output, MANIFEST)
+    print(f"⬇️ Leyendo lista de artículos de {args.csv}...")
+    try:
+        df = cargar_csv(args.csv)
+    except Exception as e:
+        print(f"❌ Error al leer el CSV: {e}")
+        return
+    url_col = next((c for c in df.columns if df[c].astype(str).str.contains('http', case=False, na=False).any()), None)
+    titulo_col = next((c for c in df.columns if 'title' in c.lower()), None)
+    if url_col is None:
+        print("⚠️ No se encontraron enlaces en el CSV.")
+        return
+
+    titulos = {}
+    for _, row in df.iterrows():
+        url = str(row[url_col]).strip()
+        if pmc_id(url) and url not in titulos:
+            titulos[url] = str(row[titulo_col]) if titulo_col and pd.notna(row[titulo_col]) else ''
+    sin_pmc = df[url_col].notna().sum() - df[url_col].astype(str).str.contains(r'PMC\d+').sum()
+    print(f"🌐 {len(titulos)} artículos de PMC únicos" + (f" · {sin_pmc} enlaces sin id de PMC ignorados" if sin_pmc else ""))
+
+    estado = leer_manifiesto(manifest_path)
+    hechos = {url for url, entry in estado.items()
+              if entry.get('record') and os.path.exists(os.path.join(args.output, entry['record']['file']))}
+    pendientes = [url for url in titulos if url not in hechos]
+    print(f"✅ Ya descargados: {len(titulos) - len(pendientes)} · pendientes: {len(pendientes)}\n")
+
+    if pendientes:
+        with tqdm(total=len(pendientes), unit="pdf") as progress:
+            try:
+                harvest_to_jsonl(pendientes, partial(guardar_pdf, carpeta=args.output, titulos=titulos), manifest_path,
+                                 on_progress=lambda url, error: progress.update(1), harvester_class=PDFHarvester,
+                                 concurrency=args.concurrency, per_host=args.per_host, rate=args.rate,
+                                 base_url=args.base_url)
+            except KeyboardInterrupt:
+                print("\n⏸️  Interrumpido: lo descargado está en el manifiesto, vuelve a ejecutar para continuar")
+
+    estado = leer_manifiesto(manifest_path)
+    navegador = [url for url in titulos
+                 if estado.get(url, {}).get('error', '').startswith(NeedsBrowser.__name__)]
+    if navegador and args.selenium:
+        print(f"\n🌐 {len(navegador)} artículos necesitan navegador: descargando con Selenium...")
+        descargar_con_selenium(navegador, args.output, titulos, manifest_path, base_url=args.base_url)
+        estado = leer_manifiesto(manifest_path)
+        navegador = [url for url in navegador if not estado[url].get('record')]
+
+    hechos = [url for url in titulos if estado.get(url, {}).get('record')]
+    fallidos = [url for url in titulos if 'error' in estado.get(url, {}) and url not in navegador]
+    sin_intentar = len(titulos) - len(hechos) - len(fallidos) - len(navegador)
+    total_mb = sum(estado[url]['record']['bytes'] for url in hechos) / (1024 * 1024)
+
+    print("\n" + "="*60)
+    print("📊 RESUMEN DE DESCARGA")
+    print("="*60)
+    print(f"✅ Descargados:          {len(hechos)} ({total_mb:.1f} MB)")
+    print(f"❌ Fallidos:             {len(fallidos)}")
+    print(f"🌐 Necesitan navegador:  {len(navegador)}" + (" (usa --selenium)" if navegador and not args.selenium else ""))
+    print(f"⏳ Pendientes:           {sin_intentar}")
+    print(f"📁 Archivos en:          {os.path.abspath(args.output)}")
+    print(f"🧾 Manifiesto:           {manifest_path}")
+    for url in fallidos[:10]:
+        print(f"   • {url}: {estado[url]['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga concurrente y reanudable de los PDFs de PMC")
+    parser.add_argument("--csv", default=CSV_URL, help="CSV (ruta o URL) con títulos y enlaces de PMC")
+    parser.add_argument("--output", default="nasa_pdfs", help="Carpeta de los PDFs y del manifiesto")
+    parser.add_argument("--concurrency", type=int, default=8, help="Descargas simultáneas en total")
+    parser.add_argument("--per-host", type=int, default=4, help="Descargas simultáneas por servidor")
+    parser.add_argument("--rate", type=float, default=3.0, help="Peticiones por segundo por servidor")
+    parser.add_argument("--selenium", action="store_true", help="Usar Chrome headless para los que lo necesiten")
+    parser.add_argument("--base-url", default=None, help="Descargar de otro servidor (p. ej. mock_pmc_server.py)")
+    descargar_pdfs(parser.parse_args())
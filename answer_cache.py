@@ -0,0 +1,98 @@
+"""
+Semantic cache of chatbot answers
+
+Paraphrased questions ("How does microgravity affect plants?" / "plant growth
+in microgravity") retrieve the same papers and deserve the same answer. An
+entry stores the question embedding, the ids of the papers packed into the
+context and the answer. A new question reuses an answer when both hold:
+
+- same mode (academic / outreach) and exactly the same source set, so the
+  answer was written from the context the new question would get
+- cosine similarity with the cached question >= threshold
+
+Entries expire after `ttl` seconds and the least recently used are evicted
+beyond `max_entries`. One instance is shared by every session (the app wraps
+it in st.cache_resource), so access is guarded by a lock.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_THRESHOLD = 0.85
+ANSWER_CACHE_TTL = 24 * 3600
+ANSWER_CACHE_SIZE = 1000
+
+
+class AnswerCache:
+    """Thread-safe TTL + LRU cache of answers keyed on (mode, sources, question embedding)"""
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, now):
+        # Insertion order is refreshed on every hit, so expired entries can be
+        # anywhere; the cache is small enough to sweep
+        expired = [key for key, entry in self._entries.items() if now - entry['created'] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, mode, embedding, source_ids):
+        """
+        Best cached entry for a question with unit-norm `embedding` and packed
+        sources `source_ids`, or None. Entries are dicts with 'question',
+        'answer', 'similarity'.
+        """
+        sources = frozenset(source_ids)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            best_key, best_score = None, self.threshold
+            for key, entry in self._entries.items():
+                if entry['mode'] != mode or entry['sources'] != sources:
+                    continue
+                score = float(np.dot(entry['embedding'], embedding))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            return {'question': entry['question'], 'answer': entry['answer'], 'similarity': best_score}
+
+    def put(self, mode, embedding, source_ids, question, answer):
+        with self._lock:
+            self._entries[self._next_id] = {
+                'mode': mode,
+                'sources': frozenset(source_ids),
+                'embedding': np.asarray(embedding, dtype=np.float32),
+                'question': question,
+                'answer': answer,
+                'created': time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -1,15 +1,30 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 from sentence_transformers import SentenceTransformer
 from groq import Groq
 import os
 from dotenv import load_dotenv
-import json
 import plotly.express as px
 import plotly.graph_objects as go
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import queue
 import re
+import threading
+from search_kernel import HNSW_DEFAULT_EF_SEARCH
+from ivfpq_index import IVFPQ_DEFAULT_NPROBE
+from corpus_bundle import BUNDLE_PATH, BundleError
+from corpus_store import KEYWORD, CorpusError, load_corpus_store
+from query_cache import QueryEmbeddingCache
+from llm_cache import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH, LLMCache
+from llm_gateway import GROQ_DEFAULT_RPM, GROQ_DEFAULT_TPM, LLMGateway
+from context_packer import CHAT_CONTEXT_TOKENS, pack_context, tokenizer_name
+from answer_cache import ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, AnswerCache
+from conversation_memory import CHAT_HISTORY_TOKENS, CHAT_MEMORY_TURNS, CHAT_SUMMARY_TOKENS, ConversationMemory
+from prompts import (COMBINED_MAX_TOKENS, COMBINED_TEMPERATURE, COMBINED_TEMPLATE_HASHES, ENTITIES_MAX_TOKENS,
+                     ENTITIES_TEMPERATURE, ENTITIES_TEMPLATE_HASH, ENTITY_FIELDS, GROQ_MODEL, SUMMARY_MAX_TOKENS,
+                     SUMMARY_TEMPERATURE, SUMMARY_TEMPLATE_HASHES, combined_prompt, entities_prompt,
+                     parse_combined, parse_entities, summary_prompt)
 
 # ============================================================================
 # INITIAL CONFIGURATION
@@ -27,15 +42,46 @@ st.set_page_config(
 # Constants
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
-GROQ_MODEL = 'llama-3.3-70b-versatile'
+EMBEDDINGS_PATH = 'data/corpus_embeddings.npy'
+SEARCH_INDEX = os.getenv('SEARCH_INDEX', 'auto')  # auto | flat | hnsw | int8 | ivfpq
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', HNSW_DEFAULT_EF_SEARCH))
+IVFPQ_NPROBE = int(os.getenv('IVFPQ_NPROBE', IVFPQ_DEFAULT_NPROBE))
+LLM_CACHE_DB = os.getenv('LLM_CACHE_PATH', LLM_CACHE_PATH)
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_MAX_ENTRIES', LLM_CACHE_MAX_ENTRIES))
+# 'separate': one completion for the summary and one for the entities (the
+# summary is streamed); 'combined': a single JSON completion per paper
+LLM_CALL_MODE = os.getenv('LLM_CALL_MODE', 'separate')
+# Sidebar filters over the precomputed entity columns (facet -> label)
+ENTITY_FILTERS = {'organism': "Filter by organism", 'condition': "Filter by space condition"}
+# Summary/entity requests in flight at once when a result page is rendered
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+# Process-wide Groq budget shared by every session (requests / tokens per minute)
+GROQ_RPM = float(os.getenv('GROQ_RPM', GROQ_DEFAULT_RPM))
+GROQ_TPM = float(os.getenv('GROQ_TPM', GROQ_DEFAULT_TPM))
+# Chatbot: papers retrieved per question, packed best-first into a token budget
+CHAT_CANDIDATES = int(os.getenv('CHAT_CANDIDATES', 8))
+CHAT_CONTEXT_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKENS', CHAT_CONTEXT_TOKENS))
+CHAT_MAX_TOKENS = int(os.getenv('CHAT_MAX_TOKENS', 1000))
+# Earlier turns sent with each chat question (summary + newest verbatim turns)
+CHAT_HISTORY_BUDGET = int(os.getenv('CHAT_HISTORY_TOKENS', CHAT_HISTORY_TOKENS))
+# Paraphrased chat questions with the same sources reuse a previous answer
+ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv('ANSWER_CACHE_THRESHOLD', ANSWER_CACHE_THRESHOLD))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv('ANSWER_CACHE_TTL', ANSWER_CACHE_TTL))
+ANSWER_CACHE_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', ANSWER_CACHE_SIZE))
+
+# Quick-example buttons in the Search tab; also pre-encoded at startup
+EXAMPLE_QUERIES = {
+    "💡 Radiation & DNA": "effects of space radiation on DNA",
+    "🌱 Plants in space": "experiments with plants in microgravity",
+    "🧬 Immune system": "changes in astronaut immune system",
+    "🔬 C. elegans": "C elegans studies in space",
+}
 
 # Configure Groq
 if not GROQ_API_KEY:
     st.error("⚠️ GROQ_API_KEY not found in .env file")
     st.stop()
 
-groq_client = Groq(api_key=GROQ_API_KEY)
-
 # ============================================================================
 # CACHE FUNCTIONS
 # ============================================================================
@@ -45,17 +91,48 @@ def load_embedding_model():
     with st.spinner("🤖 Loading embedding model..."):
         return SentenceTransformer(EMBEDDING_MODEL)
 
-@st.cache_data
-def load_data():
+@st.cache_resource
+def load_query_cache():
+    """LRU of query embeddings shared by all sessions, warmed with the examples"""
+    cache = QueryEmbeddingCache(load_embedding_model(), EMBEDDING_MODEL)
+    cache.warm(EXAMPLE_QUERIES.values())
+    return cache
+
+@st.cache_resource
+def load_llm_cache():
+    """On-disk cache of summaries and entities shared by all sessions"""
+    cache = LLMCache(LLM_CACHE_DB, max_entries=LLM_CACHE_SIZE)
+    # Results of edited prompt templates can never be hit again
+    cache.drop_stale('summary', SUMMARY_TEMPLATE_HASHES.values())
+    cache.drop_stale('entities', [ENTITIES_TEMPLATE_HASH])
+    cache.drop_stale('combined', COMBINED_TEMPLATE_HASHES.values())
+    return cache
+
+@st.cache_resource
+def load_llm_gateway():
+    """Rate-limited, retrying, coalescing Groq access shared by all sessions"""
+    # Retries are done by the gateway (with backoff), not by the SDK
+    return LLMGateway(Groq(api_key=GROQ_API_KEY, max_retries=0), rpm=GROQ_RPM, tpm=GROQ_TPM)
+
+@st.cache_resource
+def load_answer_cache():
+    """Chatbot answers shared by all sessions, reused for paraphrased questions"""
+    return AnswerCache(ANSWER_CACHE_MIN_SIMILARITY, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_ENTRIES)
+
+@st.cache_resource
+def load_corpus():
+    """Process-wide, read-only corpus shared by every session (no per-call copies)"""
     try:
-        df = pd.read_csv('data/publicaciones.csv')
-        embeddings = np.load('data/corpus_embeddings.npy')
-        
-        if len(df) != len(embeddings):
-            st.error("❌ Error: Number of publications doesn't match embeddings")
-            st.stop()
-        
-        return df, embeddings
+        return load_corpus_store('data/publicaciones.csv', EMBEDDINGS_PATH, BUNDLE_PATH,
+                                 EMBEDDING_MODEL, index_kind=SEARCH_INDEX, ef_search=HNSW_EF_SEARCH,
+                                 nprobe=IVFPQ_NPROBE)
+    except BundleError as e:
+        st.error(f"❌ Error: Invalid corpus bundle. {str(e)}")
+        st.info("Rebuild it with `python corpus_bundle.py` or delete it to use the CSV.")
+        st.stop()
+    except CorpusError as e:
+        st.error(f"❌ Error: {str(e)}")
+        st.stop()
     except FileNotFoundError as e:
         st.error(f"❌ Error: Data files not found. {str(e)}")
         st.info("""
@@ -69,23 +146,19 @@ def load_data():
 # SEARCH FUNCTIONS
 # ============================================================================
 
-def semantic_search(query, top_k=5):
-    model = load_embedding_model()
-    df, corpus_embeddings = load_data()
-    
-    query_embedding = model.encode(query, convert_to_tensor=False)
+def semantic_search(query, top_k=5, filters=None):
+    corpus = load_corpus()
     
-    similarities = np.dot(corpus_embeddings, query_embedding) / (
-        np.linalg.norm(corpus_embeddings, axis=1) * np.linalg.norm(query_embedding)
-    )
-    
-    top_indices = np.argsort(similarities)[::-1][:top_k]
-    top_scores = similarities[top_indices]
+    # BM25 + dense fusion; the transformer only runs when the lexical match isn't decisive.
+    # Facet filters ({'year': [...], 'authors': [...]}) restrict the rows before scoring
+    hits = corpus.hybrid_search(query, top_k, encode=load_query_cache().get, filters=filters)
     
     results = []
-    for idx, score in zip(top_indices, top_scores):
-        result = df.iloc[idx].to_dict()
+    for idx, score, kind in hits:
+        result = corpus.row(idx)
         result['similarity_score'] = float(score)
+        # Keyword-only answers carry a BM25 score relative to the best match, not a cosine
+        result['score_label'] = "Keyword match" if kind == KEYWORD else "Similarity"
         results.append(result)
     
     return results
@@ -94,103 +167,215 @@ def semantic_search(query, top_k=5):
 # AI FUNCTIONS WITH GROQ
 # ============================================================================
 
-def generate_summary(text, title, mode="academic"):
-    """Generate summary using Groq/Llama"""
+def paper_id(result):
+    """Stable id of a paper for the LLM cache (duplicated rows share it)"""
+    return result.get('source_url') or result.get('title', '')
+
+def stream_completion(messages, temperature, max_tokens, cancel=None, gateway=None):
+    """
+    Yield the text deltas of a streaming Groq completion (through the gateway).
+    
+    Stops early when `cancel` (a threading.Event) is set; the subscription is
+    closed either way, including when the consumer stops iterating (a
+    Streamlit rerun closes the generator), and the HTTP stream with it once no
+    other session shares the same request.
+    """
+    if gateway is None:
+        gateway = load_llm_gateway()
+    chunks = gateway.stream(
+        model=GROQ_MODEL,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    try:
+        for delta in chunks:
+            if cancel is not None and cancel.is_set():
+                break
+            yield delta
+    finally:
+        chunks.close()
+
+def generate_summary(text, title, mode="academic", paper=None, llm_cache=None, gateway=None, on_token=None,
+                     cancel=None):
+    """
+    Generate summary using Groq/Llama (cached per paper, mode and prompt template).
+    
+    The completion is streamed: `on_token(text_so_far)` is called as tokens
+    arrive. Only complete summaries are cached, not cancelled or failed ones.
+    """
     
     if not text or len(text.strip()) < 50:
         return "⚠️ Abstract too short or unavailable to generate summary."
     
-    # Truncate text
-    max_chars = 2500
-    if len(text) > max_chars:
-        text = text[:max_chars] + "..."
+    if llm_cache is None:
+        llm_cache = load_llm_cache()
+    key = (paper or title, 'summary', mode, SUMMARY_TEMPLATE_HASHES[mode], GROQ_MODEL)
+    summary = llm_cache.get(*key)
+    if summary is not None:
+        return summary
     
-    if mode == "academic":
-        prompt = f"""You are an expert in NASA space bioscience.
-
-Title: {title}
-
-Abstract: {text}
-
-Summarize this scientific publication in 3 key points:
-1. Methodology and experimental design
-2. Main results with specific data
-3. Implications for space exploration
-
-Use precise scientific terminology. Each point: 2-3 sentences."""
-    else:  # outreach
-        prompt = f"""You are a science communicator specializing in space.
-
-Title: {title}
-
-Abstract: {text}
-
-Explain this space research for high school students in 3 simple points:
-1. What experiment was done? (as if explaining to a friend)
-2. What did they discover? (with everyday examples)
-3. Why is it important for space travel?
-
-Use simple language, analogies, and avoid technical jargon."""
-
+    summary = ""
     try:
-        response = groq_client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
-            max_tokens=600
-        )
-        return response.choices[0].message.content
+        for delta in stream_completion([{"role": "user", "content": summary_prompt(text, title, mode)}],
+                                       SUMMARY_TEMPERATURE, SUMMARY_MAX_TOKENS, cancel=cancel, gateway=gateway):
+            summary += delta
+            if on_token is not None:
+                on_token(summary)
     except Exception as e:
         return f"⚠️ Error generating summary: {str(e)}"
+    
+    if cancel is None or not cancel.is_set():
+        llm_cache.put(*key, summary)
+    return summary
 
-def extract_entities(text, title):
-    """Extract entities using Groq/Llama"""
+def extract_entities(text, title, paper=None, llm_cache=None, gateway=None):
+    """
+    Extract entities using Groq/Llama (cached per paper and prompt template).
     
-    max_chars = 1500
-    if len(text) > max_chars:
-        text = text[:max_chars] + "..."
+    On failure the fields are "N/A" and 'error' holds the reason, which
+    render_entities shows; failures are not cached.
+    """
+    if gateway is None:
+        gateway = load_llm_gateway()
     
-    prompt = f"""Analyze this scientific text about space biology.
-
-Title: {title}
-
-Text: {text}
-
-Extract in JSON format:
-- "organism": Organism studied
-- "condition": Space condition (microgravity, radiation, etc.)
-- "key_finding": Main finding (max 15 words)
-- "methodology": Method used
-
-If info is missing, use "Not specified".
-Respond ONLY with JSON, no markdown."""
-
-    try:
-        response = groq_client.chat.completions.create(
+    def create():
+        response = gateway.complete(
             model=GROQ_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=300
+            messages=[{"role": "user", "content": entities_prompt(text, title)}],
+            temperature=ENTITIES_TEMPERATURE,
+            max_tokens=ENTITIES_MAX_TOKENS
         )
         
-        content = response.choices[0].message.content.strip()
-        content = content.replace('```json', '').replace('```', '').strip()
-        
-        return json.loads(content)
-    except:
-        return {
-            "organism": "N/A",
-            "condition": "N/A",
-            "key_finding": "Not available",
-            "methodology": "N/A"
-        }
-
-def generate_chat_response(prompt, context, mode="academic"):
-    """Generate chat response using Groq/Llama"""
-    
-    max_context = 4000
-    if len(context) > max_context:
-        context = context[:max_context] + "\n...(more papers available)"
+        return parse_entities(response.choices[0].message.content)
+    
+    if llm_cache is None:
+        llm_cache = load_llm_cache()
+    try:
+        return llm_cache.get_or_create(paper or title, 'entities', '', ENTITIES_TEMPLATE_HASH,
+                                       GROQ_MODEL, create)
+    except ValueError as e:
+        error = f"Invalid answer from the model ({str(e)[:100]})"
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)[:150]}"
+    return {
+        "organism": "N/A",
+        "condition": "N/A",
+        "key_finding": "Not available",
+        "methodology": "N/A",
+        "error": error
+    }
+
+def run_llm_task(task_id, call, streaming, events, cancel):
+    """Pool worker: forward streamed text and the final value of `call` to the script thread"""
+    value = None
+    try:
+        if streaming:
+            value = call(on_token=lambda text: events.put((task_id, text, False)), cancel=cancel)
+        else:
+            value = call()
+    finally:
+        events.put((task_id, value, True))
+
+def drain_events(events):
+    """Wait for one (task_id, value, done) event, then take all others already queued"""
+    batch = [events.get()]
+    while True:
+        try:
+            batch.append(events.get_nowait())
+        except queue.Empty:
+            return batch
+
+def generate_summary_and_entities(text, title, mode="academic", paper=None, llm_cache=None, gateway=None):
+    """
+    Summary and entities from a single JSON completion (LLM_CALL_MODE=combined).
+    
+    The answer is validated against the expected schema; when the call fails
+    or the answer doesn't validate, the two separate calls are made instead.
+    Returns {'summary': str, 'entities': dict}.
+    """
+    if llm_cache is None:
+        llm_cache = load_llm_cache()
+    if gateway is None:
+        gateway = load_llm_gateway()
+    
+    def create():
+        response = gateway.complete(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": combined_prompt(text, title, mode)}],
+            temperature=COMBINED_TEMPERATURE,
+            max_tokens=COMBINED_MAX_TOKENS,
+            response_format={"type": "json_object"}
+        )
+        summary, entities = parse_combined(response.choices[0].message.content)
+        return {'summary': summary, 'entities': entities}
+    
+    if text and len(text.strip()) >= 50:
+        try:
+            return llm_cache.get_or_create(paper or title, 'combined', mode, COMBINED_TEMPLATE_HASHES[mode],
+                                           GROQ_MODEL, create)
+        except Exception:
+            pass
+    return {'summary': generate_summary(text, title, mode, paper=paper, llm_cache=llm_cache, gateway=gateway),
+            'entities': extract_entities(text, title, paper=paper, llm_cache=llm_cache, gateway=gateway)}
+
+def result_llm_tasks(result, mode, summary_placeholder, entities_placeholder, llm_cache, gateway):
+    """
+    (placeholder, render, call, streaming) tasks for one result; a None
+    placeholder means that part is hidden or already rendered
+    """
+    text, title, paper = result.get('abstract_text', ''), result['title'], paper_id(result)
+    if summary_placeholder is not None and entities_placeholder is not None and LLM_CALL_MODE == 'combined':
+        return [((summary_placeholder, entities_placeholder), render_combined,
+                 partial(generate_summary_and_entities, text, title, mode, paper=paper, llm_cache=llm_cache,
+                         gateway=gateway), False)]
+    
+    tasks = []
+    if summary_placeholder is not None:
+        tasks.append((summary_placeholder, render_summary,
+                      partial(generate_summary, text, title, mode, paper=paper, llm_cache=llm_cache,
+                              gateway=gateway), True))
+    if entities_placeholder is not None:
+        tasks.append((entities_placeholder, render_entities,
+                      partial(extract_entities, text, title, paper=paper, llm_cache=llm_cache,
+                              gateway=gateway), False))
+    return tasks
+
+def precomputed_entities(result):
+    """Entities stored by extract_entities_batch.py for this result, if any"""
+    if not isinstance(result.get('organism'), str):
+        return None
+    return {field: result.get(field) if isinstance(result.get(field), str) else "Not specified"
+            for field in ENTITY_FIELDS}
+
+def render_summary(placeholder, summary):
+    placeholder.write(summary)
+
+def render_combined(placeholders, value):
+    summary_placeholder, entities_placeholder = placeholders
+    render_summary(summary_placeholder, value['summary'])
+    render_entities(entities_placeholder, value['entities'])
+
+def render_entities(placeholder, entities):
+    with placeholder.container():
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("🔬 Organism", entities.get('organism', 'N/A'))
+            st.metric("🌌 Condition", entities.get('condition', 'N/A'))
+        with col2:
+            st.metric("🔬 Methodology", entities.get('methodology', 'N/A'))
+            st.markdown(f"**💡 Finding:** {entities.get('key_finding', 'N/A')}")
+        if entities.get('error'):
+            st.warning(f"⚠️ Entity extraction failed: {entities['error']}")
+
+def generate_chat_response(prompt, context, mode="academic", n_papers=3, history=None):
+    """
+    Stream a chat response using Groq/Llama (a generator of text chunks for st.write_stream).
+    
+    `context` is already packed within the token budget (context_packer) and
+    holds `n_papers` papers; `history` are earlier messages of the
+    conversation (ConversationMemory.history).
+    """
     
     if mode == "academic":
         system_prompt = f"""You are an expert researcher in NASA space biology with access to 607 scientific papers.
@@ -199,7 +384,7 @@ Most relevant papers for this query:
 {context}
 
 INSTRUCTIONS:
-- These are only 3 examples of the 607 available papers
+- These are only {n_papers} examples of the 607 available papers
 - Cite specific papers: "According to Paper 1..."
 - If papers are not relevant, suggest rephrasing the question
 - Use precise scientific terminology
@@ -211,25 +396,26 @@ Most relevant papers:
 {context}
 
 INSTRUCTIONS:
-- These are 3 examples of the 607 available papers
+- These are {n_papers} examples of the 607 available papers
 - Respond in a friendly and clear manner
 - Use analogies when possible
 - Be enthusiastic and educational"""
     
     try:
-        response = groq_client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=1000
-        )
-        
-        return response.choices[0].message.content
+        yield from stream_completion([
+            {"role": "system", "content": system_prompt},
+            *(history or []),
+            {"role": "user", "content": prompt}
+        ], temperature=0.5, max_tokens=CHAT_MAX_TOKENS)
     except Exception as e:
-        return f"⚠️ Error: {str(e)[:150]}"
+        yield f"⚠️ Error: {str(e)[:150]}"
+
+def render_sources(sources):
+    if sources:
+        with st.expander("📚 Sources consulted"):
+            for source in sources:
+                st.markdown(f"**• {source['title']}** ({source['year']})")
+                st.caption(f"Authors: {source['authors']}")
 
 def generate_citation(result, format="apa7"):
     """Generate citation in different formats"""
@@ -266,6 +452,21 @@ def generate_citation(result, format="apa7"):
 # VISUALIZATIONS
 # ============================================================================
 
+def create_entity_distribution(counts, title, top=15):
+    """Horizontal bar chart of the most frequent values of an entity facet"""
+    values = list(counts)[:top][::-1]
+    fig = px.bar(
+        x=[counts[v] for v in values],
+        y=values,
+        orientation='h',
+        title=title,
+        labels={'x': 'Number of Publications', 'y': ''},
+        color=[counts[v] for v in values],
+        color_continuous_scale='Purples'
+    )
+    fig.update_layout(showlegend=False, coloraxis_showscale=False, height=450)
+    return fig
+
 def create_year_distribution(df):
     """Chart of distribution by years"""
     year_counts = df['year'].value_counts().sort_index()
@@ -307,7 +508,9 @@ def main():
     Semantic search · Automatic summaries · Entity extraction
     """)
     
-    df, embeddings = load_data()
+    corpus = load_corpus()
+    df = corpus.metadata
+    query_cache = load_query_cache()
     
     with st.sidebar:
         st.header("⚙️ Configuration")
@@ -333,11 +536,22 @@ def main():
         st.divider()
         
         st.subheader("🔍 Filters")
-        years = df['year'].dropna().unique()
+        years = corpus.facets.values('year')
         if len(years) > 0:
-            year_filter = st.multiselect("Filter by year", options=sorted(years, reverse=True), default=[])
+            year_filter = st.multiselect("Filter by year", options=years[::-1], default=[])
         else:
             year_filter = []
+        authors = corpus.facets.values('authors', by_count=True)
+        if len(authors) > 0:
+            author_filter = st.multiselect("Filter by author", options=authors, default=[])
+        else:
+            author_filter = []
+        search_filters = {'year': year_filter, 'authors': author_filter}
+        # Precomputed by extract_entities_batch.py
+        for facet, label in ENTITY_FILTERS.items():
+            if facet in corpus.facets:
+                search_filters[facet] = st.multiselect(label, options=corpus.facets.values(facet, by_count=True),
+                                                       default=[])
         
         st.divider()
         
@@ -346,9 +560,23 @@ def main():
         - **Total publications**: {len(df):,}
         - **LLM Model**: Llama 3.3 70B
         - **Embeddings**: MiniLM-L6-v2
-        - **Dimension**: {embeddings.shape[1]}D
+        - **Dimension**: {corpus.dimension}D
         """)
         
+        cache_stats = query_cache.stats()
+        st.caption(f"⚡ Query cache: {cache_stats['hit_rate']:.0%} hit rate "
+                   f"({cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses, {cache_stats['size']:,} cached)")
+        llm_stats = load_llm_cache().stats()
+        st.caption(f"🧠 LLM cache: {llm_stats['hit_rate']:.0%} hit rate "
+                   f"({llm_stats['hits']:,} hits / {llm_stats['misses']:,} misses, {llm_stats['size']:,} stored)")
+        answer_stats = load_answer_cache().stats()
+        st.caption(f"💬 Answer cache: {answer_stats['hit_rate']:.0%} hit rate "
+                   f"({answer_stats['hits']:,} hits / {answer_stats['misses']:,} misses, {answer_stats['size']:,} stored)")
+        gateway_stats = load_llm_gateway().stats()
+        st.caption(f"🚦 Groq gateway: {gateway_stats['sent']:,} sent, {gateway_stats['coalesced']:,} coalesced, "
+                   f"{gateway_stats['retries']:,} retries · queue p50 {gateway_stats['queue_delay_p50']:.1f} s / "
+                   f"p95 {gateway_stats['queue_delay_p95']:.1f} s")
+        
         with st.expander("📖 Scientific Glossary"):
             for term, definition in GLOSSARY.items():
                 st.markdown(f"**{term}**: {definition}")
@@ -368,27 +596,14 @@ def main():
         query = st.text_input("What do you want to research?", placeholder="e.g., effects of microgravity on plants")
         
         st.markdown("**Quick examples:**")
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            if st.button("💡 Radiation & DNA", use_container_width=True):
-                query = "effects of space radiation on DNA"
-        with col2:
-            if st.button("🌱 Plants in space", use_container_width=True):
-                query = "experiments with plants in microgravity"
-        with col3:
-            if st.button("🧬 Immune system", use_container_width=True):
-                query = "changes in astronaut immune system"
-        with col4:
-            if st.button("🔬 C. elegans", use_container_width=True):
-                query = "C elegans studies in space"
+        for col, (label, example) in zip(st.columns(len(EXAMPLE_QUERIES)), EXAMPLE_QUERIES.items()):
+            with col:
+                if st.button(label, use_container_width=True):
+                    query = example
         
         if query and len(query.strip()) > 0:
             with st.spinner("🔎 Searching..."):
-                results = semantic_search(query, top_k=top_k)
-            
-            if year_filter:
-                results = [r for r in results if r.get('year') in year_filter]
+                results = semantic_search(query, top_k=top_k, filters=search_filters)
             
             if not results:
                 st.warning("⚠️ No results found")
@@ -407,8 +622,13 @@ def main():
             
             st.divider()
             
+            # Lay out every result first and collect its LLM calls: (placeholder, render, call, streaming)
+            llm_cache = load_llm_cache()
+            llm_gateway = load_llm_gateway()
+            llm_tasks = []
             for i, result in enumerate(results, 1):
-                with st.expander(f"**{i}. {result['title']}** · Similarity: {result['similarity_score']:.1%}", expanded=(i == 1)):
+                summary_placeholder = entities_placeholder = None
+                with st.expander(f"**{i}. {result['title']}** · {result['score_label']}: {result['similarity_score']:.1%}", expanded=(i == 1)):
                     col1, col2, col3 = st.columns([2, 1, 1])
                     with col1:
                         st.markdown(f"**✍️ Authors:** {result.get('authors', 'N/A')}")
@@ -422,7 +642,7 @@ def main():
                     
                     st.divider()
                     
-                    # Summary
+                    # Summary (filled in below, once its LLM call returns)
                     if show_summary:
                         st.markdown("### 📝 AI-Generated Summary")
                         if mode == "outreach":
@@ -430,34 +650,24 @@ def main():
                         
                         summary_placeholder = st.empty()
                         summary_placeholder.info("⏳ Generating summary...")
-                        
-                        summary = generate_summary(result.get('abstract_text', ''), result['title'], mode)
-                        
-                        summary_placeholder.empty()
-                        st.write(summary)
                         st.divider()
                     
-                    # Entities
+                    # Entities (precomputed ones need no LLM call)
                     if show_entities:
                         st.markdown("### 🏷️ Extracted Entities")
                         
                         entities_placeholder = st.empty()
-                        entities_placeholder.info("⏳ Extracting entities...")
-                        
-                        entities = extract_entities(result.get('abstract_text', ''), result['title'])
-                        
-                        entities_placeholder.empty()
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("🔬 Organism", entities.get('organism', 'N/A'))
-                            st.metric("🌌 Condition", entities.get('condition', 'N/A'))
-                        with col2:
-                            st.metric("🔬 Methodology", entities.get('methodology', 'N/A'))
-                            st.markdown(f"**💡 Finding:** {entities.get('key_finding', 'N/A')}")
-                        
+                        entities = precomputed_entities(result)
+                        if entities is not None:
+                            render_entities(entities_placeholder, entities)
+                            entities_placeholder = None
+                        else:
+                            entities_placeholder.info("⏳ Extracting entities...")
                         st.divider()
                     
+                    llm_tasks.extend(result_llm_tasks(result, mode, summary_placeholder, entities_placeholder,
+                                                      llm_cache, llm_gateway))
+                    
                     # Citations
                     if show_citation:
                         st.markdown("### 📚 Citations")
@@ -471,6 +681,32 @@ def main():
                     
                     with st.expander("📄 View full abstract"):
                         st.write(result.get('abstract_text', 'Not available'))
+            
+            # All summary/entity calls run concurrently (bounded pool). Workers
+            # push streamed text and final values onto a queue; placeholders are
+            # filled from this thread as events arrive
+            if llm_tasks:
+                events = queue.Queue()
+                cancel = threading.Event()
+                pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY)
+                try:
+                    for task_id, (_, _, call, streaming) in enumerate(llm_tasks):
+                        pool.submit(run_llm_task, task_id, call, streaming, events, cancel)
+                    pending = len(llm_tasks)
+                    while pending:
+                        # Only the newest text of each task is rendered when chunks pile up
+                        latest = {}
+                        for task_id, value, done in drain_events(events):
+                            pending -= done
+                            if value is not None:
+                                latest[task_id] = value
+                        for task_id, value in latest.items():
+                            placeholder, render, _, _ = llm_tasks[task_id]
+                            render(placeholder, value)
+                finally:
+                    # A rerun interrupts this loop: stop the streams still in flight
+                    cancel.set()
+                    pool.shutdown(wait=False, cancel_futures=True)
         else:
             st.info("""
             👆 **Type a query above** or use the example buttons.
@@ -489,53 +725,80 @@ def main():
         st.header("💬 Space Biology Conversational Assistant")
         st.markdown(f"Ask me anything about the {len(df)} NASA papers. **Current mode:** {user_mode}")
         
-        if "messages" not in st.session_state:
-            st.session_state.messages = []
+        if "memory" not in st.session_state:
+            st.session_state.memory = ConversationMemory(CHAT_MEMORY_TURNS, CHAT_SUMMARY_TOKENS)
+        memory = st.session_state.memory
         
         col1, col2 = st.columns([6, 1])
         with col2:
             if st.button("🗑️ Clear"):
-                st.session_state.messages = []
+                memory.clear()
                 st.rerun()
         
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-                if message["role"] == "assistant" and "sources" in message:
-                    with st.expander("📚 Sources consulted"):
-                        for source in message["sources"]:
-                            st.markdown(f"**• {source['title']}** ({source['year']})")
-                            st.caption(f"Authors: {source['authors']}")
+        # Only the recent turns are kept verbatim; older ones live on as a summary
+        if memory.summary_lines:
+            with st.expander(f"🗂️ Earlier conversation ({memory.rolled} turns, summarized)"):
+                st.markdown(memory.summary)
+        
+        for turn in memory.turns:
+            with st.chat_message("user"):
+                st.markdown(turn['question'])
+            with st.chat_message("assistant"):
+                st.markdown(turn['answer'])
+                render_sources(turn['sources'])
         
         if prompt := st.chat_input("e.g., How does microgravity affect plants?"):
-            st.session_state.messages.append({"role": "user", "content": prompt})
             with st.chat_message("user"):
                 st.markdown(prompt)
             
-            with st.spinner(f"🔎 Searching {len(df)} papers..."):
-                results = semantic_search(prompt, top_k=3)
+            # Follow-ups ("why?", "what did paper 2 measure?") are answered from the same papers;
+            # anything else is searched, and only reuses them when the fresh search barely matches it
+            follow_up = memory.is_follow_up(prompt)
+            if not follow_up:
+                with st.spinner(f"🔎 Searching {len(df)} papers..."):
+                    results = semantic_search(prompt, top_k=CHAT_CANDIDATES)
+                follow_up = memory.is_follow_up(prompt, fresh_results=results)
+            if follow_up:
+                results = memory.last_results
             
-            context = ""
-            sources = []
-            for i, r in enumerate(results, 1):
-                context += f"\n[Paper {i}]\nTitle: {r['title']}\nAuthors: {r.get('authors', 'N/A')}\nYear: {r.get('year', 'N/A')}\n"
-                abstract = r.get('abstract_text', '')
-                if abstract and len(abstract) > 100:
-                    context += f"Abstract: {abstract[:800]}...\n\n"
-                sources.append({'title': r['title'], 'authors': r.get('authors', 'N/A'), 'year': r.get('year', 'N/A')})
+            # As many of the best papers as fit the token budget (whole abstracts, the last one
+            # possibly cut at a sentence boundary)
+            packed = pack_context(results, CHAT_CONTEXT_BUDGET)
+            context = packed['text']
+            sources = [{'title': r['title'], 'authors': r.get('authors', 'N/A'), 'year': r.get('year', 'N/A')}
+                       for r in packed['papers']]
             
-            with st.spinner("💭 Generating response..."):
-                assistant_response = generate_chat_response(prompt, context, mode)
+            # A paraphrase of an earlier standalone question with the same sources gets its answer
+            # back; follow-ups depend on the conversation and are never cached
+            answer_cache = load_answer_cache()
+            cached = None
+            if not follow_up:
+                question_embedding = load_query_cache().get(prompt)
+                source_ids = [paper_id(r) for r in packed['papers']]
+                cached = answer_cache.get(mode, question_embedding, source_ids)
             
             with st.chat_message("assistant"):
-                st.markdown(assistant_response)
-                if sources:
-                    with st.expander("📚 Sources consulted"):
-                        for source in sources:
-                            st.markdown(f"**• {source['title']}** ({source['year']})")
-                            st.caption(f"Authors: {source['authors']}")
+                if cached is not None:
+                    assistant_response = cached['answer']
+                    st.markdown(assistant_response)
+                else:
+                    # Rendered token by token; a rerun stops the stream and closes the request
+                    history = memory.history(CHAT_HISTORY_BUDGET)
+                    assistant_response = st.write_stream(generate_chat_response(prompt, context, mode,
+                                                                                n_papers=len(sources),
+                                                                                history=history))
+                    if not follow_up and not assistant_response.startswith("⚠️"):
+                        answer_cache.put(mode, question_embedding, source_ids, prompt, assistant_response)
+                render_sources(sources)
+                dropped = f" · {packed['dropped']} lower-ranked dropped" if packed['dropped'] else ""
+                reused = " · previous papers reused (follow-up)" if follow_up else ""
+                st.caption(f"🧮 Context: {len(sources)} papers, {packed['tokens']:,} / {CHAT_CONTEXT_BUDGET:,} "
+                           f"tokens ({tokenizer_name()}){dropped}{reused}")
+                if cached is not None:
+                    st.caption(f"⚡ Cached answer to a similar question ({cached['similarity']:.0%} similar): "
+                               f"\"{cached['question']}\"")
             
-            st.session_state.messages.append({"role": "assistant", "content": assistant_response, "sources": sources})
+            memory.add_turn(prompt, assistant_response, sources, results)
     
     # ========================================================================
     # TAB 3: VISUALIZATIONS
@@ -555,7 +818,17 @@ def main():
                 if len(years_range) > 0:
                     st.metric("📅 Year Range", f"{int(years_range.min())} - {int(years_range.max())}")
         st.divider()
-        st.info("💡 **Note**: Organism and condition visualizations require processing all papers with AI.")
+        if 'organism' in corpus.facets or 'condition' in corpus.facets:
+            col1, col2 = st.columns(2)
+            for col, facet, title in [(col1, 'organism', "🧬 Most Studied Organisms"),
+                                      (col2, 'condition', "🌌 Most Studied Space Conditions")]:
+                with col:
+                    if facet in corpus.facets:
+                        st.plotly_chart(create_entity_distribution(corpus.facets.counts(facet), title),
+                                        use_container_width=True)
+        else:
+            st.info("💡 **Note**: Organism and condition visualizations require processing all papers with AI. "
+                    "Run `python extract_entities_batch.py` once to precompute them.")
     
     # ========================================================================
     # TAB 4: EXPLORER
@@ -564,7 +837,7 @@ def main():
     with tab4:
         st.header("📚 Publications Explorer")
         st.markdown("Browse all available publications:")
-        display_cols = ['title', 'authors', 'year']
+        display_cols = ['title', 'authors', 'year', 'organism', 'condition']
         available_cols = [col for col in display_cols if col in df.columns]
         st.dataframe(df[available_cols].head(50), use_container_width=True, height=400)
         st.info(f"Showing the first 50 of {len(df)} publications")
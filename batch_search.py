@@ -0,0 +1,165 @@
+"""
+Búsqueda por lotes sin Streamlit (evaluaciones nocturnas, alertas)
+
+search_batch() usa el mismo corpus e índices que la aplicación, pero codifica
+las consultas por lotes y calcula la parte densa con un solo producto
+matriz-matriz por lote.
+
+Entrada JSONL, una consulta por línea ("id", "filters" y "top_k" opcionales):
+  {"id": "q1", "query": "bone loss in microgravity", "filters": {"year": [2014]}}
+
+Salida JSONL, una línea por consulta en el mismo orden, escrita lote a lote:
+  {"id": "q1", "query": "...", "results": [{"row": 12, "title": "...", "score": 0.71, ...}]}
+
+Uso: python batch_search.py queries.jsonl [-o resultados.jsonl] [--top-k 5] [--batch-size 256]
+     cat queries.jsonl | python batch_search.py - > resultados.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from corpus_bundle import BUNDLE_PATH
+from corpus_store import load_corpus_store
+from ivfpq_index import IVFPQ_DEFAULT_NPROBE
+from query_cache import QueryEmbeddingCache
+from search_kernel import HNSW_DEFAULT_EF_SEARCH
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+CSV_PATH = 'data/publicaciones.csv'
+EMBEDDINGS_PATH = 'data/corpus_embeddings.npy'
+# Mismas variables de entorno que appenglish.py
+SEARCH_INDEX = os.getenv('SEARCH_INDEX', 'auto')
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', HNSW_DEFAULT_EF_SEARCH))
+IVFPQ_NPROBE = int(os.getenv('IVFPQ_NPROBE', IVFPQ_DEFAULT_NPROBE))
+DEFAULT_BATCH_SIZE = 256
+
+
+@lru_cache(maxsize=None)
+def load_store():
+    return load_corpus_store(CSV_PATH, EMBEDDINGS_PATH, BUNDLE_PATH, EMBEDDING_MODEL,
+                             index_kind=SEARCH_INDEX, ef_search=HNSW_EF_SEARCH, nprobe=IVFPQ_NPROBE)
+
+
+@lru_cache(maxsize=None)
+def load_query_cache():
+    from sentence_transformers import SentenceTransformer
+    return QueryEmbeddingCache(SentenceTransformer(EMBEDDING_MODEL), EMBEDDING_MODEL)
+
+
+def _json_value(value):
+    """Escalares numpy/pandas a tipos JSON (NaN -> null)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def search_batch(queries, top_k=5, filters=None, store=None, encode_batch=None):
+    """
+    Resultados de varias consultas con los mismos filtros.
+
+    Devuelve una lista por consulta con dicts {'row', 'score', 'score_kind',
+    título, autores, año, url}, mejor primero. 'score_kind' es 'similarity'
+    (coseno) o 'keyword' (BM25 relativo al mejor resultado). `store` y
+    `encode_batch` se cargan la primera vez si no se pasan.
+    """
+    store = store or load_store()
+    encode_batch = encode_batch or load_query_cache().get_many
+    hits = store.hybrid_search_batch(list(queries), top_k, encode_batch, filters=filters)
+
+    results = []
+    for query_hits in hits:
+        records = []
+        for idx, score, kind in query_hits:
+            record = {column: _json_value(store.metadata[column].iat[idx]) for column in store.metadata.columns}
+            record['row'] = int(idx)
+            record['score'] = float(score)
+            record['score_kind'] = kind
+            records.append(record)
+        results.append(records)
+    return results
+
+
+def read_requests(lines, default_top_k):
+    """Peticiones JSONL -> dicts con id, query, filters y top_k"""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        request = json.loads(line)
+        yield {
+            'id': request.get('id', number),
+            'query': request['query'],
+            'filters': request.get('filters') or {},
+            'top_k': int(request.get('top_k', default_top_k)),
+        }
+
+
+def run_batch(requests, output):
+    """Busca un lote agrupando por (filtros, top_k) y escribe en el orden de entrada"""
+    groups = {}
+    for position, request in enumerate(requests):
+        key = (json.dumps(request['filters'], sort_keys=True), request['top_k'])
+        groups.setdefault(key, []).append(position)
+
+    results = [None] * len(requests)
+    for (_, top_k), positions in groups.items():
+        found = search_batch([requests[p]['query'] for p in positions], top_k=top_k,
+                             filters=requests[positions[0]]['filters'])
+        for position, records in zip(positions, found):
+            results[position] = records
+
+    for request, records in zip(requests, results):
+        output.write(json.dumps({'id': request['id'], 'query': request['query'], 'results': records},
+                                ensure_ascii=False) + '\n')
+    output.flush()
+
+
+def main(args):
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output is None else open(args.output, 'w', encoding='utf-8')
+
+    start = time.perf_counter()
+    load_store()
+    load_query_cache()
+    print(f"📂 Corpus e índices cargados en {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    total, batch = 0, []
+    start = time.perf_counter()
+    try:
+        for request in read_requests(source, args.top_k):
+            batch.append(request)
+            if len(batch) == args.batch_size:
+                run_batch(batch, output)
+                total += len(batch)
+                batch = []
+        if batch:
+            run_batch(batch, output)
+            total += len(batch)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    stats = load_query_cache().stats()
+    print(f"✅ {total:,} consultas en {elapsed:.1f} s ({total / max(elapsed, 1e-9):.0f} consultas/s, "
+          f"{stats['hits']:,} embeddings reutilizados)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Búsqueda por lotes: consultas JSONL -> resultados JSONL")
+    parser.add_argument("input", help="Archivo JSONL de consultas ('-' para stdin)")
+    parser.add_argument("-o", "--output", default=None, help="Archivo JSONL de salida (por defecto stdout)")
+    parser.add_argument("--top-k", type=int, default=5, help="Resultados por consulta si la línea no trae top_k")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Consultas codificadas y buscadas juntas")
+    main(parser.parse_args())
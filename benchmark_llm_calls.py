@@ -0,0 +1,114 @@
+"""
+Benchmark of the two per-paper LLM paths
+
+Compares, over a sample of papers from data/publicaciones.csv:
+
+  separate: a summary completion + an entity completion (issued concurrently,
+            as the result page does), the abstract sent twice
+  combined: one JSON completion returning both (LLM_CALL_MODE=combined)
+
+and reports requests, prompt/completion tokens (from the API usage field),
+per-paper latency percentiles and how many combined answers failed schema
+validation (those fall back to the separate path in the app). No cache is
+involved: every paper is a fresh call.
+
+Runs against Groq (GROQ_API_KEY) or the local fake endpoint:
+
+    python mock_groq_server.py &
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=mock python benchmark_llm_calls.py
+
+Usage: python benchmark_llm_calls.py [--papers 20] [--mode academic|outreach]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from groq import Groq
+
+from prompts import (COMBINED_MAX_TOKENS, COMBINED_TEMPERATURE, ENTITIES_MAX_TOKENS, ENTITIES_TEMPERATURE,
+                     GROQ_MODEL, SUMMARY_MAX_TOKENS, SUMMARY_TEMPERATURE, combined_prompt, entities_prompt,
+                     parse_combined, parse_entities, summary_prompt)
+
+CSV_PATH = 'data/publicaciones.csv'
+
+
+def complete(client, prompt, temperature, max_tokens, json_mode=False):
+    """(content, prompt tokens, completion tokens) of one non-streamed completion"""
+    extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+    response = client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        **extra
+    )
+    usage = response.usage
+    return response.choices[0].message.content, usage.prompt_tokens, usage.completion_tokens
+
+
+def run_separate(client, pool, text, title, mode):
+    start = time.perf_counter()
+    summary = pool.submit(complete, client, summary_prompt(text, title, mode), SUMMARY_TEMPERATURE,
+                          SUMMARY_MAX_TOKENS)
+    entities = pool.submit(complete, client, entities_prompt(text, title), ENTITIES_TEMPERATURE,
+                           ENTITIES_MAX_TOKENS)
+    (_, p1, c1), (content, p2, c2) = summary.result(), entities.result()
+    failed = 0
+    try:
+        parse_entities(content)
+    except ValueError:
+        failed = 1
+    return time.perf_counter() - start, 2, p1 + p2, c1 + c2, failed
+
+
+def run_combined(client, text, title, mode):
+    start = time.perf_counter()
+    content, prompt_tokens, completion_tokens = complete(client, combined_prompt(text, title, mode),
+                                                         COMBINED_TEMPERATURE, COMBINED_MAX_TOKENS, json_mode=True)
+    failed = 0
+    try:
+        parse_combined(content)
+    except ValueError:
+        failed = 1
+    return time.perf_counter() - start, 1, prompt_tokens, completion_tokens, failed
+
+
+def report(name, rows):
+    latencies = np.array([r[0] for r in rows]) * 1000
+    requests, prompt_tokens, completion_tokens, failed = (sum(r[i] for r in rows) for i in range(1, 5))
+    print(f"{name:>9} | {requests:>8} | {prompt_tokens:>13,} | {completion_tokens:>17,} | "
+          f"{np.percentile(latencies, 50):>7.0f} | {np.percentile(latencies, 95):>7.0f} | {failed:>8}")
+
+
+def main(args):
+    load_dotenv()
+    client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+    df = pd.read_csv(CSV_PATH)
+    df = df[df['abstract_text'].fillna('').str.len() >= 50].head(args.papers)
+
+    print("=" * 86)
+    print(f"🤖 LLM CALL BENCHMARK  model={GROQ_MODEL}  papers={len(df)}  mode={args.mode}")
+    print("=" * 86)
+    print(f"{'path':>9} | {'requests':>8} | {'prompt tokens':>13} | {'completion tokens':>17} | "
+          f"{'p50 ms':>7} | {'p95 ms':>7} | {'invalid':>8}")
+    print("-" * 86)
+
+    separate, combined = [], []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        for text, title in zip(df['abstract_text'], df['title']):
+            separate.append(run_separate(client, pool, text, title, args.mode))
+            combined.append(run_combined(client, text, title, args.mode))
+    report("separate", separate)
+    report("combined", combined)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark separate vs combined summary + entity calls")
+    parser.add_argument("--papers", type=int, default=20)
+    parser.add_argument("--mode", choices=["academic", "outreach"], default="academic")
+    main(parser.parse_args())
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark of the semantic search kernel
+
+Compares the original per-query path (norm of the whole matrix + full argsort)
+with search_kernel.FlatIndex (pre-normalized matrix, one matmul, argpartition)
+on synthetic unit-norm corpora.
+
+tests/test_search_allocations.py checks that the searches of the store the
+app loads never allocate a corpus-sized buffer.
+
+Usage: python benchmark_search.py [--rows 600 100000 1000000] [--queries 50]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from search_kernel import FlatIndex
+
+DIMENSION = 384  # all-MiniLM-L6-v2
+
+
+def synthetic_corpus(rows, dim, seed=0):
+    """Random unit-norm float32 matrix, generated in chunks to limit peak memory"""
+    rng = np.random.default_rng(seed)
+    corpus = np.empty((rows, dim), dtype=np.float32)
+    chunk = 100_000
+    for start in range(0, rows, chunk):
+        block = rng.standard_normal((min(chunk, rows - start), dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        corpus[start:start + len(block)] = block
+    return corpus
+
+
+def baseline_search(corpus, query, top_k):
+    """Search path used by appenglish.semantic_search before the kernel"""
+    similarities = np.dot(corpus, query) / (
+        np.linalg.norm(corpus, axis=1) * np.linalg.norm(query)
+    )
+    top_indices = np.argsort(similarities)[::-1][:top_k]
+    return top_indices, similarities[top_indices]
+
+
+def time_per_query(fn, queries, repeat=3):
+    """Best-of-`repeat` mean latency per query, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for q in queries:
+            fn(q)
+        best = min(best, (time.perf_counter() - start) / len(queries))
+    return best * 1000
+
+
+def run(rows_list, n_queries, top_k, skip_baseline):
+    print("=" * 60)
+    print("⏱️  SEARCH KERNEL MICRO-BENCHMARK")
+    print("=" * 60)
+    print(f"dim={DIMENSION}  queries={n_queries}  top_k={top_k}\n")
+    print(f"{'rows':>10} | {'baseline ms/q':>14} | {'kernel ms/q':>12} | {'speedup':>8}")
+    print("-" * 54)
+
+    queries = synthetic_corpus(n_queries, DIMENSION, seed=1)
+
+    for rows in rows_list:
+        corpus = synthetic_corpus(rows, DIMENSION)
+        index = FlatIndex(corpus)
+
+        # Results must match the baseline before timings mean anything
+        ref_idx, _ = baseline_search(corpus, queries[0], top_k)
+        new_idx, _ = index.search(queries[0], top_k)
+        assert np.array_equal(ref_idx, new_idx[0]), "kernel and baseline disagree"
+
+        kernel_ms = time_per_query(lambda q: index.search(q, top_k), queries)
+        if skip_baseline:
+            print(f"{rows:>10,} | {'-':>14} | {kernel_ms:>12.3f} | {'-':>8}")
+        else:
+            base_ms = time_per_query(lambda q: baseline_search(corpus, q, top_k), queries, repeat=1)
+            print(f"{rows:>10,} | {base_ms:>14.3f} | {kernel_ms:>12.3f} | {base_ms / kernel_ms:>7.1f}x")
+
+        del corpus, index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[600, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--skip-baseline", action="store_true",
+                        help="Only time the kernel (the baseline needs ~2x the corpus in RAM)")
+    args = parser.parse_args()
+    run(args.rows, args.queries, args.top_k, args.skip_baseline)
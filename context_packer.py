@@ -0,0 +1,108 @@
+"""
+Token-budget packing of retrieved papers into the chatbot context
+
+Papers arrive ranked by relevance and are added whole, best first, while they
+fit in the budget. The first one that doesn't fit is cut at a sentence
+boundary if a useful excerpt still fits, and the lower-ranked rest are
+dropped. So the budget goes to as many relevant sources as possible instead
+of a fixed count.
+
+Tokens are counted with tiktoken's cl100k_base encoding when it is installed.
+The Llama 3 tokenizer extends that vocabulary, so counts are close. Without
+tiktoken (or offline, before its vocabulary is cached) it falls back to
+~4 characters per token.
+"""
+
+import re
+from functools import lru_cache
+
+from llm_gateway import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TOKENIZER_ENCODING = 'cl100k_base'
+CHAT_CONTEXT_TOKENS = 1500
+# Fewer tokens than this left for an abstract: drop it rather than cut it
+MIN_EXCERPT_TOKENS = 40
+# Abstracts shorter than this (characters) are placeholders, not content
+MIN_ABSTRACT_CHARS = 100
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        return None  # vocabulary not cached and no network
+
+
+def tokenizer_name():
+    return f"tiktoken/{TOKENIZER_ENCODING}" if _encoding() is not None else "~4 chars/token"
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_to_sentences(text, budget):
+    """Longest prefix of whole sentences of `text` within `budget` tokens ('' if none fits)"""
+    kept = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        if count_tokens(" ".join(kept + [sentence])) > budget:
+            break
+        kept.append(sentence)
+    return " ".join(kept)
+
+
+def format_paper(number, paper, abstract):
+    header = (f"\n[Paper {number}]\nTitle: {paper['title']}\nAuthors: {paper.get('authors', 'N/A')}\n"
+              f"Year: {paper.get('year', 'N/A')}\n")
+    return header + (f"Abstract: {abstract}\n\n" if abstract else "")
+
+
+def pack_context(papers, budget=CHAT_CONTEXT_TOKENS):
+    """
+    Context text for `papers` (result dicts, best first) within `budget` tokens.
+
+    Returns {'text', 'papers' (those included, in order), 'tokens',
+    'dropped' (number of papers left out), 'truncated' (last abstract cut)}.
+    """
+    text = ""
+    included = []
+    used = 0
+    truncated = False
+    for paper in papers:
+        abstract = paper.get('abstract_text') or ''
+        if len(abstract) <= MIN_ABSTRACT_CHARS:
+            abstract = ''
+        block = format_paper(len(included) + 1, paper, abstract)
+        tokens = count_tokens(block)
+        if used + tokens > budget:
+            # Cut this abstract to what is left, then stop: lower-ranked papers are dropped
+            header_tokens = count_tokens(format_paper(len(included) + 1, paper, ''))
+            room = budget - used - header_tokens
+            excerpt = trim_to_sentences(abstract, room) if room >= MIN_EXCERPT_TOKENS else ''
+            if excerpt:
+                block = format_paper(len(included) + 1, paper, excerpt + " ...")
+                tokens = count_tokens(block)
+                if used + tokens <= budget:
+                    text += block
+                    used += tokens
+                    included.append(paper)
+                    truncated = True
+            break
+        text += block
+        used += tokens
+        included.append(paper)
+    return {'text': text, 'papers': included, 'tokens': used, 'dropped': len(papers) - len(included),
+            'truncated': truncated}
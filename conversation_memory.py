@@ -0,0 +1,131 @@
+"""
+Bounded memory of one chatbot session
+
+Replaces an ever-growing list of messages in st.session_state:
+
+- the last `max_turns` turns (question, answer, sources) are kept verbatim
+  and rendered as chat messages
+- older turns are rolled into a compact summary, one line per turn (the
+  question and the first sentence of its answer), capped at `summary_tokens`
+  tokens by dropping the oldest lines; their sources are discarded
+- the results of the latest retrieval are kept so a follow-up question
+  ("why?", "what did paper 2 measure?") can reuse them instead of
+  searching again
+
+so the memory of a session stays bounded however long it runs. history()
+turns the summary and the newest turns that fit a token budget into chat
+messages for the LLM.
+"""
+
+import re
+from collections import deque
+
+from context_packer import SENTENCE_END, count_tokens
+from find_topics import build_tokenizer
+
+CHAT_MEMORY_TURNS = 6
+CHAT_SUMMARY_TOKENS = 400
+CHAT_HISTORY_TOKENS = 1200
+SUMMARY_LINE_CHARS = 300
+# Explicit references to the previous answer or its sources. "What about X?"
+# is not one: it is a follow-up only when X adds no content words ("what about
+# them?"), otherwise the fresh search decides
+FOLLOW_UP_ANAPHORA = re.compile(
+    r"^\s*(tell me more|elaborate|go on|continue|how so)\b"
+    r"|\b(paper|study|article|source|reference)\s*#?\d+\b"
+    r"|\b(the|your)\s+(above|previous|earlier|last|same)\b|\babove\s+(papers?|stud(y|ies)|answer)\b"
+    r"|\b(the\s+)?(first|second|third|last)\s+(paper|study|article|one)\b"
+    r"|\b(these|those|that|this|the same)\s+(papers?|stud(y|ies)|articles?|sources?|results|findings|experiments?)\b"
+    r"|\byou\s+(mention(ed)?|said|cited?)\b",
+    re.IGNORECASE
+)
+# Other short questions are follow-ups only when a fresh search has little to
+# say about them: few of their words in its results and a weak best match
+FOLLOW_UP_MAX_WORDS = 10
+FOLLOW_UP_MIN_TERM_OVERLAP = 0.5
+FOLLOW_UP_MIN_SIMILARITY = 0.3
+
+class ConversationMemory:
+    """Recent turns verbatim + a rolling summary of older ones + the last retrieval"""
+
+    def __init__(self, max_turns=CHAT_MEMORY_TURNS, summary_tokens=CHAT_SUMMARY_TOKENS):
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.tokenize = build_tokenizer()
+        self.clear()
+
+    def clear(self):
+        self.turns = deque()
+        self.summary_lines = deque()
+        self.rolled = 0
+        self.last_results = None
+
+    @property
+    def summary(self):
+        return "\n".join(self.summary_lines)
+
+    def add_turn(self, question, answer, sources, results=None):
+        """Record a completed turn; `results` is the retrieval it was answered from"""
+        self.turns.append({'question': question, 'answer': answer, 'sources': sources})
+        if results is not None:
+            self.last_results = results
+        while len(self.turns) > self.max_turns:
+            self._roll(self.turns.popleft())
+
+    def _roll(self, turn):
+        gist = SENTENCE_END.split(turn['answer'].strip(), maxsplit=1)[0]
+        line = f"- Q: {turn['question']} → A: {gist}"
+        if len(line) > SUMMARY_LINE_CHARS:
+            line = line[:SUMMARY_LINE_CHARS] + "..."
+        self.summary_lines.append(line)
+        self.rolled += 1
+        while len(self.summary_lines) > 1 and count_tokens(self.summary) > self.summary_tokens:
+            self.summary_lines.popleft()
+
+    def is_follow_up(self, question, fresh_results=None):
+        """
+        Whether `question` refers back to the previous answer: explicit
+        anaphora ("paper 2", "the above", "those studies"), a question with
+        no content words ("why?"), or a short question that `fresh_results`
+        (a new search for it, as returned by semantic_search) barely matches.
+        Without `fresh_results` only the first two are checked.
+        """
+        if not self.last_results:
+            return False
+        if FOLLOW_UP_ANAPHORA.search(question):
+            return True
+        terms = set(self.tokenize(question))
+        if not terms:
+            return True
+        if fresh_results is None or len(question.split()) > FOLLOW_UP_MAX_WORDS:
+            return False
+        if not fresh_results:
+            return True
+
+        found = set()
+        for result in fresh_results:
+            found.update(self.tokenize(f"{result.get('title', '')} {result.get('abstract_text', '')}"))
+        overlap = len(terms & found) / len(terms)
+        best = max(result.get('similarity_score', 0.0) for result in fresh_results)
+        return overlap < FOLLOW_UP_MIN_TERM_OVERLAP and best < FOLLOW_UP_MIN_SIMILARITY
+
+    def history(self, budget=CHAT_HISTORY_TOKENS):
+        """
+        Chat messages for the LLM: the summary (as a system message) and the
+        newest verbatim turns that fit in `budget` tokens, oldest first.
+        """
+        messages = []
+        used = 0
+        if self.summary_lines:
+            summary = f"Summary of the earlier conversation:\n{self.summary}"
+            used = count_tokens(summary)
+            messages.append({"role": "system", "content": summary})
+        recent = []
+        for turn in reversed(self.turns):
+            tokens = count_tokens(turn['question']) + count_tokens(turn['answer'])
+            if used + tokens > budget:
+                break
+            used += tokens
+            recent[:0] = [{"role": "user", "content": turn['question']},
+                          {"role": "assistant", "content": turn['answer']}]
+        return messages + recent
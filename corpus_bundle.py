@@ -0,0 +1,230 @@
+"""
+Versioned, memory-mapped corpus bundle
+
+A single file holding the publication metadata (columnar) and the embedding
+matrix, opened with mmap so several server processes share one page-cached
+copy and cold start does not parse a CSV or copy the matrix.
+
+Layout (all sections 64-byte aligned):
+
+    MAGIC (8 bytes) | version (uint32) | header length (uint32) | header JSON
+    embeddings      float32 (rows, dimension)
+    year            int32 (rows,), -1 when unknown
+    <text column>   int64 offsets (rows + 1) + UTF-8 blob, for each of
+                    title, authors, source_url, abstract_text (plus the
+                    precomputed entity columns when the CSV has them)
+
+The JSON header records model name, dimension, row count, a SHA-256 checksum
+of everything after the header, and the offset/size of every section.
+
+Usage: python corpus_bundle.py   (data/publicaciones.csv + .npy -> data/corpus.bundle)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"AVBUNDLE"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct("<8sII")
+
+TEXT_COLUMNS = ['title', 'authors', 'source_url', 'abstract_text']
+# Written by extract_entities_batch.py; stored only when present
+OPTIONAL_TEXT_COLUMNS = ['organism', 'condition', 'key_finding', 'methodology']
+BUNDLE_PATH = 'data/corpus.bundle'
+
+
+class BundleError(ValueError):
+    """The bundle is missing, corrupt or does not match what the app expects"""
+
+
+def _pad(size):
+    return (-size) % ALIGNMENT
+
+
+def _encode_text_column(values):
+    """Offsets (rows + 1, int64) and a UTF-8 blob for a column of strings"""
+    encoded = [("" if pd.isna(v) else str(v)).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def write_bundle(path, df, embeddings, model_name):
+    """Write metadata + embeddings to `path`; returns the header dict"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if len(df) != len(embeddings):
+        raise BundleError(f"{len(df)} publications but {len(embeddings)} embeddings")
+
+    years = pd.to_numeric(df['year'], errors='coerce') if 'year' in df.columns else pd.Series(np.nan, index=df.index)
+    payload = [("embeddings", embeddings.tobytes(), "float32", list(embeddings.shape)),
+               ("year", years.fillna(-1).astype(np.int32).to_numpy().tobytes(), "int32", [len(df)])]
+    text_columns = TEXT_COLUMNS + [c for c in OPTIONAL_TEXT_COLUMNS if c in df.columns]
+    for column in text_columns:
+        values = df[column] if column in df.columns else [""] * len(df)
+        offsets, blob = _encode_text_column(values)
+        payload.append((f"{column}.offsets", offsets.tobytes(), "int64", [len(offsets)]))
+        payload.append((f"{column}.data", blob, "uint8", [len(blob)]))
+
+    # Section offsets are relative to the start of the payload, so the header
+    # can be sized after they are known
+    sections = {}
+    position = 0
+    for name, data, dtype, shape in payload:
+        sections[name] = {"offset": position, "nbytes": len(data), "dtype": dtype, "shape": shape}
+        position += len(data) + _pad(len(data))
+
+    checksum = hashlib.sha256()
+    for _, data, _, _ in payload:
+        checksum.update(data)
+        checksum.update(b"\0" * _pad(len(data)))
+
+    header = {
+        "version": FORMAT_VERSION,
+        "model": model_name,
+        "dimension": int(embeddings.shape[1]),
+        "rows": int(embeddings.shape[0]),
+        "checksum": checksum.hexdigest(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "text_columns": text_columns,
+        "sections": sections,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * _pad(PREAMBLE.size + len(header_bytes))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for _, data, _, _ in payload:
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+    os.replace(tmp_path, path)
+    return header
+
+
+class TextColumn:
+    """Read-only view of a string column; values are decoded on access"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def tolist(self):
+        return [self[i] for i in range(len(self))]
+
+
+class CorpusBundle:
+    """An opened bundle: header, mmap-backed embeddings and metadata columns"""
+
+    def __init__(self, path, mm, header, payload_start):
+        self.path = path
+        self.header = header
+        self._mm = mm
+        self._payload_start = payload_start
+
+        self.embeddings = self._section("embeddings")
+        self.years = self._section("year")
+        self.text = {
+            column: TextColumn(self._section(f"{column}.offsets"), self._section(f"{column}.data"))
+            for column in header["text_columns"]
+        }
+
+    def _section(self, name):
+        info = self.header["sections"][name]
+        dtype = np.dtype(info["dtype"])
+        array = np.frombuffer(self._mm, dtype=dtype, count=info["nbytes"] // dtype.itemsize,
+                              offset=self._payload_start + info["offset"])
+        return array.reshape(info["shape"])
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def row(self, idx):
+        """Metadata of one publication as a dict (same keys as the CSV)"""
+        record = {column: values[idx] for column, values in self.text.items()}
+        year = int(self.years[idx])
+        record['year'] = year if year >= 0 else None
+        return record
+
+    def to_dataframe(self, columns=None):
+        """Materialize (some of) the metadata columns as a DataFrame; absent optional columns are skipped"""
+        columns = columns or ['title', 'authors', 'year', 'source_url', 'abstract_text']
+        data = {}
+        for column in columns:
+            if column == 'year':
+                years = self.years.astype(np.int64)
+                data['year'] = np.where(years >= 0, years, np.nan) if (years < 0).any() else years
+            elif column in self.text:
+                values = self.text[column].tolist()
+                # Empty strings stand for missing values in optional columns
+                data[column] = [v or None for v in values] if column in OPTIONAL_TEXT_COLUMNS else values
+        return pd.DataFrame(data)
+
+    def verify(self):
+        """Recompute the payload checksum (reads the whole file)"""
+        digest = hashlib.sha256(memoryview(self._mm)[self._payload_start:]).hexdigest()
+        if digest != self.header["checksum"]:
+            raise BundleError(f"Checksum mismatch in {self.path}: the bundle is corrupt")
+
+
+def open_bundle(path=BUNDLE_PATH, expected_model=None):
+    """Map a bundle read-only and validate its header against the file"""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mm) < PREAMBLE.size:
+        raise BundleError(f"{path} is too small to be a corpus bundle")
+    magic, version, header_len = PREAMBLE.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise BundleError(f"{path} is not a corpus bundle")
+    if version != FORMAT_VERSION:
+        raise BundleError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+
+    header = json.loads(bytes(mm[PREAMBLE.size:PREAMBLE.size + header_len]))
+    payload_start = PREAMBLE.size + header_len
+
+    rows, dim = header["rows"], header["dimension"]
+    sections = header["sections"]
+    if sections["embeddings"]["shape"] != [rows, dim]:
+        raise BundleError(f"Number of publications ({rows}) doesn't match embeddings "
+                          f"{tuple(sections['embeddings']['shape'])}")
+    if sections["year"]["shape"] != [rows] or any(
+            sections[f"{c}.offsets"]["shape"] != [rows + 1] for c in header["text_columns"]):
+        raise BundleError("Metadata columns don't match the number of publications")
+    end = max(s["offset"] + s["nbytes"] for s in sections.values())
+    if payload_start + end > len(mm):
+        raise BundleError(f"{path} is truncated")
+    if expected_model and header["model"] != expected_model:
+        raise BundleError(f"Bundle built with '{header['model']}', app expects '{expected_model}'")
+
+    return CorpusBundle(path, mm, header, payload_start)
+
+
+if __name__ == "__main__":
+    print("\n" + "="*60)
+    print("📦 GENERADOR DE BUNDLE - NASA SPACE BIOLOGY")
+    print("="*60 + "\n")
+
+    df = pd.read_csv('data/publicaciones.csv')
+    embeddings = np.load('data/corpus_embeddings.npy')
+    header = write_bundle(BUNDLE_PATH, df, embeddings, 'all-MiniLM-L6-v2')
+    open_bundle(BUNDLE_PATH).verify()
+
+    file_size_mb = os.path.getsize(BUNDLE_PATH) / (1024 * 1024)
+    print(f"   ✅ {header['rows']:,} publicaciones · {header['dimension']}D · {file_size_mb:.2f} MB")
+    print(f"   ✅ Bundle guardado en: {BUNDLE_PATH}")
@@ -0,0 +1,184 @@
+"""
+Immutable, process-wide corpus store
+
+Loaded once per server process (the app wraps load_corpus_store in
+st.cache_resource) and shared read-only by every session: the embedding
+matrix is flagged non-writeable and handed out without copying, abstracts are
+decoded per row on demand, and searches only allocate per-query buffers.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from corpus_bundle import OPTIONAL_TEXT_COLUMNS, open_bundle
+from facet_index import FacetIndex
+from incremental_embeddings import embeddings_digest
+from lexical_index import TOKEN_PATTERN, BM25Index, lexical_index_path, reciprocal_rank_fusion
+from search_kernel import load_index, prepare_embeddings, search_filtered
+
+# Columns kept materialized for the UI (sidebar filters, charts, explorer),
+# plus the precomputed entity columns when extract_entities_batch.py has run
+METADATA_COLUMNS = ['title', 'authors', 'year', 'source_url'] + OPTIONAL_TEXT_COLUMNS
+# Candidates taken from each ranking before fusion, as a multiple of top_k
+HYBRID_CANDIDATES = 4
+# Kind of score of a hit: cosine similarity to the query, or BM25 relative to
+# the best match for lexical-only answers (the transformer did not run)
+SIMILARITY = 'similarity'
+KEYWORD = 'keyword'
+
+
+class CorpusError(ValueError):
+    """The corpus files are inconsistent with each other"""
+
+
+def _read_only(array):
+    array = np.asarray(array)
+    array.setflags(write=False)
+    return array
+
+
+class CorpusStore:
+    """Read-only metadata, embeddings and search index of the corpus"""
+
+    def __init__(self, metadata, embeddings, index, abstracts, source, lexical=None, facets=None):
+        self.metadata = metadata
+        self.embeddings = _read_only(embeddings)
+        self.index = index
+        self.abstracts = abstracts
+        self.source = source
+        self.lexical = lexical
+        self.facets = facets
+
+    def __len__(self):
+        return len(self.metadata)
+
+    @property
+    def dimension(self):
+        return self.embeddings.shape[1]
+
+    def row(self, idx):
+        """Metadata of one publication as a new dict, abstract included"""
+        record = {column: self.metadata[column].iat[idx] for column in self.metadata.columns}
+        record['abstract_text'] = self.abstracts[idx]
+        return record
+
+    def search(self, query_embeddings, top_k=5, allowed=None):
+        """
+        (indices, scores) of shape (n_queries, top_k) from the loaded index,
+        restricted to the rows of the boolean bitmap `allowed` when a
+        pre-filter is given (see search_kernel.search_filtered).
+        """
+        if allowed is not None:
+            return search_filtered(self.index, self.embeddings, query_embeddings, allowed, top_k)
+        return self.index.search(query_embeddings, top_k)
+
+    def hybrid_search(self, query, top_k, encode, filters=None):
+        """
+        BM25 + dense retrieval fused with reciprocal-rank fusion.
+
+        `encode(query)` must return the unit-norm query embedding; it is not
+        called when the lexical match is decisive (then fewer than top_k rows
+        may come back). `filters`
+        ({facet: [values]}) restricts the candidate rows before scoring.
+        Returns [(row, score, kind)] best first, where kind is SIMILARITY
+        (score is the cosine similarity) or KEYWORD (score is the BM25 score
+        relative to the best match).
+        """
+        return self.hybrid_search_batch([query], top_k, lambda texts: encode(texts[0]), filters)[0]
+
+    def hybrid_search_batch(self, queries, top_k, encode_batch, filters=None):
+        """
+        hybrid_search for many queries sharing the same filters.
+
+        `encode_batch(texts)` returns an (n, d) matrix and is called once for
+        all queries without a decisive lexical answer; their dense scores come
+        from a single matrix-matrix product. Returns one [(row, score, kind)]
+        list per query, in order.
+        """
+        results = [[] for _ in queries]
+        allowed = self.facets.mask(filters) if self.facets is not None else None
+        if allowed is not None and not allowed.any():
+            return results
+
+        n_candidates = top_k * HYBRID_CANDIDATES
+        pending, lexical_rankings = [], []
+        for i, query in enumerate(queries):
+            if self.lexical is None:
+                pending.append(i)
+                continue
+            terms = self.lexical.tokenize(query)
+            lexical_rows, lexical_scores = self.lexical.search(terms, n_candidates, allowed=allowed)
+            if self.lexical.is_decisive(terms, allowed=allowed):
+                # The BM25 ranking alone, even when fewer than top_k rows match
+                relative = lexical_scores[:top_k] / lexical_scores[0]
+                results[i] = [(row, score, KEYWORD) for row, score in zip(lexical_rows[:top_k], relative)]
+            else:
+                pending.append(i)
+                lexical_rankings.append(lexical_rows)
+        if not pending:
+            return results
+
+        query_embeddings = np.atleast_2d(encode_batch([queries[i] for i in pending]))
+        if self.lexical is None:
+            indices, scores = self.search(query_embeddings, top_k, allowed=allowed)
+            for i, query_indices, query_scores in zip(pending, indices, scores):
+                # Approximate indexes may return fewer than top_k hits (-1 slots)
+                results[i] = [(idx, score, SIMILARITY) for idx, score in zip(query_indices, query_scores) if idx >= 0]
+            return results
+
+        dense_rows, _ = self.search(query_embeddings, n_candidates, allowed=allowed)
+        for i, query_embedding, dense_ranking, lexical_ranking in zip(pending, query_embeddings, dense_rows,
+                                                                        lexical_rankings):
+            ranked, _ = reciprocal_rank_fusion([dense_ranking, lexical_ranking])
+            ranked = ranked[:top_k]
+            scores = self.embeddings[ranked] @ query_embedding
+            results[i] = [(row, score, SIMILARITY) for row, score in zip(ranked, scores)]
+        return results
+
+
+def load_corpus_store(csv_path, embeddings_path, bundle_path, model_name, index_kind='auto', ef_search=64,
+                      nprobe=None):
+    """
+    Build the store from the mmap bundle when present, otherwise from the
+    CSV + .npy pair. Raises BundleError, CorpusError or FileNotFoundError.
+    """
+    if os.path.exists(bundle_path):
+        bundle = open_bundle(bundle_path, expected_model=model_name)
+        metadata = bundle.to_dataframe(METADATA_COLUMNS)
+        embeddings = bundle.embeddings
+        abstracts = bundle.text['abstract_text']
+        source = bundle_path
+    else:
+        df = pd.read_csv(csv_path)
+        # Mapped, not read: pages are shared between processes and only the
+        # rows that are touched need to be resident (e.g. int8 rescoring)
+        embeddings = np.load(embeddings_path, mmap_mode='r')
+        if len(df) != len(embeddings):
+            raise CorpusError("Number of publications doesn't match embeddings")
+        metadata = df[[c for c in METADATA_COLUMNS if c in df.columns]].copy()
+        abstracts = _read_only(df['abstract_text'].fillna('').to_numpy(dtype=object))
+        source = csv_path
+
+    # No copy when the matrix is already contiguous unit-norm float32
+    embeddings = _read_only(prepare_embeddings(embeddings))
+    index = load_index(embeddings_path, embeddings, kind=index_kind, ef_search=ef_search, nprobe=nprobe)
+    lexical = load_lexical_index(embeddings_path, metadata, abstracts)
+    facets = FacetIndex.build(metadata)
+    return CorpusStore(metadata, embeddings, index, abstracts, source, lexical=lexical, facets=facets)
+
+
+def load_lexical_index(embeddings_path, metadata, abstracts):
+    """BM25 index saved by create_index.py --type bm25, or built in memory"""
+    path = lexical_index_path(embeddings_path)
+    if os.path.exists(path):
+        lexical = BM25Index.load(embeddings_path)
+        # Same rows and the same texts as the embedding matrix (its digest covers title + abstract),
+        # tokenized as queries are
+        if len(lexical) == len(metadata) and lexical.digest == embeddings_digest(embeddings_path) \
+                and lexical.token_pattern == TOKEN_PATTERN:
+            return lexical
+        print(f"⚠️ Ignoring stale index {path}: rebuild it with create_index.py --type bm25")
+    titles = metadata['title'].fillna('')
+    return BM25Index.build(f"{titles.iat[i]} {abstracts[i]}" for i in range(len(metadata)))
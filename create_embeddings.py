@@ -1,8 +1,23 @@
 """
 Script para generar embeddings de las publicaciones de la NASA
-EJECUTAR UNA SOLA VEZ antes de lanzar la aplicación
+EJECUTAR antes de lanzar la aplicación y cada vez que cambie el CSV
 
-Uso: python create_embeddings.py
+Es incremental: junto al .npy se guarda el modelo y un hash del texto de cada
+fila (data/corpus_embeddings.hashes.npz), y en las siguientes ejecuciones solo
+se codifican las filas nuevas o modificadas; las filas borradas desaparecen
+de la matriz.
+
+Con --stream el CSV se lee por bloques, la codificación se reparte entre
+varios procesos (--workers, uno por núcleo por defecto) y cada bloque se
+escribe directamente en un memmap, así que la memoria no crece con el corpus.
+Si se interrumpe, la siguiente ejecución continúa desde el último bloque
+guardado. No genera el bundle: después ejecuta python corpus_bundle.py.
+
+Uso: python create_embeddings.py [--int8] [--full] [--stream [--workers N] [--block-rows 4096]]
+
+  --int8  Genera además una copia cuantizada int8 (4x menos RAM) que la
+          aplicación usa para buscar, re-puntuando con los vectores float32
+  --full  Ignora los hashes guardados y vuelve a generar todos los embeddings
 """
 
 import pandas as pd
@@ -10,8 +25,28 @@ import numpy as np
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 import os
+import argparse
+from corpus_bundle import BUNDLE_PATH, write_bundle
+from incremental_embeddings import embedding_texts, row_hashes_path, save_embeddings, update_embeddings
+from streaming_embeddings import BLOCK_ROWS, partial_paths, stream_embeddings
+from search_kernel import FlatIndex, Int8Index, int8_index_path, recall_at_k, sample_queries
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+def create_int8_index(embeddings, output_path):
+    """Cuantiza a int8, guarda junto al .npy y compara recall con la búsqueda exacta"""
+    index = Int8Index.build(embeddings)
+    index.save(output_path)
+    
+    queries = sample_queries(embeddings, 200)
+    recall, int8_ms, exact_ms = recall_at_k(index, FlatIndex(embeddings), queries, k=10)
+    
+    print(f"   ✅ Índice int8 guardado en: {int8_index_path(output_path)}")
+    print(f"   • Memoria float32: {embeddings.nbytes / (1024 * 1024):.2f} MB"
+          f" → int8: {index.codes.nbytes / (1024 * 1024):.2f} MB")
+    print(f"   • recall@10 vs exacta: {recall:.3f}  ({int8_ms:.3f} ms/q int8, {exact_ms:.3f} ms/q exacta)")
 
-def create_embeddings():
+def create_embeddings(int8=False, full=False):
     print("\n" + "="*60)
     print("🚀 GENERADOR DE EMBEDDINGS - NASA SPACE BIOLOGY")
     print("="*60 + "\n")
@@ -43,56 +78,44 @@ def create_embeddings():
         print(f"   ❌ Faltan columnas requeridas: {missing_cols}")
         return
     
-    # 3. Cargar modelo de embeddings
-    print("\n🤖 Paso 2/4: Cargando modelo de embeddings...")
-    print("   (Esto puede tardar en la primera ejecución)")
-    try:
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("   ✅ Modelo cargado correctamente")
-    except Exception as e:
-        print(f"   ❌ Error al cargar modelo: {str(e)}")
-        return
-    
-    # 4. Preparar textos
-    print("\n📝 Paso 3/4: Preparando textos...")
-    texts = []
-    for idx, row in df.iterrows():
-        # Combinar título y abstract para mejor contexto
-        title = str(row['title']) if pd.notna(row['title']) else ""
-        abstract = str(row['abstract_text']) if pd.notna(row['abstract_text']) else ""
-        
-        # Si no hay abstract, usar solo título
-        if abstract:
-            text = f"{title}. {abstract}"
-        else:
-            text = title
-        
-        texts.append(text)
-    
+    # 3. Preparar textos y compararlos con los de la última ejecución
+    print("\n📝 Paso 2/4: Preparando textos...")
+    texts = embedding_texts(df)
     print(f"   ✅ {len(texts)} textos preparados")
     
-    # 5. Generar embeddings
-    print("\n⚡ Paso 4/4: Generando embeddings...")
-    print("   (Esto puede tardar varios minutos dependiendo del tamaño)")
-    
-    try:
-        embeddings = model.encode(
-            texts,
+    # 4. Generar embeddings (solo de las filas nuevas o modificadas)
+    def encode(pending):
+        print("\n🤖 Paso 3/4: Cargando modelo de embeddings...")
+        print("   (Esto puede tardar en la primera ejecución)")
+        model = SentenceTransformer(EMBEDDING_MODEL)
+        print("   ✅ Modelo cargado correctamente")
+        
+        print(f"\n⚡ Paso 4/4: Generando embeddings de {len(pending):,} textos...")
+        print("   (Esto puede tardar varios minutos dependiendo del tamaño)")
+        return model.encode(
+            pending,
             batch_size=32,
             show_progress_bar=True,
             convert_to_tensor=False,
             normalize_embeddings=True  # Normalizar para similitud coseno
         )
-        print(f"   ✅ Embeddings generados")
+    
+    output_path = 'data/corpus_embeddings.npy'
+    try:
+        embeddings, digests, counts = update_embeddings(texts, output_path, EMBEDDING_MODEL, encode, full=full)
     except Exception as e:
         print(f"   ❌ Error al generar embeddings: {str(e)}")
         return
     
+    if counts['encoded'] == 0:
+        print("\n✨ Ningún texto nuevo o modificado: no hace falta el modelo")
+    print(f"   ✅ Embeddings listos: {counts['reused']:,} reutilizados · {counts['encoded']:,} generados"
+          f" · {counts['dropped']:,} eliminados")
+    
     # 6. Guardar embeddings
     print("\n💾 Guardando embeddings...")
     try:
-        output_path = 'data/corpus_embeddings.npy'
-        np.save(output_path, embeddings)
+        save_embeddings(output_path, embeddings, digests, EMBEDDING_MODEL)
         
         # Verificar que se guardó correctamente
         test_load = np.load(output_path)
@@ -100,11 +123,24 @@ def create_embeddings():
         file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
         
         print(f"   ✅ Embeddings guardados en: {output_path}")
+        print(f"   ✅ Hashes por fila guardados en: {row_hashes_path(output_path)}")
+        
+        # Bundle mmap (metadatos + embeddings) que abre la aplicación
+        write_bundle(BUNDLE_PATH, df, embeddings, EMBEDDING_MODEL)
+        print(f"   ✅ Bundle guardado en: {BUNDLE_PATH}")
         
     except Exception as e:
         print(f"   ❌ Error al guardar: {str(e)}")
         return
     
+    if int8:
+        print("\n🗜️  Cuantizando embeddings a int8...")
+        try:
+            create_int8_index(embeddings, output_path)
+        except Exception as e:
+            print(f"   ❌ Error al cuantizar: {str(e)}")
+            return
+    
     # 7. Resumen final
     print("\n" + "="*60)
     print("✅ PROCESO COMPLETADO EXITOSAMENTE")
@@ -116,17 +152,105 @@ def create_embeddings():
    • Dimensión de embeddings:    {embeddings.shape[1]}D
    • Tamaño del archivo:         {file_size_mb:.2f} MB
    • Archivo generado:           {output_path}
+   • Reutilizados / generados:   {counts['reused']:,} / {counts['encoded']:,}
    
 🚀 SIGUIENTE PASO:
    
    Ejecuta la aplicación con:
    streamlit run app.py
    
-💡 NOTA: No necesitas ejecutar este script de nuevo a menos que:
+💡 NOTA: Vuelve a ejecutar este script cuando:
    - Agregues nuevas publicaciones
    - Cambies el modelo de embeddings
    - Los datos originales cambien
+   Solo se generan los embeddings de las filas nuevas o modificadas
+   (usa --full para regenerarlos todos)
+    """)
+
+def create_embeddings_streaming(int8=False, full=False, workers=None, block_rows=BLOCK_ROWS):
+    """Igual que create_embeddings pero por bloques, en varios procesos y escribiendo a un memmap"""
+    print("\n" + "="*60)
+    print("🚀 GENERADOR DE EMBEDDINGS (STREAMING) - NASA SPACE BIOLOGY")
+    print("="*60 + "\n")
+    
+    csv_path = 'data/publicaciones.csv'
+    output_path = 'data/corpus_embeddings.npy'
+    try:
+        columns = pd.read_csv(csv_path, nrows=0).columns
+    except FileNotFoundError:
+        print(f"❌ Error: No se encontró {csv_path}")
+        return
+    missing_cols = [col for col in ['title', 'abstract_text'] if col not in columns]
+    if missing_cols:
+        print(f"❌ Faltan columnas requeridas: {missing_cols}")
+        return
+    
+    workers = workers or os.cpu_count() or 1
+    print(f"⚡ Generando embeddings en bloques de {block_rows:,} filas con {workers} procesos...")
+    print(f"   (si se interrumpe, la siguiente ejecución continúa desde {partial_paths(output_path)[1]})")
+    progress = tqdm(unit="bloque")
+    
+    def on_progress(done, total):
+        progress.total = total
+        progress.n = done
+        progress.refresh()
+    
+    try:
+        counts = stream_embeddings(csv_path, output_path, EMBEDDING_MODEL, workers=workers, block_rows=block_rows,
+                                   full=full, on_progress=on_progress)
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrumpido: vuelve a ejecutar con --stream para continuar desde el último bloque")
+        return
+    except Exception as e:
+        print(f"   ❌ Error al generar embeddings: {str(e)}")
+        return
+    finally:
+        progress.close()
+    
+    if counts['resumed']:
+        print(f"   ↩️  {counts['resumed']:,} bloques ya estaban hechos de una ejecución anterior")
+    print(f"   ✅ Embeddings listos: {counts['reused']:,} reutilizados · {counts['encoded']:,} generados"
+          f" · {counts['dropped']:,} eliminados")
+    print(f"   ✅ Embeddings guardados en: {output_path}")
+    
+    # El bundle necesita el CSV y la matriz completos en memoria: aquí no se genera,
+    # y uno anterior ya no corresponde a los embeddings
+    if os.path.exists(BUNDLE_PATH):
+        os.remove(BUNDLE_PATH)
+        print("   🗑️  Bundle anterior eliminado: regenéralo con python corpus_bundle.py")
+    
+    embeddings = np.load(output_path, mmap_mode='r')
+    if int8:
+        print("\n🗜️  Cuantizando embeddings a int8...")
+        try:
+            create_int8_index(embeddings, output_path)
+        except Exception as e:
+            print(f"   ❌ Error al cuantizar: {str(e)}")
+            return
+    
+    print("\n" + "="*60)
+    print("✅ PROCESO COMPLETADO EXITOSAMENTE")
+    print("="*60)
+    print(f"""
+📊 ESTADÍSTICAS FINALES:
+   
+   • Total de documentos:        {len(embeddings):,}
+   • Dimensión de embeddings:    {embeddings.shape[1]}D
+   • Tamaño del archivo:         {os.path.getsize(output_path) / (1024 * 1024):.2f} MB
+   • Archivo generado:           {output_path}
+   • Reutilizados / generados:   {counts['reused']:,} / {counts['encoded']:,}
     """)
 
 if __name__ == "__main__":
-    create_embeddings()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Genera los embeddings de las publicaciones")
+    parser.add_argument("--int8", action="store_true", help="Guardar también el índice cuantizado int8")
+    parser.add_argument("--full", action="store_true", help="Volver a generar todos los embeddings")
+    parser.add_argument("--stream", action="store_true",
+                        help="Leer el CSV por bloques y codificar en varios procesos (corpus grandes)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos de codificación con --stream (default: núcleos)")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="Filas por bloque con --stream")
+    args = parser.parse_args()
+    if args.stream:
+        create_embeddings_streaming(int8=args.int8, full=args.full, workers=args.workers, block_rows=args.block_rows)
+    else:
+        create_embeddings(int8=args.int8, full=args.full)
\ No newline at end of file
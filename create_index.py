@@ -0,0 +1,153 @@
+"""
+Script para construir un índice aproximado de los embeddings
+EJECUTAR después de create_embeddings.py cuando el corpus sea grande
+
+Tipos de índice (se guardan junto a data/corpus_embeddings.npy y la aplicación
+los usa automáticamente si existen):
+  - hnsw:  grafo HNSW, rápido y con recall alto (requiere: pip install hnswlib)
+  - ivfpq: listas invertidas + cuantización por producto (~30x menos memoria),
+           para archivos que no caben en RAM
+  - bm25:  índice invertido léxico (si no existe, la aplicación lo construye
+           en memoria al arrancar; guardarlo evita ese costo en corpus grandes)
+
+Uso: python create_index.py [--type hnsw] [--M 16] [--ef-construction 200] [--ef-search 64]
+     python create_index.py --type ivfpq [--nlist N] [--m 48] [--nprobe 8]
+     python create_index.py --type bm25
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from ivfpq_index import IVFPQ_DEFAULT_M, IVFPQ_DEFAULT_NPROBE, IVFPQIndex, default_nlist, ivfpq_index_path
+from lexical_index import BM25Index, lexical_index_path
+from search_kernel import (
+    HNSW_DEFAULT_EF_CONSTRUCTION,
+    HNSW_DEFAULT_EF_SEARCH,
+    HNSW_DEFAULT_M,
+    FlatIndex,
+    HNSWIndex,
+    hnsw_index_paths,
+    load_embeddings,
+    recall_at_k,
+    sample_queries,
+)
+
+EMBEDDINGS_PATH = 'data/corpus_embeddings.npy'
+CSV_PATH = 'data/publicaciones.csv'
+
+
+def recall_report(index, embeddings, param, values, k, n_queries):
+    """Tabla de recall@k y latencia frente a la búsqueda exacta para cada valor de `param`"""
+    exact = FlatIndex(embeddings)
+    queries = sample_queries(embeddings, n_queries)
+
+    print(f"\n   {param:>9} | {f'recall@{k}':>9} | {'índice ms/q':>11} | {'exacta ms/q':>11}")
+    print("   " + "-" * 49)
+    for value in values:
+        setattr(index, param, value)
+        recall, index_ms, exact_ms = recall_at_k(index, exact, queries, k)
+        print(f"   {value:>9} | {recall:>9.3f} | {index_ms:>11.3f} | {exact_ms:>11.3f}")
+
+
+def build_hnsw(embeddings, args):
+    print(f"\n⚡ Paso 2/3: Construyendo grafo (M={args.M}, ef_construction={args.ef_construction})...")
+    index = HNSWIndex.build(embeddings, M=args.M, ef_construction=args.ef_construction,
+                            ef_search=args.ef_search)
+    return index, hnsw_index_paths(EMBEDDINGS_PATH)[0], "ef_search", sorted({16, 32, 64, 128, 256, args.ef_search})
+
+
+def build_ivfpq(embeddings, args):
+    nlist = args.nlist or default_nlist(len(embeddings))
+    print(f"\n⚡ Paso 2/3: Entrenando IVF-PQ (nlist={nlist}, m={args.m}) y agregando vectores...")
+    index = IVFPQIndex.train(embeddings, nlist=nlist, m=args.m, nprobe=args.nprobe)
+    index.add(embeddings)
+    print(f"   • Compresión (códigos + ids): {index.compression_ratio():.0f}x")
+    # Igual que en la aplicación: re-puntuar candidatos con los vectores float32
+    index.embeddings = embeddings
+    return index, ivfpq_index_path(EMBEDDINGS_PATH), "nprobe", sorted({1, 4, 8, 16, 32, args.nprobe})
+
+
+def create_lexical_index():
+    """Índice BM25 de título + abstract con el tokenizador de find_topics.py"""
+    print("\n" + "="*60)
+    print("🔤 CONSTRUCTOR DE ÍNDICE BM25 - NASA SPACE BIOLOGY")
+    print("="*60 + "\n")
+
+    try:
+        df = pd.read_csv(CSV_PATH)
+    except FileNotFoundError:
+        print(f"   ❌ Error: No se encontró {CSV_PATH}")
+        return
+
+    start = time.perf_counter()
+    # Mismo texto que indexa corpus_store: "título abstract"
+    lexical = BM25Index.build(df['title'].fillna('') + ' ' + df['abstract_text'].fillna(''))
+    lexical.save(EMBEDDINGS_PATH)
+    path = lexical_index_path(EMBEDDINGS_PATH)
+    print(f"   ✅ {len(lexical):,} documentos · {len(lexical.terms):,} términos · "
+          f"{len(lexical.doc_ids):,} postings ({time.perf_counter() - start:.1f} s)")
+    print(f"   ✅ Índice guardado en: {path}")
+
+
+def create_index(args):
+    print("\n" + "="*60)
+    print(f"🕸️  CONSTRUCTOR DE ÍNDICE {args.type.upper()} - NASA SPACE BIOLOGY")
+    print("="*60 + "\n")
+
+    # 1. Cargar embeddings
+    print("📂 Paso 1/3: Cargando embeddings...")
+    if not os.path.exists(EMBEDDINGS_PATH):
+        print(f"   ❌ Error: No se encontró {EMBEDDINGS_PATH}")
+        print("   Ejecuta primero: python create_embeddings.py")
+        return
+    # Mapeados, no leídos: IVF-PQ se entrena con una muestra y codifica por bloques
+    embeddings = load_embeddings(EMBEDDINGS_PATH, mmap=True)
+    print(f"   ✅ {len(embeddings):,} vectores de {embeddings.shape[1]}D")
+
+    # 2. Construir índice
+    builder = build_hnsw if args.type == "hnsw" else build_ivfpq
+    try:
+        start = time.perf_counter()
+        index, index_path, param, values = builder(embeddings, args)
+        print(f"   ✅ Índice construido en {time.perf_counter() - start:.1f} s")
+    except (ImportError, ValueError) as e:
+        print(f"   ❌ {str(e)}")
+        return
+
+    # 3. Guardar y medir recall
+    print("\n💾 Paso 3/3: Guardando índice y midiendo recall...")
+    index.save(EMBEDDINGS_PATH)
+    file_size_mb = os.path.getsize(index_path) / (1024 * 1024)
+    print(f"   ✅ Índice guardado en: {index_path} ({file_size_mb:.2f} MB)")
+
+    default = getattr(index, param)
+    recall_report(index, embeddings, param, values, args.k, args.queries)
+
+    env_var = "HNSW_EF_SEARCH" if args.type == "hnsw" else "IVFPQ_NPROBE"
+    print(f"""
+💡 NOTA: La aplicación usa {param}={default} por defecto.
+   Ajusta la variable de entorno {env_var} para cambiar
+   precisión por latencia (más alto = más recall, más lento).
+   Borra {index_path} para volver a la búsqueda exacta.
+    """)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye un índice aproximado de los embeddings")
+    parser.add_argument("--type", choices=["hnsw", "ivfpq", "bm25"], default="hnsw")
+    parser.add_argument("--M", type=int, default=HNSW_DEFAULT_M, help="HNSW: vecinos por nodo del grafo")
+    parser.add_argument("--ef-construction", type=int, default=HNSW_DEFAULT_EF_CONSTRUCTION)
+    parser.add_argument("--ef-search", type=int, default=HNSW_DEFAULT_EF_SEARCH)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF-PQ: listas invertidas (def. 4*sqrt(n))")
+    parser.add_argument("--m", type=int, default=IVFPQ_DEFAULT_M, help="IVF-PQ: sub-cuantizadores (bytes por vector)")
+    parser.add_argument("--nprobe", type=int, default=IVFPQ_DEFAULT_NPROBE, help="IVF-PQ: listas visitadas por consulta")
+    parser.add_argument("--k", type=int, default=10, help="k para el reporte de recall")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas para el reporte de recall")
+    args = parser.parse_args()
+    if args.type == "bm25":
+        create_lexical_index()
+    else:
+        create_index(args)
@@ -1,26 +1,64 @@
 """
 Versión SIMPLIFICADA y GARANTIZADA para extraer autores
 Usa SOLO los meta tags que confirmamos que existen
+
+Las páginas se descargan en paralelo (metadata_harvester: una sola sesión
+HTTP con conexiones reutilizadas, límite de peticiones simultáneas y por
+segundo por servidor, timeouts y reintentos). Cada resultado se guarda en
+data/metadata_harvest.jsonl en cuanto llega, así que si se interrumpe basta
+con volver a ejecutarlo y sólo descarga los artículos que faltan. Ese
+checkpoint sólo sirve para reanudar: se borra al terminar, y --refresh lo
+descarta para empezar de nuevo.
+
+Las páginas quedan en la caché HTTP (data/http_cache): al volver a procesarlas
+sólo se pregunta al servidor si cambiaron (ETag/Last-Modified) y las que no
+cambiaron no se descargan de nuevo.
+
+Uso: python extract_authors_simple.py [archivo.csv] [--output data/publicaciones_fixed.csv]
+                                      [--concurrency 16] [--per-host 4] [--rate 3] [--refresh]
+                                      [--base-url http://127.0.0.1:8766] [--cache-dir data/http_cache | --no-cache]
 """
 
+import argparse
+import os
+
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
-import time
 import re
 
-def extract_from_ncbi_simple(url):
+from http_cache import HTTP_CACHE_DIR, HTTPCache
+from metadata_harvester import (HARVEST_CONCURRENCY, PER_HOST_CONCURRENCY, PER_HOST_RATE, USER_AGENT,
+                                harvest_to_jsonl, load_harvest)
+
+HARVEST_PATH = 'data/metadata_harvest.jsonl'
+
+def extract_from_ncbi_simple(url, cache=None):
     """
     Extrae autores, año y abstract usando SOLO meta tags
     (el método más confiable según el diagnóstico)
+    
+    Con `cache` (HTTPCache) la página se revalida en vez de descargarse de nuevo.
     """
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
+        headers = {'User-Agent': USER_AGENT}
+        if cache is not None:
+            response = cache.get(url, requests, headers=headers, timeout=15)
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}")
+        else:
+            response = requests.get(url, headers=headers, timeout=15)
+            response.raise_for_status()
+        return parse_ncbi_page(response.content, url)
+    except Exception as e:
+        print(f"\n  Error en {url[:50]}...: {e}")
+        return None
+
+def parse_ncbi_page(content, url):
+    """Título, autores, año y abstract de una página de PMC (HTML ya descargado)"""
+    try:
+        soup = BeautifulSoup(content, 'html.parser')
         
         # ===== AUTORES - Método de META TAGS (100% confiable) =====
         author_metas = soup.find_all('meta', {'name': 'citation_author'})
@@ -100,16 +138,21 @@ def extract_from_ncbi_simple(url):
         print(f"\n  Error en {url[:50]}...: {e}")
         return None
 
-def process_csv(input_file, output_file='data/publicaciones_fixed.csv'):
+def process_csv(input_file, output_file='data/publicaciones_fixed.csv', harvest_path=HARVEST_PATH, refresh=False,
+                **options):
     """
     Procesa el CSV y genera uno nuevo con autores correctos
+    
+    Con `refresh` se descarta el checkpoint de una ejecución interrumpida y se
+    vuelven a pedir todas las URLs (a través de la caché HTTP, si la hay).
+    `options` se pasan a metadata_harvester.Harvester (concurrency, per_host,
+    rate, base_url, cache...).
     """
     print("="*60)
     print("EXTRACTOR SIMPLE DE AUTORES (Solo Meta Tags)")
     print("="*60 + "\n")
     
     # Crear carpeta data
-    import os
     os.makedirs('data', exist_ok=True)
     
     # Leer CSV
@@ -130,18 +173,34 @@ def process_csv(input_file, output_file='data/publicaciones_fixed.csv'):
     print(f"Total de papers: {len(df)}\n")
     print("Procesando...\n")
     
-    # Procesar cada fila
+    # Descargar en paralelo las páginas que faltan (las URLs repetidas una sola vez)
+    if refresh and os.path.exists(harvest_path):
+        os.remove(harvest_path)
+    done = load_harvest(harvest_path)
+    urls = list(dict.fromkeys(url for url in df[link_col] if isinstance(url, str) and url))
+    pending = [url for url in urls if url not in done]
+    print(f"URLs únicas: {len(urls)} · ya descargadas: {len(urls) - len(pending)} · pendientes: {len(pending)}\n")
+    
+    interrupted = False
+    if pending:
+        with tqdm(total=len(pending)) as progress:
+            try:
+                harvest_to_jsonl(pending, parse_ncbi_page, harvest_path,
+                                 on_progress=lambda url, error: progress.update(1), **options)
+            except KeyboardInterrupt:
+                interrupted = True
+                print("\n  Interrumpido: lo descargado está en el checkpoint, vuelve a ejecutar para continuar")
+        done = load_harvest(harvest_path)
+    
+    # Actualizar cada fila con sus metadatos (texto: el CSV de entrada puede traer year numérico)
+    for col in ['title', 'authors', 'year', 'abstract_text', 'source_url']:
+        if col in df.columns:
+            df[col] = df[col].astype(object)
     success = 0
     failed = 0
     
-    for idx, row in tqdm(df.iterrows(), total=len(df)):
-        url = row[link_col]
-        
-        if pd.isna(url) or not url:
-            failed += 1
-            continue
-        
-        metadata = extract_from_ncbi_simple(url)
+    for idx, row in df.iterrows():
+        metadata = done.get(row[link_col])
         
         if metadata:
             # Actualizar datos
@@ -156,14 +215,15 @@ def process_csv(input_file, output_file='data/publicaciones_fixed.csv'):
             success += 1
         else:
             failed += 1
-        
-        # Pausa para no saturar
-        time.sleep(0.3)
     
     # Guardar
     print(f"\n\nGuardando {output_file}...")
     df.to_csv(output_file, index=False)
     
+    # Ejecución completa: la próxima revalida todas las páginas en vez de reutilizar el checkpoint
+    if not interrupted and os.path.exists(harvest_path):
+        os.remove(harvest_path)
+    
     print("\n" + "="*60)
     print("PROCESO COMPLETADO")
     print("="*60)
@@ -183,18 +243,35 @@ def process_csv(input_file, output_file='data/publicaciones_fixed.csv'):
     return df
 
 if __name__ == "__main__":
-    import sys
+    parser = argparse.ArgumentParser(description="Extrae título, autores, año y abstract de las páginas de PMC")
+    parser.add_argument("input_file", nargs="?", help="CSV con una columna de links")
+    parser.add_argument("--output", default="data/publicaciones_fixed.csv")
+    parser.add_argument("--concurrency", type=int, default=HARVEST_CONCURRENCY, help="Descargas simultáneas en total")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY, help="Descargas simultáneas por servidor")
+    parser.add_argument("--rate", type=float, default=PER_HOST_RATE, help="Peticiones por segundo por servidor")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Descartar el checkpoint de una ejecución interrumpida y volver a pedir todas las URLs")
+    parser.add_argument("--base-url", default=None,
+                        help="Descargar de otro servidor (p. ej. mock_pmc_server.py) conservando las rutas")
+    parser.add_argument("--cache-dir", default=HTTP_CACHE_DIR, help="Carpeta de la caché HTTP")
+    parser.add_argument("--no-cache", action="store_true", help="Descargar todo sin usar la caché HTTP")
+    args = parser.parse_args()
     
     print("\n" + "="*60)
     print("EXTRACTOR SIMPLE - 100% Meta Tags")
     print("="*60 + "\n")
     
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    else:
+    input_file = args.input_file
+    if not input_file:
         input_file = input("Archivo CSV a procesar (default: data/publicaciones.csv): ").strip()
         if not input_file:
             input_file = "data/publicaciones.csv"
     
     print(f"\nProcesando: {input_file}\n")
-    process_csv(input_file)
\ No newline at end of file
+    cache = None if args.no_cache else HTTPCache(args.cache_dir)
+    process_csv(input_file, args.output, refresh=args.refresh, concurrency=args.concurrency, per_host=args.per_host,
+                rate=args.rate, base_url=args.base_url, cache=cache)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"\n🗄️  Caché HTTP: {stats['revalidated']} sin cambios (304, "
+              f"{stats['bytes_saved'] / 1e6:.1f} MB no descargados) · {stats['fetched']} descargadas")
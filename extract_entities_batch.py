@@ -0,0 +1,182 @@
+"""
+Script para extraer entidades (organismo, condición, hallazgo, metodología) de
+TODO el corpus con el LLM, una sola vez, fuera de la aplicación
+EJECUTAR después de tener data/publicaciones.csv (y GROQ_API_KEY en .env)
+
+Los resultados se guardan como columnas nuevas de data/publicaciones.csv
+(organism, condition, key_finding, methodology); la aplicación los usa para
+las gráficas y filtros de organismo/condición y para mostrar las entidades de
+cada resultado sin llamar al LLM.
+
+El trabajo es reanudable: cada respuesta se agrega a un checkpoint JSONL en
+cuanto llega, así que si se interrumpe (Ctrl+C, límite de la API, caída) basta
+con volver a ejecutarlo y sólo procesa los artículos que faltan. Las llamadas
+pasan por el mismo LLMGateway que la aplicación: no más de --rpm peticiones y
+--tpm tokens por minuto, y los errores (429, 5xx) se reintentan con espera
+exponencial aleatoria. Las entidades que la aplicación ya tenga en su caché
+(data/llm_cache.sqlite) se reutilizan sin llamar al LLM.
+
+Uso: python extract_entities_batch.py [--rpm 30] [--tpm 12000] [--retries 5] [--limit N]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from corpus_bundle import BUNDLE_PATH, write_bundle
+from llm_cache import LLM_CACHE_PATH, LLMCache
+from llm_gateway import GROQ_DEFAULT_RPM, GROQ_DEFAULT_TPM, LLMGateway
+from prompts import (ENTITIES_MAX_TOKENS, ENTITIES_TEMPERATURE, ENTITIES_TEMPLATE_HASH, ENTITY_FIELDS,
+                     GROQ_MODEL, entities_prompt, parse_entities)
+
+CSV_PATH = 'data/publicaciones.csv'
+EMBEDDINGS_PATH = 'data/corpus_embeddings.npy'
+CHECKPOINT_PATH = 'data/entities_checkpoint.jsonl'
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_RETRIES = 5
+
+
+def paper_id(row):
+    """Mismo identificador que usa la caché de la aplicación"""
+    if isinstance(row.get('source_url'), str) and row['source_url']:
+        return row['source_url']
+    return row.get('title', '')
+
+
+def load_checkpoint(path):
+    """paper_id -> entidades ya extraídas con la plantilla y el modelo actuales"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # última línea a medio escribir si el proceso murió
+            if entry.get('template') == ENTITIES_TEMPLATE_HASH and entry.get('model') == GROQ_MODEL:
+                done[entry['paper_id']] = entry['entities']
+    return done
+
+
+def extract_with_retries(gateway, text, title, retries):
+    """Entidades de un artículo; el gateway reintenta los errores de la API, aquí el JSON inválido"""
+    for attempt in range(retries + 1):
+        try:
+            response = gateway.complete(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": entities_prompt(text, title)}],
+                temperature=ENTITIES_TEMPERATURE,
+                max_tokens=ENTITIES_MAX_TOKENS
+            )
+            return parse_entities(response.choices[0].message.content)
+        except ValueError as e:
+            if attempt == retries:
+                print(f"   ⚠️ JSON inválido tras {retries + 1} intentos: {str(e)[:100]}")
+                return None
+            print(f"   ⏳ JSON inválido ({str(e)[:60]}) · reintentando")
+        except Exception as e:
+            print(f"   ⚠️ Sin resultado: {type(e).__name__}: {str(e)[:100]}")
+            return None
+
+
+def save_columns(df, done):
+    """Escribe las entidades como columnas del CSV (reemplazo atómico) y refresca el bundle"""
+    ids = [paper_id(row) for row in df.to_dict('records')]
+    for field in ENTITY_FIELDS:
+        df[field] = [done[pid][field] if pid in done else None for pid in ids]
+
+    tmp_path = CSV_PATH + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, CSV_PATH)
+    print(f"   ✅ Columnas {', '.join(ENTITY_FIELDS)} guardadas en {CSV_PATH}")
+
+    # El bundle mapeado en memoria tiene prioridad sobre el CSV en la aplicación
+    if os.path.exists(BUNDLE_PATH) and os.path.exists(EMBEDDINGS_PATH):
+        write_bundle(BUNDLE_PATH, df, np.load(EMBEDDINGS_PATH), EMBEDDING_MODEL)
+        print(f"   ✅ Bundle actualizado: {BUNDLE_PATH}")
+
+
+def extract_all_entities(args):
+    print("\n" + "="*60)
+    print("🏷️  EXTRACCIÓN MASIVA DE ENTIDADES - NASA SPACE BIOLOGY")
+    print("="*60 + "\n")
+
+    # 1. Cargar publicaciones y progreso previo
+    print("📂 Paso 1/3: Cargando publicaciones y checkpoint...")
+    try:
+        df = pd.read_csv(CSV_PATH)
+    except FileNotFoundError:
+        print(f"   ❌ Error: No se encontró {CSV_PATH}")
+        return
+
+    papers = {}
+    for row in df.to_dict('records'):
+        papers.setdefault(paper_id(row), row)  # filas duplicadas se procesan una vez
+    done = load_checkpoint(CHECKPOINT_PATH)
+    pending = [pid for pid in papers if pid not in done]
+    if args.limit:
+        pending = pending[:args.limit]
+    print(f"   ✅ {len(papers):,} artículos · {len(done):,} ya procesados · {len(pending):,} pendientes")
+
+    # 2. Extraer (caché de la aplicación primero, luego el LLM con límite de ritmo)
+    print(f"\n🤖 Paso 2/3: Extrayendo entidades (máx. {args.rpm:g} peticiones y {args.tpm:,.0f} tokens/min)...")
+    load_dotenv()
+    from groq import Groq
+    # Los reintentos los hace el gateway (con espera), no el SDK
+    gateway = LLMGateway(Groq(api_key=os.getenv('GROQ_API_KEY'), max_retries=0), rpm=args.rpm, tpm=args.tpm,
+                         max_retries=args.retries)
+    cache = LLMCache(os.getenv('LLM_CACHE_PATH', LLM_CACHE_PATH))
+
+    start = time.perf_counter()
+    calls = reused = failed = 0
+    try:
+        with open(CHECKPOINT_PATH, 'a', encoding='utf-8') as checkpoint:
+            for n, pid in enumerate(pending, 1):
+                row = papers[pid]
+                entities = cache.get(pid, 'entities', '', ENTITIES_TEMPLATE_HASH, GROQ_MODEL)
+                if entities is not None:
+                    reused += 1
+                else:
+                    text = row.get('abstract_text') if isinstance(row.get('abstract_text'), str) else ''
+                    entities = extract_with_retries(gateway, text, row.get('title', ''), args.retries)
+                    calls += 1
+                    if entities is None:
+                        failed += 1
+                        continue
+                    cache.put(pid, 'entities', '', ENTITIES_TEMPLATE_HASH, GROQ_MODEL, entities)
+
+                done[pid] = entities
+                checkpoint.write(json.dumps({'paper_id': pid, 'template': ENTITIES_TEMPLATE_HASH,
+                                             'model': GROQ_MODEL, 'entities': entities}) + '\n')
+                checkpoint.flush()
+                if n % 25 == 0 or n == len(pending):
+                    print(f"   • {n:,}/{len(pending):,} ({time.perf_counter() - start:.0f} s)")
+    except KeyboardInterrupt:
+        print("\n   ⏸️  Interrumpido: el progreso está en el checkpoint, vuelve a ejecutar para continuar")
+
+    print(f"   ✅ {calls:,} llamadas al LLM · {reused:,} desde la caché · {failed:,} fallidas")
+    stats = gateway.stats()
+    print(f"   🚦 {stats['retries']:,} reintentos ({stats['rate_limited']:,} por límite 429) · "
+          f"espera en cola p50 {stats['queue_delay_p50']:.1f} s / p95 {stats['queue_delay_p95']:.1f} s")
+
+    # 3. Guardar columnas (también con progreso parcial)
+    print("\n💾 Paso 3/3: Guardando resultados...")
+    save_columns(df, done)
+    missing = len(papers) - len(done)
+    if missing:
+        print(f"\n💡 NOTA: Faltan {missing:,} artículos. Vuelve a ejecutar el script para completarlos.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrae entidades de todo el corpus con el LLM")
+    parser.add_argument("--rpm", type=float, default=GROQ_DEFAULT_RPM, help="Peticiones por minuto como máximo")
+    parser.add_argument("--tpm", type=float, default=GROQ_DEFAULT_TPM, help="Tokens por minuto como máximo")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Reintentos por petición fallida")
+    parser.add_argument("--limit", type=int, default=None, help="Procesar como máximo N artículos pendientes")
+    extract_all_entities(parser.parse_args())
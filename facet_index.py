@@ -0,0 +1,95 @@
+"""
+Facet indexes for pre-filtered search
+
+Each facet maps a value (a year, an author, ...) to the sorted row ids that
+carry it. A filter such as {'year': [2013, 2014], 'authors': ['Ruth K Globus']}
+is turned into a boolean row bitmap (OR within a facet, AND across facets)
+before scoring, so searches return a full top-k inside the filter (see
+search_kernel.search_filtered).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Separator of multi-valued metadata cells (authors are "A, B, C")
+MULTI_VALUE_SEPARATOR = ', '
+# Cell values that mean "unknown" (scraper and LLM placeholders)
+MISSING_VALUES = {'N/A', 'Not specified', 'Not available'}
+# Facets built from the columns written by extract_entities_batch.py
+ENTITY_FACETS = ['organism', 'condition']
+
+
+class FacetIndex:
+    """value -> row ids, per facet"""
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self.facets = {}
+
+    def add_facet(self, name, column, multi_valued=False):
+        """Index a metadata column; multi-valued cells are split on ', '"""
+        postings = {}
+        for row, cell in enumerate(column):
+            if cell is None or (not isinstance(cell, str) and pd.isna(cell)):
+                continue
+            values = str(cell).split(MULTI_VALUE_SEPARATOR) if multi_valued else [cell]
+            for value in values:
+                if isinstance(value, str):
+                    value = value.strip()
+                    if not value or value in MISSING_VALUES:
+                        continue
+                postings.setdefault(value, []).append(row)
+        self.facets[name] = {value: np.array(rows, dtype=np.int32) for value, rows in postings.items()}
+
+    @classmethod
+    def build(cls, metadata):
+        """
+        Year and author facets from the corpus metadata, plus organism and
+        condition when the precomputed entity columns are present
+        """
+        index = cls(len(metadata))
+        if 'year' in metadata.columns:
+            years = pd.to_numeric(metadata['year'], errors='coerce').astype('Int64')
+            index.add_facet('year', years.tolist())
+        if 'authors' in metadata.columns:
+            index.add_facet('authors', metadata['authors'].tolist(), multi_valued=True)
+        for name in ENTITY_FACETS:
+            if name in metadata.columns:
+                index.add_facet(name, metadata[name].tolist())
+        return index
+
+    def __contains__(self, name):
+        """True when the facet exists and has at least one value"""
+        return bool(self.facets.get(name))
+
+    def counts(self, name):
+        """{value: number of rows}, most frequent first"""
+        postings = self.facets.get(name, {})
+        return {value: len(postings[value]) for value in self.values(name, by_count=True)}
+
+    def values(self, name, by_count=False):
+        """Values of a facet, sorted (or most frequent first)"""
+        postings = self.facets.get(name, {})
+        if by_count:
+            return sorted(postings, key=lambda v: len(postings[v]), reverse=True)
+        return sorted(postings)
+
+    def mask(self, filters):
+        """
+        Boolean row bitmap for `filters` ({facet: [values]}), or None when no
+        filter is active.
+        """
+        active = {name: values for name, values in (filters or {}).items() if values}
+        if not active:
+            return None
+
+        mask = np.ones(self.n_rows, dtype=bool)
+        for name, values in active.items():
+            postings = self.facets.get(name, {})
+            facet_mask = np.zeros(self.n_rows, dtype=bool)
+            for value in values:
+                rows = postings.get(value)
+                if rows is not None:
+                    facet_mask[rows] = True
+            mask &= facet_mask
+        return mask
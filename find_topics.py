@@ -2,6 +2,28 @@ import pandas as pd
 from sklearn.feature_extraction.text import CountVectorizer
 import os
 
+# Palabras comunes en ciencia que no aportan significado de "tema"
+SCIENCE_STOP_WORDS = [
+    'study', 'results', 'methods', 'conclusions', 'introduction',
+    'background', 'purpose', 'discussion', 'significance',
+    'figure', 'table', 'data', 'analysis', 'group', 'groups', 'using',
+    'shown', 'found', 'used', 'may', 'however', 'also', 'et', 'al'
+]
+
+def get_stop_words():
+    """Stopwords en inglés de scikit-learn + palabras científicas comunes"""
+    stop_words_custom = list(CountVectorizer(stop_words='english').get_stop_words())
+    stop_words_custom.extend(SCIENCE_STOP_WORDS)
+    return stop_words_custom
+
+def build_tokenizer(token_pattern=r"(?u)\b\w\w+\b"):
+    """
+    Tokenizador de título + abstract (minúsculas, sin stopwords).
+    Lo comparten este análisis y el índice BM25 de lexical_index.py, que
+    además conserva los tokens de un carácter ("Bion-M 1" -> bion, m, 1).
+    """
+    return CountVectorizer(stop_words=get_stop_words(), token_pattern=token_pattern).build_analyzer()
+
 def find_top_words(csv_path, top_n=20):
     """
     Lee un CSV con publicaciones, limpia el texto y encuentra las
@@ -31,14 +53,7 @@ def find_top_words(csv_path, top_n=20):
     print("🧹 Limpiando texto y contando palabras clave...")
 
     # Lista de "stopwords": palabras comunes a ignorar.
-    # Añadimos palabras comunes en ciencia que no aportan significado de "tema".
-    stop_words_custom = list(CountVectorizer(stop_words='english').get_stop_words())
-    stop_words_custom.extend([
-        'study', 'results', 'methods', 'conclusions', 'introduction',
-        'background', 'purpose', 'discussion', 'significance',
-        'figure', 'table', 'data', 'analysis', 'group', 'groups', 'using',
-        'shown', 'found', 'used', 'may', 'however', 'also', 'et', 'al'
-    ])
+    stop_words_custom = get_stop_words()
 
     # Usamos CountVectorizer para tokenizar, limpiar y contar todo en un paso
     vectorizer = CountVectorizer(
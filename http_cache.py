@@ -0,0 +1,227 @@
+"""
+On-disk HTTP response cache with conditional revalidation for the scrapers
+
+Bodies are stored content-addressed (bodies/<sha256[:2]>/<sha256>, so pages
+that are byte-identical are kept once) and indexed in SQLite by URL with the
+ETag / Last-Modified validators the server sent. The next request for a
+cached URL is sent as a conditional GET (If-None-Match / If-Modified-Since):
+a 304 costs a round trip without a body and the stored bytes are returned,
+so a re-harvest that finds no changes barely touches the network. Responses
+without validators are not stored, since they could never be revalidated.
+
+The stored bodies are bounded by `max_bytes`; past it the least recently used
+URLs are dropped (and bodies no URL refers to anymore deleted).
+
+get() wraps a requests session (or the requests module), aget() an
+httpx.AsyncClient. Both return a CachedResponse with status_code, content,
+text and headers, and with from_cache set when the body came from disk.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+HTTP_CACHE_DIR = 'data/http_cache'
+HTTP_CACHE_MAX_BYTES = 1024 ** 3
+# Evict a little below the bound so eviction does not run on every insert
+EVICTION_SLACK = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url           TEXT PRIMARY KEY,
+    body_hash     TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    content_type  TEXT,
+    fetched_at    REAL NOT NULL,
+    last_used     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE INDEX IF NOT EXISTS responses_body_hash ON responses (body_hash);
+"""
+
+
+class CachedResponse:
+    """The parts of a response the scrapers read"""
+
+    def __init__(self, url, status_code, content, headers, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+
+class HTTPCache:
+    """Content-addressed LRU of response bodies, revalidated with conditional GETs"""
+
+    def __init__(self, directory=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self.fetched = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+        # Scraper threads share the connection; every access holds the lock
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.directory, 'bodies', body_hash[:2], body_hash)
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for a cached URL (empty if not cached)"""
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM responses WHERE url=?", (url,)).fetchone()
+        headers = {}
+        if row is not None:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def load(self, url, headers=None):
+        """
+        Stored response of `url` after a 304 (None if it is gone); validators
+        the 304 carried replace the stored ones.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT body_hash, etag, last_modified, content_type FROM responses WHERE url=?",
+                                   (url,)).fetchone()
+            if row is None:
+                return None
+            body_hash, etag, last_modified, content_type = row
+            etag = (headers or {}).get('etag') or etag
+            last_modified = (headers or {}).get('last-modified') or last_modified
+            self._db.execute("UPDATE responses SET etag=?, last_modified=?, last_used=? WHERE url=?",
+                             (etag, last_modified, time.time(), url))
+            self._db.commit()
+        try:
+            with open(self._body_path(body_hash), 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        self.revalidated += 1
+        self.bytes_saved += len(content)
+        stored = {'Content-Type': content_type, 'ETag': etag, 'Last-Modified': last_modified}
+        return CachedResponse(url, 200, content, {k: v for k, v in stored.items() if v}, from_cache=True)
+
+    def store(self, url, headers, content):
+        """Keep a 200 response that carries an ETag or Last-Modified"""
+        etag, last_modified = headers.get('etag'), headers.get('last-modified')
+        if not etag and not last_modified:
+            # Nothing to revalidate with: forget the older copy, it is stale
+            self.discard(url)
+            return
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._body_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, len(content), etag, last_modified, headers.get('content-type'), now, now))
+            self._db.commit()
+            self._evict()
+
+    def discard(self, url):
+        """Drop the entry for `url`, and its body unless another URL shares it"""
+        with self._lock:
+            row = self._db.execute("SELECT body_hash FROM responses WHERE url=?", (url,)).fetchone()
+            if row is None:
+                return
+            self._db.execute("DELETE FROM responses WHERE url=?", (url,))
+            self._db.commit()
+            if self._db.execute("SELECT 1 FROM responses WHERE body_hash=? LIMIT 1", (row[0],)).fetchone() is None:
+                try:
+                    os.remove(self._body_path(row[0]))
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self):
+        """Drop least recently used URLs until the distinct bodies fit (lock held)"""
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM responses)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_SLACK
+        for url, body_hash, size in self._db.execute(
+                "SELECT url, body_hash, size FROM responses ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE url=?", (url,))
+            shared = self._db.execute("SELECT 1 FROM responses WHERE body_hash=? LIMIT 1", (body_hash,)).fetchone()
+            if shared is None:
+                total -= size
+                try:
+                    os.remove(self._body_path(body_hash))
+                except FileNotFoundError:
+                    pass
+        self._db.commit()
+
+    def _finish(self, url, response):
+        """CachedResponse for a live response, storing it when it is a 200"""
+        if response.status_code == 200:
+            self.fetched += 1
+            self.store(url, response.headers, response.content)
+        return CachedResponse(url, response.status_code, response.content, response.headers)
+
+    def get(self, url, session, headers=None, **kwargs):
+        """session.get(url) through the cache; `session` is a requests.Session or the requests module"""
+        conditional = self.conditional_headers(url)
+        response = session.get(url, headers={**(headers or {}), **conditional}, **kwargs)
+        if response.status_code == 304:
+            cached = self.load(url, response.headers)
+            if cached is not None:
+                return cached
+            response = session.get(url, headers=headers, **kwargs)  # body evicted meanwhile
+        return self._finish(url, response)
+
+    async def aget(self, client, url, headers=None, **kwargs):
+        """client.get(url) through the cache for an httpx.AsyncClient"""
+        conditional = self.conditional_headers(url)
+        response = await client.get(url, headers={**(headers or {}), **conditional}, **kwargs)
+        if response.status_code == 304:
+            cached = self.load(url, response.headers)
+            if cached is not None:
+                return cached
+            response = await client.get(url, headers=headers, **kwargs)
+        return self._finish(url, response)
+
+    def stats(self):
+        with self._lock:
+            urls = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            bodies, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM responses)"
+            ).fetchone()
+        return {
+            'revalidated': self.revalidated,
+            'fetched': self.fetched,
+            'bytes_saved': self.bytes_saved,
+            'urls': urls,
+            'bodies': bodies,
+            'bytes_stored': stored,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
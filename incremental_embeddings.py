@@ -0,0 +1,146 @@
+"""
+Incremental embedding updates
+
+Beside the .npy matrix a sidecar (<base>.hashes.npz) records the model that
+built it and a digest of the text of every row. On the next build only rows
+whose text has no match in the sidecar are encoded. Unchanged rows are
+copied from the old matrix by digest, so reordering the CSV costs nothing,
+and rows that disappeared are simply not copied. A different model, or a
+matrix without a (matching) sidecar, means encoding everything. The indexes
+derived from the matrix record embeddings_digest() to detect a rebuild.
+
+    texts = embedding_texts(df)
+    embeddings, digests, counts = update_embeddings(texts, path, model_name, encode)
+    save_embeddings(path, embeddings, digests, model_name)
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+# Hex of a truncated SHA-256: 128 bits is plenty to tell corpus rows apart
+DIGEST_CHARS = 32
+
+
+def row_hashes_path(embeddings_path):
+    """Model id + per-row text digests stored beside the .npy matrix"""
+    base, _ = os.path.splitext(embeddings_path)
+    return f"{base}.hashes.npz"
+
+
+def embedding_texts(df):
+    """'title. abstract' for every row (just the title when there is no abstract)"""
+    titles = df['title'].fillna('').astype(str)
+    abstracts = df['abstract_text'].fillna('').astype(str)
+    return np.where(abstracts != '', titles + '. ' + abstracts, titles).tolist()
+
+
+def text_digests(texts):
+    return np.array([hashlib.sha256(t.encode('utf-8')).hexdigest()[:DIGEST_CHARS] for t in texts],
+                    dtype=f'S{DIGEST_CHARS}')
+
+
+def load_row_hashes(embeddings_path):
+    """(model name, digests) of the sidecar, or (None, None) when there is none"""
+    path = row_hashes_path(embeddings_path)
+    if not os.path.exists(path):
+        return None, None
+    with np.load(path) as data:
+        return str(data['model']), data['digests']
+
+
+def open_previous(embeddings_path, model_name):
+    """
+    (memory-mapped matrix, digests) of the last build when its sidecar
+    matches `model_name` and the matrix, else (None, None)
+    """
+    old_model, old_digests = load_row_hashes(embeddings_path)
+    if old_model != model_name or not os.path.exists(embeddings_path):
+        return None, None
+    old = np.load(embeddings_path, mmap_mode='r')
+    if len(old) != len(old_digests):
+        return None, None  # matrix rewritten without its sidecar
+    return old, old_digests
+
+
+def match_rows(old_digests, digests):
+    """Row of `old_digests` with each of `digests`, -1 where there is none"""
+    if len(old_digests) == 0:
+        return np.full(len(digests), -1, dtype=np.int64)
+    order = np.argsort(old_digests, kind='stable')
+    ranked = old_digests[order]
+    position = np.minimum(np.searchsorted(ranked, digests), len(ranked) - 1)
+    return np.where(ranked[position] == digests, order[position], -1).astype(np.int64)
+
+
+def update_embeddings(texts, embeddings_path, model_name, encode, full=False):
+    """
+    Embedding matrix for `texts`, reusing the rows of the matrix at
+    `embeddings_path` whose text is unchanged. encode(list of texts) -> array
+    is called once, only for the rows that need it (and not at all when none
+    do). Returns (embeddings, digests, counts) where counts has 'reused',
+    'encoded' and 'dropped' rows.
+    """
+    digests = text_digests(texts)
+    old, old_digests = open_previous(embeddings_path, model_name) if not full else (None, None)
+
+    # Old row holding the same text, -1 for new or changed rows
+    source = match_rows(old_digests, digests) if old is not None else np.full(len(texts), -1, dtype=np.int64)
+    reused = np.flatnonzero(source >= 0)
+    missing = np.flatnonzero(source < 0)
+
+    fresh = encode([texts[i] for i in missing]) if len(missing) else None
+    dimension = old.shape[1] if old is not None else (fresh.shape[1] if fresh is not None else 0)
+    embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+    if len(reused):
+        embeddings[reused] = old[source[reused]]
+    if len(missing):
+        embeddings[missing] = fresh
+
+    counts = {
+        'reused': len(reused),
+        'encoded': len(missing),
+        'dropped': int(np.count_nonzero(~np.isin(old_digests, digests))) if old is not None else 0,
+    }
+    return embeddings, digests, counts
+
+
+def save_embeddings(embeddings_path, embeddings, digests, model_name):
+    """
+    Write the matrix and its sidecar. The old sidecar is removed first, so a
+    run interrupted between the two files re-encodes everything instead of
+    trusting digests of another matrix.
+    """
+    remove_row_hashes(embeddings_path)
+    np.save(embeddings_path, embeddings)
+    save_row_hashes(embeddings_path, digests, model_name)
+
+
+def embeddings_digest(embeddings_path):
+    """
+    Fingerprint of the matrix at `embeddings_path` (its model and row
+    digests), or '' without a sidecar. Derived indexes (HNSW, IVF-PQ, int8,
+    BM25) store it and are ignored as stale once it no longer matches.
+    """
+    model, digests = load_row_hashes(embeddings_path)
+    if digests is None:
+        return ''
+    digest = hashlib.sha256(model.encode('utf-8'))
+    digest.update(digests.tobytes())
+    return digest.hexdigest()[:DIGEST_CHARS]
+
+
+def stored_digest(data):
+    """embeddings_digest saved in an index .npz ('' for indexes saved without one)"""
+    return str(data['digest']) if 'digest' in data.files else ''
+
+
+def save_row_hashes(embeddings_path, digests, model_name):
+    np.savez(row_hashes_path(embeddings_path), model=np.array(model_name), digests=digests)
+
+
+def remove_row_hashes(embeddings_path):
+    path = row_hashes_path(embeddings_path)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,231 @@
+"""
+IVF-PQ compressed index for corpora that do not fit in RAM as float32
+
+A k-means coarse quantizer splits the corpus into `nlist` inverted lists; the
+residual of every vector to its list centroid is product-quantized into `m`
+one-byte codes, stored with a 4-byte row id (384-D float32 = 1536 bytes ->
+48 + 4 bytes with m=48, ~30x).
+
+Queries only visit the `nprobe` closest lists and score codes with an
+asymmetric lookup table: <q, c + r> = <q, c> + sum_j <q_j, codebook_j[code_j]>,
+so the float vectors are never needed at query time. When they are available
+(e.g. an mmap of the .npy), the best `k * rescore_factor` candidates are
+rescored exactly, which recovers most of the PQ approximation error.
+
+Exposes the same train / add / search interface as the other indexes in
+search_kernel; create_index.py --type ivfpq builds and saves it.
+"""
+
+import os
+
+import numpy as np
+
+from incremental_embeddings import embeddings_digest, stored_digest
+from search_kernel import normalize_queries, prepare_embeddings, rescore, top_k
+
+IVFPQ_DEFAULT_M = 48
+IVFPQ_DEFAULT_NPROBE = 8
+IVFPQ_RESCORE_FACTOR = 4
+# Codebook size per sub-quantizer (one byte per code)
+PQ_CENTROIDS = 256
+KMEANS_ITERATIONS = 20
+# Training vectors sampled per centroid, as usual for k-means quantizers
+TRAIN_POINTS_PER_CENTROID = 64
+ASSIGN_CHUNK = 16384
+# Row ids in the inverted lists: 4 bytes per vector, enough for 2**31 rows
+ID_DTYPE = np.int32
+
+
+def ivfpq_index_path(embeddings_path):
+    """Index file stored beside the .npy matrix"""
+    base, _ = os.path.splitext(embeddings_path)
+    return f"{base}.ivfpq.npz"
+
+
+def default_nlist(rows):
+    """Rule of thumb: about 4 * sqrt(n) inverted lists"""
+    return max(1, int(4 * np.sqrt(rows)))
+
+
+def _nearest_centroid(x, centroids):
+    """Index of the closest centroid (L2) for every row, computed in chunks"""
+    half_norms = (centroids ** 2).sum(axis=1) / 2
+    assign = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), ASSIGN_CHUNK):
+        block = x[start:start + ASSIGN_CHUNK]
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return assign
+
+
+def kmeans(x, k, n_iter=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd k-means; empty clusters are re-seeded from random points"""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assign = _nearest_centroid(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        sums = np.add.reduceat(x[order], starts[filled], axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        n_empty = int((~filled).sum())
+        if n_empty:
+            centroids[~filled] = x[rng.choice(len(x), size=n_empty, replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """Inverted file over product-quantized residuals (inner-product scores)"""
+
+    def __init__(self, centroids, codebooks, nprobe=IVFPQ_DEFAULT_NPROBE, embeddings=None,
+                 rescore_factor=IVFPQ_RESCORE_FACTOR):
+        self.centroids = centroids    # (nlist, d)
+        self.codebooks = codebooks    # (m, ksub, d / m)
+        self.nprobe = nprobe
+        self.embeddings = embeddings  # optional float32 rows for exact rescoring
+        self.rescore_factor = rescore_factor
+        self.list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        self.ids = np.empty(0, dtype=ID_DTYPE)
+        self.codes = np.empty((0, codebooks.shape[0]), dtype=np.uint8)
+        self.digest = ""  # embeddings_digest of the matrix it was saved for
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        return self.centroids.shape[1]
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @property
+    def m(self):
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(cls, embeddings, nlist=None, m=IVFPQ_DEFAULT_M, nprobe=IVFPQ_DEFAULT_NPROBE, seed=0):
+        """Learn the coarse quantizer and PQ codebooks (the index starts empty)"""
+        embeddings = prepare_embeddings(embeddings)
+        rows, dim = embeddings.shape
+        if dim % m:
+            raise ValueError(f"Dimension {dim} is not divisible by m={m}")
+        nlist = nlist or default_nlist(rows)
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(rows, TRAIN_POINTS_PER_CENTROID * max(nlist, PQ_CENTROIDS))
+        sample = embeddings[np.sort(rng.choice(rows, size=sample_size, replace=False))]
+
+        centroids = kmeans(sample, nlist, seed=seed)
+        residuals = sample - centroids[_nearest_centroid(sample, centroids)]
+
+        sub_dim = dim // m
+        ksub = min(PQ_CENTROIDS, sample_size)
+        codebooks = np.stack([
+            kmeans(residuals[:, j * sub_dim:(j + 1) * sub_dim], ksub, seed=seed + j)
+            for j in range(m)
+        ])
+        return cls(centroids, codebooks, nprobe=nprobe)
+
+    def encode(self, embeddings):
+        """(list assignment, PQ codes) for a batch of vectors"""
+        embeddings = prepare_embeddings(embeddings)
+        assign = _nearest_centroid(embeddings, self.centroids)
+        residuals = embeddings - self.centroids[assign]
+
+        sub_dim = self.dimension // self.m
+        codes = np.empty((len(embeddings), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest_centroid(residuals[:, j * sub_dim:(j + 1) * sub_dim], self.codebooks[j])
+        return assign, codes
+
+    def add(self, embeddings, ids=None):
+        """Encode and append vectors; ids default to consecutive row numbers"""
+        if ids is None:
+            ids = np.arange(len(self), len(self) + len(embeddings))
+        # Encoded in chunks: only the codes of the whole batch are held, so
+        # `embeddings` can be an mmap larger than RAM
+        assign = np.empty(len(embeddings), dtype=np.int64)
+        codes = np.empty((len(embeddings), self.m), dtype=np.uint8)
+        for start in range(0, len(embeddings), ASSIGN_CHUNK):
+            end = start + ASSIGN_CHUNK
+            assign[start:end], codes[start:end] = self.encode(embeddings[start:end])
+
+        # Merge with the existing lists and keep them contiguous per list
+        old_assign = np.repeat(np.arange(self.nlist), np.diff(self.list_offsets))
+        all_assign = np.concatenate([old_assign, assign])
+        order = np.argsort(all_assign, kind="stable")
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=ID_DTYPE)])[order]
+        self.codes = np.concatenate([self.codes, codes])[order]
+        self.list_offsets[1:] = np.cumsum(np.bincount(all_assign, minlength=self.nlist))
+
+    def search(self, queries, k=5):
+        """
+        Same contract as FlatIndex.search: (indices, scores) of shape (n_queries, k).
+
+        Slots are -1 when the probed lists hold fewer than k vectors.
+        """
+        queries = normalize_queries(queries)
+        k = min(int(k), len(self))
+        if self.embeddings is not None:
+            shortlist, _ = self._search_codes(queries, k * self.rescore_factor)
+            return rescore(self.embeddings, queries, shortlist, k)
+        return self._search_codes(queries, k)
+
+    def _search_codes(self, queries, k):
+        """Approximate top-k from the PQ codes of the `nprobe` closest lists"""
+        k = min(int(k), len(self))
+        sub_dim = self.dimension // self.m
+        coarse_scores = queries @ self.centroids.T
+        probes, _ = top_k(coarse_scores, self.nprobe)
+
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        subspaces = np.arange(self.m)
+        for qi, query in enumerate(queries):
+            # Asymmetric table: <q_j, codebook_j[c]> for every sub-quantizer j and code c
+            table = np.einsum("jd,jcd->jc", query.reshape(self.m, sub_dim), self.codebooks)
+
+            found_ids, found_scores = [], []
+            for lst in probes[qi]:
+                start, end = self.list_offsets[lst], self.list_offsets[lst + 1]
+                if start == end:
+                    continue
+                codes = self.codes[start:end]
+                found_scores.append(coarse_scores[qi, lst] + table[subspaces, codes].sum(axis=1))
+                found_ids.append(self.ids[start:end])
+            if not found_ids:
+                continue
+
+            found_ids = np.concatenate(found_ids)
+            found_scores = np.concatenate(found_scores)
+            best, best_scores = top_k(found_scores, k)
+            indices[qi, :len(best)] = found_ids[best]
+            scores[qi, :len(best)] = best_scores
+        return indices, scores
+
+    def save(self, embeddings_path):
+        self.digest = embeddings_digest(embeddings_path)
+        np.savez(ivfpq_index_path(embeddings_path), centroids=self.centroids, codebooks=self.codebooks,
+                 list_offsets=self.list_offsets, ids=self.ids, codes=self.codes, nprobe=self.nprobe,
+                 digest=self.digest)
+
+    @classmethod
+    def load(cls, embeddings_path, nprobe=None, embeddings=None):
+        with np.load(ivfpq_index_path(embeddings_path)) as data:
+            index = cls(data["centroids"], data["codebooks"], nprobe=int(nprobe or data["nprobe"]),
+                        embeddings=embeddings)
+            index.list_offsets = data["list_offsets"]
+            index.ids = data["ids"].astype(ID_DTYPE, copy=False)
+            index.codes = data["codes"]
+            index.digest = stored_digest(data)
+        return index
+
+    def compression_ratio(self):
+        """float32 bytes per vector over the bytes the index stores per vector (codes + id)"""
+        return (self.dimension * 4) / (self.m + self.ids.itemsize)
@@ -0,0 +1,175 @@
+"""
+BM25 inverted index over title + abstract
+
+Uses the same tokenizer as find_topics.py. Postings are stored CSR-style in
+flat arrays (term offsets, doc ids, precomputed BM25 weights), so scoring a
+query is a gather + sparse sum over the postings of its few terms.
+
+reciprocal_rank_fusion() merges the BM25 ranking with the dense ranking of
+search_kernel; is_decisive() tells when an exact-term query (e.g. "CDKN1a")
+can be answered from the lexical index alone, without running the
+transformer.
+"""
+
+import os
+from collections import Counter
+
+import numpy as np
+
+from find_topics import build_tokenizer
+from incremental_embeddings import embeddings_digest, stored_digest
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+# Lexical-only answers: short queries with a rare term (in at most a fraction
+# of the corpus, but never fewer than DECISIVE_MIN_DF documents) and a document
+# containing every term
+DECISIVE_MAX_TERMS = 3
+DECISIVE_MAX_DF_FRACTION = 0.02
+DECISIVE_MIN_DF = 20
+# Tokens of one character are kept, so identifiers like "Bion-M 1" match exactly
+TOKEN_PATTERN = r"(?u)\b\w+\b"
+
+
+def lexical_index_path(embeddings_path):
+    """Index file stored beside the .npy matrix"""
+    base, _ = os.path.splitext(embeddings_path)
+    return f"{base}.bm25.npz"
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index stored as arrays"""
+
+    def __init__(self, terms, term_offsets, doc_ids, weights, n_docs):
+        self.terms = terms                  # term id -> term
+        self.vocabulary = {t: i for i, t in enumerate(terms)}
+        self.term_offsets = term_offsets    # (n_terms + 1,) into doc_ids/weights
+        self.doc_ids = doc_ids              # int32, sorted by term
+        self.weights = weights              # float32 BM25 weight of each posting
+        self.n_docs = n_docs
+        self.digest = ""                    # embeddings_digest of the corpus it was saved for
+        self.token_pattern = TOKEN_PATTERN  # tokenizer the postings were built with
+        self.tokenize = build_tokenizer(TOKEN_PATTERN)
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def build(cls, texts, k1=BM25_K1, b=BM25_B):
+        """Index an iterable of documents (one string per corpus row)"""
+        tokenize = build_tokenizer(TOKEN_PATTERN)
+        vocabulary = {}
+        term_ids, doc_ids, freqs, doc_lengths = [], [], [], []
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                freqs.append(tf)
+
+        n_docs = len(doc_lengths)
+        term_ids = np.array(term_ids, dtype=np.int64)
+        doc_ids = np.array(doc_ids, dtype=np.int32)
+        freqs = np.array(freqs, dtype=np.float32)
+        doc_lengths = np.array(doc_lengths, dtype=np.float32)
+
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, freqs = term_ids[order], doc_ids[order], freqs[order]
+        df = np.bincount(term_ids, minlength=len(vocabulary))
+        term_offsets = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+        # Query-independent part of BM25, precomputed per posting
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = doc_lengths.mean() if n_docs else 1.0
+        norm = k1 * (1 - b + b * doc_lengths[doc_ids] / max(avg_length, 1e-9))
+        weights = idf[term_ids] * freqs * (k1 + 1) / (freqs + norm)
+
+        terms = np.array(sorted(vocabulary, key=vocabulary.get), dtype=object)
+        return cls(terms, term_offsets, doc_ids, weights.astype(np.float32), n_docs)
+
+    def save(self, embeddings_path):
+        self.digest = embeddings_digest(embeddings_path)
+        np.savez(lexical_index_path(embeddings_path), terms=self.terms.astype(str),
+                 term_offsets=self.term_offsets, doc_ids=self.doc_ids, weights=self.weights,
+                 n_docs=self.n_docs, digest=self.digest, token_pattern=self.token_pattern)
+
+    @classmethod
+    def load(cls, embeddings_path):
+        with np.load(lexical_index_path(embeddings_path)) as data:
+            index = cls(data["terms"].astype(object), data["term_offsets"], data["doc_ids"],
+                        data["weights"], int(data["n_docs"]))
+            index.digest = stored_digest(data)
+            index.token_pattern = str(data["token_pattern"]) if "token_pattern" in data.files else ""
+        return index
+
+    def document_frequency(self, term):
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return 0
+        return int(self.term_offsets[term_id + 1] - self.term_offsets[term_id])
+
+    def _postings(self, term):
+        term_id = self.vocabulary[term]
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def search(self, terms, k=5, allowed=None):
+        """
+        Top-k documents for already-tokenized `terms`, best first.
+
+        `allowed` is an optional boolean row bitmap (see facet_index). Returns
+        (indices, scores) 1-D arrays with at most k entries (only documents
+        with a match).
+        """
+        known = [t for t in terms if t in self.vocabulary]
+        if not known:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        postings = [self._postings(t) for t in known]
+        docs = np.concatenate([p[0] for p in postings])
+        weights = np.concatenate([p[1] for p in postings])
+        if allowed is not None:
+            keep = allowed[docs]
+            docs, weights = docs[keep], weights[keep]
+
+        matched, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        k = min(k, len(matched))
+        best = np.argsort(-scores, kind="stable")[:k]
+        return matched[best].astype(np.int64), scores[best]
+
+    def is_decisive(self, terms, allowed=None):
+        """
+        True when `terms` look like an exact identifier lookup: a short query
+        with at least one rare term ("cdkn1a", "bion") and at least one
+        (allowed) document containing all of its terms.
+        """
+        if not terms or len(terms) > DECISIVE_MAX_TERMS:
+            return False
+        max_df = max(DECISIVE_MIN_DF, DECISIVE_MAX_DF_FRACTION * self.n_docs)
+        frequencies = [self.document_frequency(t) for t in terms]
+        if min(frequencies) == 0 or min(frequencies) > max_df:
+            return False
+        common = self._postings(terms[0])[0]
+        for term in terms[1:]:
+            common = np.intersect1d(common, self._postings(term)[0])
+        if allowed is not None:
+            common = common[allowed[common]]
+        return len(common) > 0
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuse several best-first lists of row ids: score(d) = sum 1 / (k + rank).
+
+    Returns (row ids, fused scores), best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            if idx >= 0:
+                fused[int(idx)] = fused.get(int(idx), 0.0) + 1.0 / (k + rank + 1)
+    order = sorted(fused, key=fused.get, reverse=True)
+    return np.array(order, dtype=np.int64), np.array([fused[i] for i in order], dtype=np.float32)
@@ -0,0 +1,139 @@
+"""
+Persistent cache of LLM outputs (paper summaries, entity extractions)
+
+The same paper in the same mode always produces the same prompt, so results
+are stored in SQLite and survive restarts. Entries are keyed on
+
+    (paper id, task, mode, prompt-template hash, model)
+
+so editing a prompt template or switching GROQ_MODEL misses automatically;
+drop_stale() also deletes the rows of superseded templates. The table is
+bounded: when it grows past `max_entries` the least recently used rows are
+evicted. One instance is shared by every session (the app wraps it in
+st.cache_resource), so the connection is guarded by a lock.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = 'data/llm_cache.sqlite'
+LLM_CACHE_MAX_ENTRIES = 20000
+# Evict a little below the bound so eviction does not run on every insert
+EVICTION_SLACK = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    paper_id      TEXT NOT NULL,
+    task          TEXT NOT NULL,
+    mode          TEXT NOT NULL,
+    template_hash TEXT NOT NULL,
+    model         TEXT NOT NULL,
+    value         TEXT NOT NULL,
+    created_at    REAL NOT NULL,
+    last_used     REAL NOT NULL,
+    PRIMARY KEY (paper_id, task, mode, template_hash, model)
+);
+CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used);
+"""
+
+
+def template_hash(template, **params):
+    """
+    Short stable hash of a prompt template and the generation settings that
+    change its output (temperature, max_tokens, truncation, ...).
+    """
+    material = json.dumps({'template': template, 'params': params}, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+class LLMCache:
+    """SQLite-backed LRU of JSON-serializable LLM results with hit/miss counters"""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Shared across Streamlit's script threads; every access holds the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get(self, paper_id, task, mode, template, model):
+        """Cached value or None; `template` is a template_hash()"""
+        key = (paper_id, task, mode, template, model)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM llm_cache WHERE paper_id=? AND task=? AND mode=? AND template_hash=? "
+                "AND model=?", key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute(
+                "UPDATE llm_cache SET last_used=? WHERE paper_id=? AND task=? AND mode=? "
+                "AND template_hash=? AND model=?", (time.time(),) + key)
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, paper_id, task, mode, template, model, value):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (paper_id, task, mode, template, model, json.dumps(value), now, now))
+            count = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                keep = int(self.max_entries * EVICTION_SLACK)
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE rowid IN "
+                    "(SELECT rowid FROM llm_cache ORDER BY last_used LIMIT ?)", (count - keep,))
+            self._db.commit()
+
+    def get_or_create(self, paper_id, task, mode, template, model, create):
+        """
+        Cached value, or `create()` stored for next time. `create` may return
+        None (e.g. the LLM call failed) to skip caching.
+        """
+        value = self.get(paper_id, task, mode, template, model)
+        if value is None:
+            value = create()
+            if value is not None:
+                self.put(paper_id, task, mode, template, model, value)
+        return value
+
+    def drop_stale(self, task, current_templates):
+        """Delete the rows of `task` written with any other template hash"""
+        current_templates = list(current_templates)
+        placeholders = ", ".join("?" * len(current_templates))
+        with self._lock:
+            deleted = self._db.execute(
+                f"DELETE FROM llm_cache WHERE task=? AND template_hash NOT IN ({placeholders})",
+                [task] + current_templates).rowcount
+            self._db.commit()
+        return deleted
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
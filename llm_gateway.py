@@ -0,0 +1,352 @@
+"""
+Shared gateway in front of the Groq client
+
+Every completion of the app (summaries, entities, chat) and of the batch jobs
+goes through one LLMGateway per process, which adds:
+
+- rate limiting: token buckets for requests per minute and tokens per minute.
+  A request reserves its estimated prompt tokens + max_tokens before it is
+  sent; the unused part is refunded from the reported usage.
+- retries: 429 / 5xx / connection errors are retried with jittered
+  exponential backoff, honouring Retry-After. The SDK's own retries should be
+  disabled (Groq(max_retries=0)) so attempts are not multiplied.
+- single-flight: identical requests already in flight are not sent again;
+  non-streamed callers share the response, streamed callers share one stream
+  (late joiners first get the text produced so far).
+- metrics: queueing delay in the limiter (mean / p50 / p95 / max), retries,
+  rate-limit responses and coalesced requests.
+
+One instance is shared by every session (the app wraps it in
+st.cache_resource), so all state is guarded by locks.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future
+
+try:
+    import groq
+    RETRYABLE_ERRORS = (groq.APIConnectionError,)  # includes APITimeoutError
+except ImportError:
+    RETRYABLE_ERRORS = ()
+
+# Free-tier limits of llama-3.3-70b-versatile
+GROQ_DEFAULT_RPM = 30
+GROQ_DEFAULT_TPM = 12000
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# Queueing delays kept for the percentiles
+DELAY_WINDOW = 1000
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Rough token count for rate limiting (~4 characters per token)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to the same capacity"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """
+        Take `amount` units now, going into debt if needed; returns how long
+        the caller must wait before its share is actually available.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _Broadcast:
+    """Text chunks of one upstream stream, replayed to every subscriber"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def abandoned(self):
+        with self._cond:
+            return self.subscribers == 0
+
+    def subscribe(self):
+        with self._cond:
+            self.subscribers += 1
+        return _Subscription(self)
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+
+class _Subscription:
+    """
+    Iterator over the chunks of a _Broadcast. It holds its subscriber slot
+    until it is exhausted or closed (explicitly, as a context manager or when
+    garbage-collected), even when it is never iterated.
+    """
+
+    def __init__(self, broadcast):
+        self._broadcast = broadcast
+        self._position = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        broadcast = self._broadcast
+        if self._closed:
+            raise StopIteration
+        with broadcast._cond:
+            while self._position == len(broadcast.chunks) and not broadcast.done:
+                broadcast._cond.wait()
+            if self._position < len(broadcast.chunks):
+                self._position += 1
+                return broadcast.chunks[self._position - 1]
+            error = broadcast.error
+        self.close()
+        if error is not None:
+            raise error
+        raise StopIteration
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._broadcast.unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+class LLMGateway:
+    """Rate-limited, retrying, coalescing wrapper of client.chat.completions.create"""
+
+    def __init__(self, client, rpm=GROQ_DEFAULT_RPM, tpm=GROQ_DEFAULT_TPM, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS):
+        self.client = client
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._delays = deque(maxlen=DELAY_WINDOW)
+        self.sent = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.coalesced = 0
+        self.delay_max = 0.0
+
+    @staticmethod
+    def _key(request):
+        material = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _reserve(self, request):
+        """Wait for a request slot and the estimated tokens; returns the token reservation"""
+        reserved = sum(estimate_tokens(m.get('content', '')) for m in request['messages'])
+        reserved += request.get('max_tokens') or 0
+        delay = max(self.requests.reserve(1), self.tokens.reserve(reserved))
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self._delays.append(delay)
+            self.delay_max = max(self.delay_max, delay)
+        return reserved
+
+    def _backoff(self, attempt, error):
+        """Jittered exponential delay, at least the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def _retryable(self, error):
+        status = getattr(error, 'status_code', None)
+        if status == 429:
+            with self._lock:
+                self.rate_limited += 1
+            return True
+        return (status is not None and status >= 500) or isinstance(error, RETRYABLE_ERRORS)
+
+    def _send(self, request):
+        """One upstream call with rate limiting and retries: (response, tokens reserved)"""
+        for attempt in range(self.max_retries + 1):
+            reserved = self._reserve(request)
+            try:
+                with self._lock:
+                    self.sent += 1
+                return self.client.chat.completions.create(**request), reserved
+            except Exception as e:
+                # A failed attempt generated nothing: give back its tokens
+                # before the next one reserves them again
+                self.tokens.refund(reserved)
+                if attempt == self.max_retries or not self._retryable(e):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self._backoff(attempt, e))
+
+    def complete(self, **request):
+        """
+        Non-streamed completion (same keyword arguments as the SDK). Callers
+        with an identical request in flight wait for it and share its response.
+        """
+        key = self._key(request)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            response, reserved = self._send(request)
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                self.tokens.refund(max(0, reserved - usage.total_tokens))
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stream(self, **request):
+        """
+        Iterator of the text deltas of a streamed completion. Identical
+        in-flight requests share one upstream stream, read by a background
+        thread that stops (closing the HTTP response) once every subscriber
+        has been closed, e.g. after a Streamlit rerun; subscribers still
+        attached then get a CancelledError rather than a truncated text.
+        Close the iterator (or use it as a context manager) when not reading
+        it to the end.
+        """
+        request = dict(request, stream=True)
+        key = self._key(request)
+        with self._lock:
+            broadcast = self._in_flight.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._in_flight[key] = _Broadcast()
+            else:
+                self.coalesced += 1
+            subscription = broadcast.subscribe()
+        if leader:
+            threading.Thread(target=self._pump, args=(key, broadcast, request), daemon=True).start()
+        return subscription
+
+    def _pump(self, key, broadcast, request):
+        error = None
+        produced = 0
+        reserved = 0
+        stream = None
+        try:
+            stream, reserved = self._send(request)
+            for chunk in stream:
+                if self._abandon(key, broadcast):
+                    error = CancelledError("Every subscriber stopped reading the stream")
+                    break
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    produced += len(delta)
+                    broadcast.publish(delta)
+        except Exception as e:
+            error = e
+        finally:
+            # Unshared before the (possibly slow) close: an identical request
+            # arriving now starts a new stream instead of joining this one.
+            # _abandon may have done it already and that new stream be the
+            # one registered under `key` by now: leave it alone
+            with self._lock:
+                if self._in_flight.get(key) is broadcast:
+                    del self._in_flight[key]
+            broadcast.finish(error)
+            if stream is not None:
+                stream.close()
+            if reserved:
+                prompt = sum(estimate_tokens(m.get('content', '')) for m in request['messages'])
+                self.tokens.refund(max(0, reserved - prompt - produced // CHARS_PER_TOKEN))
+
+    def _abandon(self, key, broadcast):
+        """
+        Unshare `broadcast` when nobody reads it any more. Checked under the
+        lock stream() subscribes under, so no caller can join in between.
+        """
+        with self._lock:
+            if not broadcast.abandoned():
+                return False
+            self._in_flight.pop(key, None)
+            return True
+
+    def stats(self):
+        with self._lock:
+            # Mean and percentiles over the same window of recent requests
+            delays = sorted(self._delays)
+            n = len(delays)
+            return {
+                'sent': self.sent,
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight),
+                'queue_delay_mean': sum(delays) / n if n else 0.0,
+                'queue_delay_p50': delays[n // 2] if n else 0.0,
+                'queue_delay_p95': delays[min(n - 1, int(n * 0.95))] if n else 0.0,
+                'queue_delay_max': self.delay_max,
+            }
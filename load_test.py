@@ -0,0 +1,287 @@
+"""
+Load test of the app's search and LLM paths with simulated users
+
+Drives N concurrent users through the functions behind each page of
+appenglish.py, timing every stage:
+
+  search    semantic_search (BM25 + dense hybrid)
+  summary   generate_summary for every result (streamed)
+  entities  extract_entities for every result without precomputed entities
+  combined  generate_summary_and_entities instead, with LLM_CALL_MODE=combined
+  chat      pack_context + generate_chat_response, fully consumed
+            (chat ttft: time to the first streamed chunk)
+
+Like the app, every turn runs the LLM calls of the whole top-k concurrently
+(LLM_MAX_CONCURRENCY workers). Users draw distinct questions (topic x organism
+x phrasing combinations, over two thousand) until they are exhausted.
+
+It reports count, errors, p50/p95/p99 latency and throughput per stage, plus
+the gateway's retries, coalesced requests and queueing delay. Failures the
+app surfaces as text ("⚠️ Error ...") or as an entity 'error' count as errors.
+
+Meant to run against mock_groq_server.py, so no Groq quota is used:
+
+    python mock_groq_server.py --latency lognormal --error-429 0.05 --error-5xx 0.02 &
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=mock python load_test.py --users 20 --duration 60
+
+It imports appenglish (so it needs the app's dependencies); Streamlit's
+"missing ScriptRunContext" warnings outside `streamlit run` are harmless.
+By default nothing is cached, so every summary and entity call and every
+chat answer reaches the backend (the chat answer cache is never used).
+--llm-cache keeps summaries and entities in a temporary LLM cache as in
+production and reports the calls answered from it as separate "hit" stages.
+--rpm/--tpm set the gateway budget (default: effectively unlimited, to
+measure the backend).
+
+Usage: python load_test.py [--users 10] [--duration 30] [--think-ms 500] [--top-k 5] [--llm-cache] [--real]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Question parts, combined into distinct questions
+FACTORS = [
+    "microgravity", "space radiation", "spaceflight", "simulated microgravity", "hypergravity",
+    "hindlimb unloading", "long-duration missions", "isolation and confinement", "cosmic rays",
+    "altered light cycles",
+]
+SYSTEMS = [
+    "bone density", "muscle mass", "the immune system", "gene expression", "the cardiovascular system",
+    "root growth", "the gut microbiome", "DNA repair", "oxidative stress", "vision", "stem cells",
+    "circadian rhythms",
+]
+SUBJECTS = ["astronauts", "mice", "rats", "Arabidopsis", "C. elegans", "Drosophila", "human cell cultures",
+            "bacteria"]
+TEMPLATES = [
+    "effects of {factor} on {system} in {subject}",
+    "How does {factor} change {system} of {subject}?",
+    "{system} in {subject} exposed to {factor}",
+]
+STAGES = ["search", "summary", "summary hit", "entities", "entities hit", "combined", "combined hit", "chat",
+          "chat ttft"]
+# How each LLM stage reports a failure
+FAILED = {
+    'summary': lambda value: value.startswith("⚠️ Error"),
+    'entities': lambda value: 'error' in value,
+    'combined': lambda value: value['summary'].startswith("⚠️ Error") or 'error' in value['entities'],
+}
+UNLIMITED = 1e9
+
+
+class QuestionPool:
+    """Distinct questions in random order, shared by every user; repeats only once all were asked"""
+
+    def __init__(self, seed=0):
+        self.questions = [template.format(factor=factor, system=system, subject=subject)
+                          for template, factor, system, subject
+                          in itertools.product(TEMPLATES, FACTORS, SYSTEMS, SUBJECTS)]
+        random.Random(seed).shuffle(self.questions)
+        self.asked = 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            question = self.questions[self.asked % len(self.questions)]
+            self.asked += 1
+            return question
+
+
+class CacheProbe:
+    """
+    LLM cache handed to one app call: forwards to `cache` (None: nothing is
+    cached) and remembers whether the call was answered from it
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.hit = False
+
+    def get(self, *key):
+        value = self.cache.get(*key) if self.cache is not None else None
+        self.hit = value is not None
+        return value
+
+    def put(self, *key_and_value):
+        if self.cache is not None:
+            self.cache.put(*key_and_value)
+
+    def get_or_create(self, *key_and_create):
+        *key, create = key_and_create
+        value = self.get(*key)
+        if value is None:
+            value = create()
+            if value is not None:
+                self.put(*key, value)
+        return value
+
+
+class Recorder:
+    """Thread-safe latency samples and error counts per stage"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, failed=False):
+        with self._lock:
+            self.samples[stage].append(seconds)
+            self.errors[stage] += failed
+
+    def fail(self, stage):
+        with self._lock:
+            self.errors[stage] += 1
+
+
+def timed(recorder, stage, fn, is_error=lambda value: False):
+    start = time.perf_counter()
+    try:
+        value = fn()
+    except Exception:
+        recorder.fail(stage)
+        return None
+    recorder.add(stage, time.perf_counter() - start, is_error(value))
+    return value
+
+
+def llm_tasks(app, result, mode, cache):
+    """(stage, probe, call) of every LLM call the results page makes for `result`"""
+    gateway = app.load_llm_gateway()
+    # Precomputed entities are shown without a call
+    wants_entities = app.precomputed_entities(result) is None
+    if app.LLM_CALL_MODE == 'combined' and wants_entities:
+        layouts = [('combined', True, True)]
+    else:
+        layouts = [('summary', True, None), ('entities', None, True if wants_entities else None)]
+    tasks = []
+    for stage, summary_slot, entities_slot in layouts:
+        probe = CacheProbe(cache)
+        # Any non-None placeholder: only the calls are used, not the rendering
+        for _, _, call, _ in app.result_llm_tasks(result, mode, summary_slot, entities_slot, probe, gateway):
+            tasks.append((stage, probe, call))
+    return tasks
+
+
+def run_llm_task(recorder, stage, probe, call):
+    start = time.perf_counter()
+    try:
+        value = call()
+    except Exception:
+        recorder.fail(stage)
+        return
+    failed = FAILED[stage](value)
+    recorder.add(f"{stage} hit" if probe.hit else stage, time.perf_counter() - start, failed)
+
+
+def chat_turn(app, recorder, question, mode, results):
+    from context_packer import pack_context
+    packed = pack_context(results, app.CHAT_CONTEXT_BUDGET)
+    start = time.perf_counter()
+    first = None
+    answer = ""
+    try:
+        for chunk in app.generate_chat_response(question, packed['text'], mode, n_papers=len(packed['papers'])):
+            if first is None:
+                first = time.perf_counter() - start
+            answer += chunk
+    except Exception:
+        recorder.fail("chat")
+        return
+    failed = answer.startswith("⚠️")
+    recorder.add("chat", time.perf_counter() - start, failed)
+    if first is not None and not failed:
+        recorder.add("chat ttft", first)
+
+
+def simulated_user(app, recorder, user, args, deadline, questions, cache):
+    rng = random.Random(user)
+    think = args.think_ms / 1000
+    with ThreadPoolExecutor(max_workers=app.LLM_MAX_CONCURRENCY) as pool:
+        while time.monotonic() < deadline:
+            question = questions.next()
+            mode = rng.choice(["academic", "outreach"])
+            results = timed(recorder, "search", lambda: app.semantic_search(question, top_k=args.top_k))
+            if results:
+                # The whole top-k at once, as the results page does
+                tasks = [task for result in results for task in llm_tasks(app, result, mode, cache)]
+                for future in [pool.submit(run_llm_task, recorder, *task) for task in tasks]:
+                    future.result()
+                chat_turn(app, recorder, question, mode, results)
+            time.sleep(rng.uniform(0, 2 * think))
+
+
+def report(recorder, elapsed, users, questions, gateway_stats):
+    print("=" * 81)
+    print(f"🚦 LOAD TEST  users={users}  duration={elapsed:.1f} s  "
+          f"questions={questions.asked:,} ({min(questions.asked, len(questions.questions)):,} distinct)")
+    print("=" * 81)
+    print(f"{'stage':>12} | {'count':>6} | {'errors':>6} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+          f"{'ops/s':>7}")
+    print("-" * 81)
+    for stage in STAGES:
+        samples = np.array(recorder.samples.get(stage, [])) * 1000
+        if len(samples) == 0 and not recorder.errors.get(stage):
+            continue
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) if len(samples) else (np.nan,) * 3
+        print(f"{stage:>12} | {len(samples):>6} | {recorder.errors.get(stage, 0):>6} | {p50:>8.0f} | {p95:>8.0f} | "
+              f"{p99:>8.0f} | {len(samples) / elapsed:>7.2f}")
+    print("-" * 81)
+    print(f"gateway: {gateway_stats['sent']:,} requests sent, {gateway_stats['retries']:,} retries "
+          f"({gateway_stats['rate_limited']:,} after 429), {gateway_stats['coalesced']:,} coalesced, "
+          f"queue delay p50 {gateway_stats['queue_delay_p50'] * 1000:.0f} ms / "
+          f"p95 {gateway_stats['queue_delay_p95'] * 1000:.0f} ms")
+
+
+def main(args):
+    if not os.getenv('GROQ_BASE_URL') and not args.real:
+        sys.exit("GROQ_BASE_URL is not set: point it at mock_groq_server.py, or pass --real to use Groq quota")
+
+    # The app reads its configuration at import time
+    os.environ.setdefault('GROQ_API_KEY', 'mock')
+    os.environ['GROQ_RPM'] = str(args.rpm)
+    os.environ['GROQ_TPM'] = str(args.tpm)
+    cache_dir = tempfile.mkdtemp(prefix='load_test_')
+    os.environ['LLM_CACHE_PATH'] = os.path.join(cache_dir, 'llm_cache.sqlite')
+    import appenglish as app
+
+    # Shared resources are created up front, not by the first users at once
+    app.load_corpus()
+    app.load_query_cache()
+    app.load_llm_gateway()
+    cache = app.load_llm_cache() if args.llm_cache else None
+    questions = QuestionPool()
+    recorder = Recorder()
+    start = time.monotonic()
+    deadline = start + args.duration
+    users = [threading.Thread(target=simulated_user, args=(app, recorder, user, args, deadline, questions, cache),
+                              daemon=True)
+             for user in range(args.users)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    report(recorder, time.monotonic() - start, args.users, questions, app.load_llm_gateway().stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated-user load test of search, summaries, entities and chat")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run (users finish their turn)")
+    parser.add_argument("--think-ms", type=float, default=500, help="Mean pause between a user's turns")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rpm", type=float, default=UNLIMITED, help="Gateway requests/minute budget")
+    parser.add_argument("--tpm", type=float, default=UNLIMITED, help="Gateway tokens/minute budget")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="Cache summaries and entities (temporary cache) and report hits separately")
+    parser.add_argument("--real", action="store_true", help="Allow running against the real Groq API")
+    main(parser.parse_args())
@@ -0,0 +1,184 @@
+"""
+Asynchronous, connection-pooled page harvester
+
+Fetches many article pages concurrently over one pooled httpx.AsyncClient
+and hands each body to a parse function (run in a worker thread so
+BeautifulSoup doesn't stall the event loop). Politeness is per host: at most
+`per_host` requests in flight and at most `rate` request starts per second
+(NCBI asks for 3/s without an API key). Timeouts, 429 and 5xx responses are
+retried with jittered exponential backoff, honouring Retry-After.
+
+harvest_to_jsonl() appends one line per URL to a JSONL file as soon as it
+completes ({"url", "record"} or {"url", "error"}), so an interrupted run
+keeps everything fetched so far; load_harvest() reads the successes back and
+lets the caller skip them on the next run. With an http_cache.HTTPCache,
+pages fetched before are revalidated with conditional GETs instead of
+downloaded again.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+HARVEST_CONCURRENCY = 16
+PER_HOST_CONCURRENCY = 4
+PER_HOST_RATE = 3.0
+TIMEOUT_SECONDS = 15.0
+CONNECT_TIMEOUT_SECONDS = 5.0
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HarvestError(Exception):
+    """A page answered with an error status"""
+
+
+class HostLimiter:
+    """Caps concurrent requests to one host and spaces their starts 1/rate seconds apart"""
+
+    def __init__(self, concurrency, rate):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+def rebase_url(url, base_url):
+    """`url` with its scheme and host replaced by those of `base_url` (for local stand-in servers)"""
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+
+class Harvester:
+    """Fetch + parse many URLs with pooled connections and per-host limits"""
+
+    def __init__(self, parse, concurrency=HARVEST_CONCURRENCY, per_host=PER_HOST_CONCURRENCY,
+                 rate=PER_HOST_RATE, timeout=TIMEOUT_SECONDS, retries=MAX_RETRIES, base_url=None, cache=None):
+        self.parse = parse
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate = rate
+        self.timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT_SECONDS)
+        self.retries = retries
+        self.base_url = base_url
+        self.cache = cache
+        self.limiters = {}
+
+    def _limiter(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(self.per_host, self.rate)
+        return self.limiters[host]
+
+    async def fetch(self, client, url):
+        """Body of `url` (bytes); retries timeouts, connection errors, 429 and 5xx"""
+        target = rebase_url(url, self.base_url) if self.base_url else url
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                async with self._limiter(target):
+                    if self.cache is not None:
+                        response = await self.cache.aget(client, target)
+                    else:
+                        response = await client.get(target)
+                if response.status_code < 400:
+                    return response.content
+                error = HarvestError(f"HTTP {response.status_code} for {target}")
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+                retry_after = response.headers.get('retry-after')
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = e
+            if attempt == self.retries:
+                raise error
+            delay = random.uniform(0, BACKOFF_SECONDS * 2 ** attempt)
+            try:
+                delay = max(delay, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+            await asyncio.sleep(delay)
+
+    async def _process(self, client, url):
+        try:
+            content = await self.fetch(client, url)
+            record = await asyncio.to_thread(self.parse, content, url)
+        except Exception as e:
+            return url, None, f"{type(e).__name__}: {e}"
+        if record is None:
+            return url, None, "parse failed"
+        return url, record, None
+
+    async def run(self, urls, on_result):
+        """Call on_result(url, record, error) for every URL as it completes"""
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        pending = asyncio.Queue()
+        for url in urls:
+            pending.put_nowait(url)
+
+        async with httpx.AsyncClient(headers={'User-Agent': USER_AGENT}, timeout=self.timeout, limits=limits,
+                                     follow_redirects=True) as client:
+            async def worker():
+                while True:
+                    try:
+                        url = pending.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    on_result(*await self._process(client, url))
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+
+def load_harvest(path):
+    """url -> record of the successful lines of a harvest JSONL file"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line cut short if the process died
+            if entry.get('record') is not None:
+                done[entry['url']] = entry['record']
+    return done
+
+
+def harvest_to_jsonl(urls, parse, path, on_progress=None, harvester_class=Harvester, **options):
+    """
+    Harvest `urls` (see Harvester for options), appending each result to
+    `path` as it completes. Returns (succeeded, failed) counts.
+    `harvester_class` is a Harvester subclass, e.g. one overriding fetch().
+    """
+    counts = [0, 0]
+    with open(path, 'a', encoding='utf-8') as out:
+        def on_result(url, record, error):
+            entry = {'url': url, 'record': record} if error is None else {'url': url, 'error': error}
+            out.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            out.flush()
+            counts[error is not None] += 1
+            if on_progress is not None:
+                on_progress(url, error)
+
+        asyncio.run(harvester_class(parse, **options).run(urls, on_result))
+    return tuple(counts)
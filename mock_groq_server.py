@@ -0,0 +1,240 @@
+"""
+Local fake of the Groq chat-completions endpoint
+
+Speaks the OpenAI-compatible wire format used by the groq SDK, including
+server-sent-event streaming, so the app can be exercised without an API key,
+network or token cost:
+
+    python mock_groq_server.py --port 8765
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=mock streamlit run appenglish.py
+
+(the groq SDK reads GROQ_BASE_URL itself). Combined prompts (asking for
+"summary" and "entities") and entity prompts ("Respond ONLY with JSON") get a
+JSON object back; every other prompt gets canned prose derived from its
+title. Prompt token usage is estimated at ~4 characters per token.
+
+Tokens are emitted one word at a time after a first-token delay drawn from a
+configurable distribution (fixed, uniform or lognormal around
+--first-token-ms), and a client that disconnects mid-stream is logged as
+cancelled, which is how rerun cancellation can be checked.
+
+For load tests (load_test.py) a fraction of requests can fail with 429 (with
+a Retry-After header) or 503, before any token is sent, so the gateway's
+retries and backoff get exercised.
+
+Usage: python mock_groq_server.py [--port 8765] [--first-token-ms 300] [--token-ms 20]
+                                  [--latency fixed|uniform|lognormal] [--jitter 0.5]
+                                  [--error-429 0.05] [--error-5xx 0.02] [--retry-after 1]
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATHS = ('/openai/v1/chat/completions', '/v1/chat/completions')
+MOCK_ENTITIES = {
+    "organism": "Mus musculus",
+    "condition": "Microgravity",
+    "key_finding": "Mock finding returned by the local fake endpoint",
+    "methodology": "Spaceflight experiment",
+}
+MOCK_SENTENCES = [
+    "This mock response stands in for a Llama completion about {title}.",
+    "It is generated locally, word by word, so streaming can be observed in the interface.",
+    "The first point describes the experimental design aboard the International Space Station.",
+    "The second point reports the main results and the measured changes relative to ground controls.",
+    "The third point explains why the findings matter for long-duration missions to the Moon and Mars.",
+]
+
+
+def mock_completion(messages, max_tokens):
+    """Deterministic reply text for a chat request, cut to about max_tokens words"""
+    prompt = messages[-1].get('content', '') if messages else ''
+    match = re.search(r'^Title: (.+)$', prompt, flags=re.MULTILINE)
+    title = match.group(1).strip() if match else 'the question'
+    sentences = [sentence.format(title=title) for sentence in MOCK_SENTENCES]
+    if '"summary"' in prompt and '"entities"' in prompt:
+        return json.dumps({"summary": sentences[2:], "entities": MOCK_ENTITIES})
+    if 'Respond ONLY with JSON' in prompt:
+        return json.dumps(MOCK_ENTITIES)
+    words = " ".join(sentences).split(" ")
+    return " ".join(words[:max_tokens])
+
+
+def sample_delay(median, distribution, jitter):
+    """Delay in seconds: `median` itself, uniform within ±jitter, or lognormal with sigma=jitter"""
+    if distribution == 'uniform':
+        return random.uniform(median * (1 - jitter), median * (1 + jitter))
+    if distribution == 'lognormal':
+        return median * random.lognormvariate(0, jitter)
+    return median
+
+
+def prompt_tokens(messages):
+    """Rough prompt size: ~4 characters per token"""
+    return sum(len(m.get('content', '')) for m in messages) // 4
+
+
+def tokenize(text):
+    """Word-sized chunks that concatenate back to `text`"""
+    return re.findall(r'\S+\s*|\s+', text)
+
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    first_token_delay = 0.3
+    token_delay = 0.02
+    latency = 'fixed'
+    jitter = 0.5
+    error_429 = 0.0
+    error_5xx = 0.0
+    retry_after = 1.0
+
+    def do_POST(self):
+        if self.path not in COMPLETIONS_PATHS:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        text = mock_completion(request.get('messages', []), int(request.get('max_tokens') or 1024))
+        model = request.get('model', 'mock')
+
+        roll = random.random()
+        if roll < self.error_429:
+            self._send_json(429, {"error": {"message": "Rate limit reached (injected by mock)",
+                                            "type": "tokens", "code": "rate_limit_exceeded"}},
+                            headers={'Retry-After': f"{self.retry_after:g}"})
+            print(f"{'error':>6} |    0 tokens |       0 ms | injected 429", flush=True)
+            return
+        if roll < self.error_429 + self.error_5xx:
+            self._send_json(503, {"error": {"message": "Service unavailable (injected by mock)",
+                                            "type": "internal_server_error"}})
+            print(f"{'error':>6} |    0 tokens |       0 ms | injected 503", flush=True)
+            return
+
+        start = time.perf_counter()
+        time.sleep(sample_delay(self.first_token_delay, self.latency, self.jitter))
+        if request.get('stream'):
+            sent, complete = self._stream(model, tokenize(text))
+        else:
+            time.sleep(self.token_delay * len(tokenize(text)))
+            self._send_json(200, completion_body(model, text, prompt_tokens(request.get('messages', []))))
+            sent, complete = len(tokenize(text)), True
+        self.server.outcomes.append(complete)
+        status = "done" if complete else "cancelled by client"
+        print(f"{'stream' if request.get('stream') else 'plain':>6} | {sent:>4} tokens | "
+              f"{(time.perf_counter() - start) * 1000:>7.0f} ms | {status}", flush=True)
+
+    def _stream(self, model, tokens):
+        """Send tokens as SSE chunks; returns (tokens sent, finished normally)"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        sent = 0
+        try:
+            self._send_event(chunk_body(completion_id, model, {"role": "assistant", "content": ""}))
+            for token in tokens:
+                self._send_event(chunk_body(completion_id, model, {"content": token}))
+                sent += 1
+                time.sleep(self.token_delay)
+            self._send_event(chunk_body(completion_id, model, {}, finish_reason="stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return sent, False
+        return sent, True
+
+    def _send_event(self, body):
+        self.wfile.write(f"data: {json.dumps(body)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # One summary line per request is printed by do_POST instead
+        pass
+
+
+def completion_body(model, text, n_prompt=0):
+    n_tokens = len(tokenize(text))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": n_prompt, "completion_tokens": n_tokens, "total_tokens": n_prompt + n_tokens},
+    }
+
+
+def chunk_body(completion_id, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def make_server(port, first_token_ms, token_ms, latency='fixed', jitter=0.5, error_429=0.0, error_5xx=0.0,
+                retry_after=1.0):
+    """
+    Bound, not yet serving, server (port 0 picks a free one). Its `outcomes`
+    list gets, per completed request, whether the client read it to the end.
+    """
+    MockGroqHandler.first_token_delay = first_token_ms / 1000
+    MockGroqHandler.token_delay = token_ms / 1000
+    MockGroqHandler.latency = latency
+    MockGroqHandler.jitter = jitter
+    MockGroqHandler.error_429 = error_429
+    MockGroqHandler.error_5xx = error_5xx
+    MockGroqHandler.retry_after = retry_after
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockGroqHandler)
+    server.outcomes = []
+    return server
+
+
+def serve(port, first_token_ms, token_ms, latency='fixed', jitter=0.5, error_429=0.0, error_5xx=0.0,
+          retry_after=1.0):
+    server = make_server(port, first_token_ms, token_ms, latency, jitter, error_429, error_5xx, retry_after)
+    port = server.server_address[1]
+    print(f"Mock Groq endpoint on http://127.0.0.1:{port} "
+          f"(first token {first_token_ms} ms {latency}, then {token_ms} ms/token; "
+          f"errors: {error_429:.0%} 429, {error_5xx:.0%} 503)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Groq chat-completions endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between streamed tokens")
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="fixed",
+                        help="Distribution of the first-token delay around --first-token-ms")
+    parser.add_argument("--jitter", type=float, default=0.5,
+                        help="Spread: ±fraction for uniform, sigma for lognormal")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+    serve(args.port, args.first_token_ms, args.token_ms, args.latency, args.jitter, args.error_429,
+          args.error_5xx, args.retry_after)
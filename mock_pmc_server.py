@@ -0,0 +1,201 @@
+"""
+Local stand-in for PMC article pages
+
+Serves /pmc/articles/PMC<id>/ with the meta tags and abstract markup the
+scrapers read (citation_title, citation_author, citation_publication_date,
+div.abstract), built from the rows of data/publicaciones.csv, so harvesting
+can be run and timed without touching NCBI:
+
+    python mock_pmc_server.py --port 8766 --latency-ms 200 &
+    python extract_authors_simple.py data/publicaciones.csv --base-url http://127.0.0.1:8766
+
+/pmc/articles/PMC<id>/pdf/ answers with a small PDF, or, for a stable
+fraction of ids, with what PMC sometimes sends instead: an HTML landing page
+whose citation_pdf_url meta points at the file (--pdf-landing-rate), or a
+page with no link at all that only a browser gets past (--pdf-blocked-rate),
+to exercise DOWNLOADPAPER/descarga_pdfs_pmc.py.
+
+Unknown ids get a 404. Pages carry an ETag and Last-Modified and conditional
+GETs that match get a 304, as a CDN would answer, to exercise http_cache. A
+fraction of requests can fail with 503 (--error-rate) to exercise retries,
+and each log line shows how many requests were in flight, to check the
+harvester's per-host concurrency limit. make_server() binds the server
+without running it, for tests: its handler class counts the requests per
+path and the peak in flight, and `scripted` makes chosen paths fail with
+given statuses before they are served normally.
+
+Usage: python mock_pmc_server.py [--port 8766] [--latency-ms 200] [--error-rate 0.0] [--csv data/publicaciones.csv]
+                                 [--pdf-landing-rate 0.1] [--pdf-blocked-rate 0.05]
+"""
+
+import argparse
+import hashlib
+import html
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+ARTICLE_PATH = re.compile(r'^/pmc/articles/(PMC\d+)/?$')
+PDF_PATH = re.compile(r'^/pmc/articles/(PMC\d+)/pdf/?([^/]*\.pdf)?$')
+LAST_MODIFIED = 'Wed, 01 Oct 2025 00:00:00 GMT'
+
+
+def fake_pdf(pmc_id):
+    """A minimal, valid-looking PDF for one article"""
+    return (f"%PDF-1.4\n% {pmc_id}\n1 0 obj << /Type /Catalog >> endobj\n" + "0" * 2048 + "\n%%EOF\n").encode('ascii')
+
+
+def pdf_variant(pmc_id, landing_rate, blocked_rate):
+    """'pdf', 'landing' or 'blocked', stable per id so reruns see the same answer"""
+    draw = int(hashlib.sha1(pmc_id.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+    if draw < blocked_rate:
+        return 'blocked'
+    if draw < blocked_rate + landing_rate:
+        return 'landing'
+    return 'pdf'
+
+
+def article_page(row):
+    """PMC-like HTML for one publication row"""
+    authors = row.get('authors') if isinstance(row.get('authors'), str) else ''
+    metas = [f'<meta name="citation_title" content="{html.escape(str(row.get("title", "")))}">']
+    metas += [f'<meta name="citation_author" content="{html.escape(a.strip())}">'
+              for a in authors.split(',') if a.strip() and authors != 'N/A']
+    year = row.get('year')
+    if isinstance(year, (int, float)) and year == year:
+        metas.append(f'<meta name="citation_publication_date" content="{int(year)} Jan 1">')
+    abstract = row.get('abstract_text') if isinstance(row.get('abstract_text'), str) else ''
+    abstract = re.sub(r'^Abstract', '', abstract)
+    return (f"<!DOCTYPE html><html><head><title>{html.escape(str(row.get('title', '')))}</title>"
+            f"{''.join(metas)}</head><body><div class=\"abstract\"><h2>Abstract</h2>"
+            f"<p>{html.escape(abstract)}</p></div></body></html>")
+
+
+class MockPMCHandler(BaseHTTPRequestHandler):
+    pages = {}
+    latency = 0.2
+    error_rate = 0.0
+    pdf_landing_rate = 0.0
+    pdf_blocked_rate = 0.0
+    in_flight = 0
+    peak_in_flight = 0
+    served = 0
+    hits = Counter()
+    scripted = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            MockPMCHandler.in_flight += 1
+            MockPMCHandler.peak_in_flight = max(MockPMCHandler.peak_in_flight, MockPMCHandler.in_flight)
+            MockPMCHandler.hits[self.path] += 1
+            concurrent = MockPMCHandler.in_flight
+            script = self.scripted.get(self.path)
+            forced = script.pop(0) if script else None
+        try:
+            time.sleep(self.latency)
+            match = ARTICLE_PATH.match(self.path) or PDF_PATH.match(self.path)
+            content_type = 'text/html; charset=utf-8'
+            if forced is not None:
+                status, body = forced, f"Error {forced} (scripted by mock)"
+            elif random.random() < self.error_rate:
+                status, body = 503, "Service unavailable (injected by mock)"
+            elif match is None or match.group(1) not in self.pages:
+                status, body = 404, "Not found"
+            elif match.re is ARTICLE_PATH:
+                status, body = 200, self.pages[match.group(1)]
+            else:
+                status, body, content_type = self.pdf_response(match.group(1), match.group(2))
+            payload = body if isinstance(body, bytes) else body.encode('utf-8')
+            etag = f'"{hashlib.sha1(payload).hexdigest()[:16]}"'
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                status, payload = 304, b''
+            self.send_response(status)
+            if status == 429:
+                self.send_header('Retry-After', '0')
+            if status in (200, 304):
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', LAST_MODIFIED)
+            self.send_header('Content-Type', content_type)
+            if status != 304:
+                self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with self.lock:
+                MockPMCHandler.in_flight -= 1
+                MockPMCHandler.served += 1
+                served = MockPMCHandler.served
+        print(f"{status} | {self.path:<32} | {concurrent:>3} in flight | #{served}", flush=True)
+
+    def pdf_response(self, pmc_id, filename):
+        variant = pdf_variant(pmc_id, self.pdf_landing_rate, self.pdf_blocked_rate)
+        if variant == 'blocked':
+            return 200, "<html><body><p>Preparing to download...</p><script>/* challenge */</script></body></html>", \
+                'text/html; charset=utf-8'
+        if variant == 'landing' and not filename:
+            return 200, (f'<html><head><meta name="citation_pdf_url" '
+                         f'content="/pmc/articles/{pmc_id}/pdf/{pmc_id}.pdf"></head><body></body></html>'), \
+                'text/html; charset=utf-8'
+        return 200, fake_pdf(pmc_id), 'application/pdf'
+
+    def log_message(self, format, *args):
+        # One line per request is printed by do_GET instead
+        pass
+
+
+def load_pages(csv_path):
+    """PMC id -> page, for every row whose link is a PMC article URL"""
+    pages = {}
+    df = pd.read_csv(csv_path)
+    link_col = 'source_url' if 'source_url' in df.columns else 'Link'
+    for row in df.to_dict('records'):
+        match = re.search(r'(PMC\d+)', str(row.get(link_col, '')))
+        if match:
+            pages.setdefault(match.group(1), article_page(row))
+    return pages
+
+
+def make_server(port, latency_ms, error_rate, csv_path, pdf_landing_rate=0.0, pdf_blocked_rate=0.0):
+    """Bound, not yet serving, server with fresh counters (port 0 picks a free one)"""
+    MockPMCHandler.pages = load_pages(csv_path)
+    MockPMCHandler.latency = latency_ms / 1000
+    MockPMCHandler.error_rate = error_rate
+    MockPMCHandler.pdf_landing_rate = pdf_landing_rate
+    MockPMCHandler.pdf_blocked_rate = pdf_blocked_rate
+    MockPMCHandler.in_flight = MockPMCHandler.peak_in_flight = MockPMCHandler.served = 0
+    MockPMCHandler.hits = Counter()
+    MockPMCHandler.scripted = {}
+    return ThreadingHTTPServer(('127.0.0.1', port), MockPMCHandler)
+
+
+def serve(port, latency_ms, error_rate, csv_path, pdf_landing_rate=0.0, pdf_blocked_rate=0.0):
+    server = make_server(port, latency_ms, error_rate, csv_path, pdf_landing_rate, pdf_blocked_rate)
+    port = server.server_address[1]
+    print(f"Mock PMC on http://127.0.0.1:{port} ({len(MockPMCHandler.pages)} articles, "
+          f"{latency_ms} ms latency, {error_rate:.0%} errors)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for PMC article pages")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Delay before each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--csv", default="data/publicaciones.csv", help="Publications the pages are built from")
+    parser.add_argument("--pdf-landing-rate", type=float, default=0.1,
+                        help="Fraction of ids whose /pdf/ answers with a landing page (citation_pdf_url)")
+    parser.add_argument("--pdf-blocked-rate", type=float, default=0.05,
+                        help="Fraction of ids whose /pdf/ answers with a page only a browser gets past")
+    args = parser.parse_args()
+    serve(args.port, args.latency_ms, args.error_rate, args.csv, args.pdf_landing_rate, args.pdf_blocked_rate)
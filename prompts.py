@@ -0,0 +1,188 @@
+"""
+Prompt templates and generation settings for the per-paper LLM tasks
+
+Kept apart from the app so the templates can be hashed: llm_cache keys every
+stored result on the hash of the template + settings that produced it, so
+editing anything here invalidates the cached outputs of that task.
+"""
+
+import json
+import re
+
+from llm_cache import template_hash
+
+GROQ_MODEL = 'llama-3.3-70b-versatile'
+
+SUMMARY_MAX_CHARS = 2500
+SUMMARY_TEMPERATURE = 0.4
+SUMMARY_MAX_TOKENS = 600
+
+ENTITIES_MAX_CHARS = 1500
+ENTITIES_TEMPERATURE = 0.1
+ENTITIES_MAX_TOKENS = 300
+
+SUMMARY_PROMPTS = {
+    "academic": """You are an expert in NASA space bioscience.
+
+Title: {title}
+
+Abstract: {text}
+
+Summarize this scientific publication in 3 key points:
+1. Methodology and experimental design
+2. Main results with specific data
+3. Implications for space exploration
+
+Use precise scientific terminology. Each point: 2-3 sentences.""",
+    "outreach": """You are a science communicator specializing in space.
+
+Title: {title}
+
+Abstract: {text}
+
+Explain this space research for high school students in 3 simple points:
+1. What experiment was done? (as if explaining to a friend)
+2. What did they discover? (with everyday examples)
+3. Why is it important for space travel?
+
+Use simple language, analogies, and avoid technical jargon.""",
+}
+
+ENTITIES_PROMPT = """Analyze this scientific text about space biology.
+
+Title: {title}
+
+Text: {text}
+
+Extract in JSON format:
+- "organism": Organism studied
+- "condition": Space condition (microgravity, radiation, etc.)
+- "key_finding": Main finding (max 15 words)
+- "methodology": Method used
+
+If info is missing, use "Not specified".
+Respond ONLY with JSON, no markdown."""
+
+# One completion for both tasks (LLM_CALL_MODE=combined): the abstract is sent
+# once, with the summary truncation, and the answer is a JSON object
+COMBINED_TEMPERATURE = 0.3
+COMBINED_MAX_TOKENS = SUMMARY_MAX_TOKENS + ENTITIES_MAX_TOKENS
+SUMMARY_MAX_POINTS = 5
+
+COMBINED_PROMPTS = {
+    "academic": """You are an expert in NASA space bioscience.
+
+Title: {title}
+
+Abstract: {text}
+
+Return a JSON object with two keys:
+"summary": a list of 3 strings summarizing this scientific publication:
+1. Methodology and experimental design
+2. Main results with specific data
+3. Implications for space exploration
+Use precise scientific terminology. Each point: 2-3 sentences.
+"entities": an object with
+- "organism": Organism studied
+- "condition": Space condition (microgravity, radiation, etc.)
+- "key_finding": Main finding (max 15 words)
+- "methodology": Method used
+If info is missing, use "Not specified".
+
+Respond ONLY with JSON, no markdown.""",
+    "outreach": """You are a science communicator specializing in space.
+
+Title: {title}
+
+Abstract: {text}
+
+Return a JSON object with two keys:
+"summary": a list of 3 strings explaining this space research for high school students:
+1. What experiment was done? (as if explaining to a friend)
+2. What did they discover? (with everyday examples)
+3. Why is it important for space travel?
+Use simple language, analogies, and avoid technical jargon.
+"entities": an object with
+- "organism": Organism studied
+- "condition": Space condition (microgravity, radiation, etc.)
+- "key_finding": Main finding (max 15 words)
+- "methodology": Method used
+If info is missing, use "Not specified".
+
+Respond ONLY with JSON, no markdown.""",
+}
+
+ENTITY_FIELDS = ["organism", "condition", "key_finding", "methodology"]
+# Placeholder answers that mean "no value" (prompt default, app fallbacks)
+MISSING_ENTITY_VALUES = {"", "N/A", "Not specified", "Not available"}
+
+SUMMARY_TEMPLATE_HASHES = {
+    mode: template_hash(prompt, max_chars=SUMMARY_MAX_CHARS, temperature=SUMMARY_TEMPERATURE,
+                        max_tokens=SUMMARY_MAX_TOKENS)
+    for mode, prompt in SUMMARY_PROMPTS.items()
+}
+ENTITIES_TEMPLATE_HASH = template_hash(ENTITIES_PROMPT, max_chars=ENTITIES_MAX_CHARS,
+                                       temperature=ENTITIES_TEMPERATURE, max_tokens=ENTITIES_MAX_TOKENS)
+COMBINED_TEMPLATE_HASHES = {
+    mode: template_hash(prompt, max_chars=SUMMARY_MAX_CHARS, temperature=COMBINED_TEMPERATURE,
+                        max_tokens=COMBINED_MAX_TOKENS, json_mode=True)
+    for mode, prompt in COMBINED_PROMPTS.items()
+}
+
+
+def truncate(text, max_chars):
+    if len(text) > max_chars:
+        return text[:max_chars] + "..."
+    return text
+
+
+def summary_prompt(text, title, mode="academic"):
+    return SUMMARY_PROMPTS[mode].format(title=title, text=truncate(text, SUMMARY_MAX_CHARS))
+
+
+def entities_prompt(text, title):
+    return ENTITIES_PROMPT.format(title=title, text=truncate(text, ENTITIES_MAX_CHARS))
+
+
+def combined_prompt(text, title, mode="academic"):
+    return COMBINED_PROMPTS[mode].format(title=title, text=truncate(text, SUMMARY_MAX_CHARS))
+
+
+def _load_json(content):
+    """JSON value of a completion, tolerating markdown fences"""
+    return json.loads(content.strip().replace('```json', '').replace('```', '').strip())
+
+
+def _entities_from(value):
+    if not isinstance(value, dict):
+        raise ValueError("Expected a JSON object of entities")
+    return {field: str(value.get(field) or "Not specified").strip() for field in ENTITY_FIELDS}
+
+
+def parse_entities(content):
+    """
+    Entity dict from a completion (markdown fences tolerated, missing fields
+    set to "Not specified"); ValueError when it is not a JSON object.
+    """
+    return _entities_from(_load_json(content))
+
+
+def parse_combined(content):
+    """
+    (summary text, entity dict) from a combined completion.
+
+    Raises ValueError unless "summary" is a list of 1-5 non-empty strings (or
+    one string) and "entities" an object; the points are numbered "1. ...".
+    """
+    data = _load_json(content)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object with summary and entities")
+    points = data.get("summary")
+    if isinstance(points, str):
+        points = [points]
+    if (not isinstance(points, list) or not 1 <= len(points) <= SUMMARY_MAX_POINTS
+            or not all(isinstance(p, str) and p.strip() for p in points)):
+        raise ValueError(f"Expected 'summary' to be a list of 1-{SUMMARY_MAX_POINTS} strings")
+    points = [re.sub(r'^\s*\d+[.)]\s*', '', p.strip()) for p in points]
+    summary = "\n\n".join(f"{i}. {point}" for i, point in enumerate(points, 1))
+    return summary, _entities_from(data.get("entities"))
@@ -0,0 +1,109 @@
+"""
+Bounded LRU cache of query embeddings
+
+Sits in front of SentenceTransformer.encode so repeated searches and chat
+questions (and the example buttons) skip the transformer. Keys are the model
+name plus the normalized query text; one instance is shared by every session
+(the app wraps it in st.cache_resource), so access is guarded by a lock.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+QUERY_CACHE_SIZE = 2048
+
+
+def normalize_query(text):
+    """
+    Case- and whitespace-insensitive cache key for a query.
+
+    all-MiniLM-L6-v2 has an uncased tokenizer, so the normalized text is also
+    what gets encoded.
+    """
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of read-only query embeddings with hit/miss counters"""
+
+    def __init__(self, model, model_name, max_size=QUERY_CACHE_SIZE):
+        self.model = model
+        self.model_name = model_name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, query):
+        return (self.model_name, normalize_query(query))
+
+    def get(self, query):
+        """Embedding of `query` (unit-norm float32), encoding it on a miss"""
+        key = self._key(query)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            self.misses += 1
+
+        # Encode outside the lock so other sessions are not blocked
+        embedding = self.model.encode(key[1], convert_to_tensor=False, normalize_embeddings=True)
+        embedding.setflags(write=False)
+        self._put(key, embedding)
+        return embedding
+
+    def _put(self, key, embedding):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_many(self, queries):
+        """(n, d) embeddings of `queries`, encoding all misses in one batch"""
+        keys = [self._key(q) for q in queries]
+        with self._lock:
+            found = {key: self._entries[key] for key in keys if key in self._entries}
+            for key in found:
+                self._entries.move_to_end(key)
+            self.hits += sum(key in found for key in keys)
+            self.misses += sum(key not in found for key in keys)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            embeddings = self.model.encode([key[1] for key in missing], convert_to_tensor=False,
+                                           normalize_embeddings=True)
+            for key, embedding in zip(missing, embeddings):
+                embedding.setflags(write=False)
+                found[key] = embedding
+                self._put(key, embedding)
+        return np.stack([found[key] for key in keys])
+
+    def warm(self, queries):
+        """Pre-encode queries in one batch (not counted as hits or misses)"""
+        pending = [q for q in queries if self._key(q) not in self._entries]
+        if not pending:
+            return
+        texts = [normalize_query(q) for q in pending]
+        embeddings = self.model.encode(texts, convert_to_tensor=False, normalize_embeddings=True)
+        for query, embedding in zip(pending, embeddings):
+            embedding.setflags(write=False)
+            self._put(self._key(query), embedding)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
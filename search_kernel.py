@@ -0,0 +1,451 @@
+"""
+Search kernel for the corpus embeddings.
+
+The embedding matrix is loaded once as a C-contiguous float32 array with
+unit-norm rows, so cosine similarity becomes a single matrix product and the
+top-k rows are selected with argpartition plus a sort of only k elements.
+
+For large corpora an optional HNSW graph (built by create_index.py, requires
+`hnswlib`) can be saved next to the .npy file; load_index() picks it up when
+present and falls back to the exact FlatIndex otherwise.
+
+Int8Index keeps a per-dimension scalar-quantized copy of the matrix in RAM
+(4x smaller) and rescores a shortlist against the float32 rows, which can stay
+on an mmap. ivfpq_index.IVFPQIndex compresses further (~30x) for archives.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from incremental_embeddings import embeddings_digest, stored_digest
+
+try:
+    import hnswlib
+except ImportError:  # HNSW is optional; exact search always works
+    hnswlib = None
+
+# Maximum deviation from 1.0 accepted for a row norm before re-normalizing
+NORM_TOLERANCE = 1e-3
+# Rows whose norms are computed at a time (no full-size temporary, mmap friendly)
+NORM_CHECK_CHUNK = 65536
+
+
+def row_norms(embeddings):
+    """L2 norm of every row, computed block by block"""
+    norms = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), NORM_CHECK_CHUNK):
+        block = embeddings[start:start + NORM_CHECK_CHUNK]
+        norms[start:start + len(block)] = np.sqrt(np.einsum("ij,ij->i", block, block))
+    return norms
+
+
+def prepare_embeddings(embeddings, normalize=True):
+    """Return embeddings as contiguous float32 with unit-norm rows"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2:
+        raise ValueError(f"Expected a 2-D embedding matrix, got shape {embeddings.shape}")
+
+    norms = row_norms(embeddings)
+    if np.all(np.abs(norms - 1.0) <= NORM_TOLERANCE):
+        return embeddings
+
+    if not normalize:
+        raise ValueError("Embeddings are not unit-norm; regenerate them with create_embeddings.py")
+
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(embeddings / norms[:, None], dtype=np.float32)
+
+
+def load_embeddings(path, normalize=True, mmap=False):
+    """
+    Load an .npy embedding matrix ready for inner-product search. With
+    mmap=True a unit-norm float32 matrix stays on a read-only memory map.
+    """
+    return prepare_embeddings(np.load(path, mmap_mode="r" if mmap else None), normalize=normalize)
+
+
+def normalize_queries(queries):
+    """Return queries as a 2-D float32 array with unit-norm rows"""
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return queries / norms
+
+
+def top_k(scores, k):
+    """
+    Select the k highest scores along the last axis, best first.
+
+    Returns (indices, scores) with the same leading shape as `scores`.
+    """
+    n = scores.shape[-1]
+    k = min(int(k), n)
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+        return empty, np.empty(empty.shape, dtype=scores.dtype)
+
+    if k < n:
+        candidates = np.argpartition(scores, n - k, axis=-1)[..., n - k:]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    indices = np.take_along_axis(candidates, order, axis=-1)
+    return indices, np.take_along_axis(candidate_scores, order, axis=-1)
+
+
+class FlatIndex:
+    """Exact cosine-similarity index over a unit-norm embedding matrix"""
+
+    def __init__(self, embeddings, normalize=True):
+        self.embeddings = prepare_embeddings(embeddings, normalize=normalize)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    @property
+    def dimension(self):
+        return self.embeddings.shape[1]
+
+    def search(self, queries, k=5):
+        """
+        Score queries (1-D or 2-D) against the corpus with one matmul.
+
+        Returns (indices, scores), each of shape (n_queries, k).
+        """
+        queries = normalize_queries(queries)
+        scores = queries @ self.embeddings.T
+        return top_k(scores, k)
+
+
+# ============================================================================
+# APPROXIMATE INDEX (HNSW)
+# ============================================================================
+
+HNSW_DEFAULT_M = 16
+HNSW_DEFAULT_EF_CONSTRUCTION = 200
+HNSW_DEFAULT_EF_SEARCH = 64
+
+
+def hnsw_index_paths(embeddings_path):
+    """Graph file and JSON sidecar stored beside the .npy matrix"""
+    base, _ = os.path.splitext(embeddings_path)
+    return f"{base}.hnsw", f"{base}.hnsw.json"
+
+
+class HNSWIndex:
+    """Approximate cosine-similarity index backed by an hnswlib graph"""
+
+    def __init__(self, graph, params, ef_search=HNSW_DEFAULT_EF_SEARCH):
+        self.graph = graph
+        self.params = params
+        self.ef_search = ef_search
+
+    @property
+    def digest(self):
+        return self.params.get("embeddings_digest", "")
+
+    def __len__(self):
+        return self.graph.get_current_count()
+
+    @property
+    def dimension(self):
+        return self.params["dimension"]
+
+    @classmethod
+    def build(cls, embeddings, M=HNSW_DEFAULT_M, ef_construction=HNSW_DEFAULT_EF_CONSTRUCTION,
+              ef_search=HNSW_DEFAULT_EF_SEARCH):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for HNSW indexes: pip install hnswlib")
+        embeddings = prepare_embeddings(embeddings)
+        rows, dim = embeddings.shape
+
+        graph = hnswlib.Index(space="ip", dim=dim)
+        graph.init_index(max_elements=rows, M=M, ef_construction=ef_construction)
+        graph.add_items(embeddings, np.arange(rows))
+
+        params = {"dimension": dim, "rows": rows, "M": M, "ef_construction": ef_construction}
+        return cls(graph, params, ef_search=ef_search)
+
+    @classmethod
+    def load(cls, embeddings_path, ef_search=HNSW_DEFAULT_EF_SEARCH):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for HNSW indexes: pip install hnswlib")
+        graph_path, params_path = hnsw_index_paths(embeddings_path)
+        with open(params_path, "r", encoding="utf-8") as f:
+            params = json.load(f)
+
+        graph = hnswlib.Index(space="ip", dim=params["dimension"])
+        graph.load_index(graph_path, max_elements=params["rows"])
+        return cls(graph, params, ef_search=ef_search)
+
+    def save(self, embeddings_path):
+        graph_path, params_path = hnsw_index_paths(embeddings_path)
+        self.graph.save_index(graph_path)
+        self.params["embeddings_digest"] = embeddings_digest(embeddings_path)
+        with open(params_path, "w", encoding="utf-8") as f:
+            json.dump(self.params, f, indent=2)
+
+    def search(self, queries, k=5):
+        """Same contract as FlatIndex.search: (indices, scores) of shape (n_queries, k)"""
+        queries = normalize_queries(queries)
+        k = min(int(k), len(self))
+        # hnswlib needs ef >= k to return k neighbours
+        self.graph.set_ef(max(self.ef_search, k))
+        labels, distances = self.graph.knn_query(queries, k=k)
+        # 'ip' space reports 1 - <q, x>
+        return labels.astype(np.int64), (1.0 - distances).astype(np.float32)
+
+
+# ============================================================================
+# INT8 SCALAR QUANTIZATION
+# ============================================================================
+
+INT8_RESCORE_FACTOR = 4
+# Rows converted to float32 at a time while scoring the int8 matrix
+INT8_SCORE_CHUNK = 16384
+
+
+def int8_index_path(embeddings_path):
+    """Quantized codes + per-dimension scale/offset stored beside the .npy matrix"""
+    base, _ = os.path.splitext(embeddings_path)
+    return f"{base}.int8.npz"
+
+
+def quantize_embeddings(embeddings):
+    """
+    Per-dimension affine int8 quantization: x ~= codes * scale + offset.
+
+    Returns (codes int8, scale float32, offset float32).
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    low, high = embeddings.min(axis=0), embeddings.max(axis=0)
+    offset = (high + low) / 2
+    scale = (high - low) / 254
+    scale[scale == 0] = 1.0
+
+    codes = np.empty(embeddings.shape, dtype=np.int8)
+    for start in range(0, len(embeddings), INT8_SCORE_CHUNK):
+        block = embeddings[start:start + INT8_SCORE_CHUNK]
+        codes[start:start + len(block)] = np.clip(np.rint((block - offset) / scale), -127, 127)
+    return codes, scale.astype(np.float32), offset.astype(np.float32)
+
+
+# Rows gathered at a time by restricted (pre-filtered) scans
+SUBSET_SCAN_CHUNK = 8192
+# Pre-filters keeping at most this fraction of the rows gather and scan just
+# those rows; wider ones score the whole index and mask out the rest
+SUBSET_SCAN_MAX_FRACTION = 0.01
+# Candidates asked from an approximate index per hit expected to pass the filter
+FILTER_OVERSAMPLE = 2
+
+
+def search_rows(embeddings, queries, rows, k=5):
+    """
+    Exact top-k restricted to `rows` (sorted row ids), scanned in chunks so
+    the gathered slice of the matrix stays small.
+
+    Returns (indices, scores) of shape (n_queries, min(k, len(rows))).
+    """
+    queries = normalize_queries(queries)
+    scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+    for start in range(0, len(rows), SUBSET_SCAN_CHUNK):
+        chunk = rows[start:start + SUBSET_SCAN_CHUNK]
+        scores[:, start:start + len(chunk)] = queries @ embeddings[chunk].T
+    best, best_scores = top_k(scores, k)
+    return np.asarray(rows)[best], best_scores
+
+
+def search_filtered(index, embeddings, queries, allowed, k=5):
+    """
+    Top-k restricted to the rows set in the boolean bitmap `allowed`.
+
+    Narrow filters are answered by search_rows. Wider ones score every row
+    (FlatIndex) or ask an approximate index for enough neighbours that k of
+    them should pass the filter, then mask; queries left short fall back to
+    search_rows. Returns (indices, scores) of shape
+    (n_queries, min(k, allowed rows)), -1 slots where nothing was found.
+    """
+    queries = normalize_queries(queries)
+    rows = np.flatnonzero(allowed)
+    k = min(int(k), len(rows))
+    selectivity = len(rows) / len(allowed)
+    if selectivity <= SUBSET_SCAN_MAX_FRACTION:
+        return search_rows(embeddings, queries, rows, k)
+
+    if isinstance(index, FlatIndex):
+        scores = queries @ index.embeddings.T
+        scores[:, ~allowed] = -np.inf
+        return top_k(scores, k)
+
+    n_candidates = min(len(index), int(np.ceil(k * FILTER_OVERSAMPLE / selectivity)))
+    candidates, candidate_scores = index.search(queries, n_candidates)
+    indices = np.full((len(queries), k), -1, dtype=np.int64)
+    scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    for qi, (hits, hit_scores) in enumerate(zip(candidates, candidate_scores)):
+        keep = (hits >= 0) & allowed[np.maximum(hits, 0)]
+        hits, hit_scores = hits[keep][:k], hit_scores[keep][:k]
+        if len(hits) < k:
+            # The filter removed too many approximate neighbours
+            hits, hit_scores = search_rows(embeddings, queries[qi], rows, k)
+            hits, hit_scores = hits[0], hit_scores[0]
+        indices[qi, :len(hits)] = hits
+        scores[qi, :len(hits)] = hit_scores
+    return indices, scores
+
+
+def rescore(embeddings, queries, shortlist, k):
+    """
+    Exact top-k of each query among its shortlisted rows (-1 entries ignored).
+
+    Only the shortlisted float32 rows are read, so `embeddings` can be an mmap.
+    """
+    indices = np.full((len(queries), k), -1, dtype=np.int64)
+    scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    for qi, (query, rows) in enumerate(zip(queries, shortlist)):
+        rows = np.sort(rows[rows >= 0])  # sequential reads from the mmap
+        best, best_scores = top_k(embeddings[rows] @ query, k)
+        indices[qi, :len(best)] = rows[best]
+        scores[qi, :len(best)] = best_scores
+    return indices, scores
+
+
+class Int8Index:
+    """
+    Scores the int8 matrix first, then rescores the best `k * rescore_factor`
+    rows exactly against the float32 embeddings.
+    """
+
+    def __init__(self, codes, scale, offset, embeddings, rescore_factor=INT8_RESCORE_FACTOR):
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.embeddings = embeddings
+        self.rescore_factor = rescore_factor
+        self.digest = ""
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def dimension(self):
+        return self.codes.shape[1]
+
+    @classmethod
+    def build(cls, embeddings, rescore_factor=INT8_RESCORE_FACTOR):
+        codes, scale, offset = quantize_embeddings(embeddings)
+        return cls(codes, scale, offset, embeddings, rescore_factor=rescore_factor)
+
+    @classmethod
+    def load(cls, embeddings_path, embeddings, rescore_factor=INT8_RESCORE_FACTOR):
+        with np.load(int8_index_path(embeddings_path)) as data:
+            index = cls(data["codes"], data["scale"], data["offset"], embeddings, rescore_factor=rescore_factor)
+            index.digest = stored_digest(data)
+        return index
+
+    def save(self, embeddings_path):
+        self.digest = embeddings_digest(embeddings_path)
+        np.savez(int8_index_path(embeddings_path), codes=self.codes, scale=self.scale, offset=self.offset,
+                 digest=self.digest)
+
+    def approximate_scores(self, queries):
+        """<q, codes * scale + offset> for every row, without a float copy of the matrix"""
+        weighted = queries * self.scale
+        bias = queries @ self.offset
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), INT8_SCORE_CHUNK):
+            block = self.codes[start:start + INT8_SCORE_CHUNK].astype(np.float32)
+            scores[:, start:start + len(block)] = weighted @ block.T
+        scores += bias[:, None]
+        return scores
+
+    def search(self, queries, k=5):
+        """Same contract as FlatIndex.search: (indices, scores) of shape (n_queries, k)"""
+        queries = normalize_queries(queries)
+        shortlist, _ = top_k(self.approximate_scores(queries), k * self.rescore_factor)
+        return rescore(self.embeddings, queries, shortlist, k)
+
+
+# ============================================================================
+# INDEX SELECTION AND EVALUATION
+# ============================================================================
+
+INDEX_KINDS = ('auto', 'flat', 'hnsw', 'int8', 'ivfpq')
+
+
+def _usable(index, embeddings, path, builder, digest):
+    """Built from this very matrix: same shape and same embeddings_digest"""
+    if len(index) == len(embeddings) and index.dimension == embeddings.shape[1] and index.digest == digest:
+        return True
+    print(f"⚠️ Ignoring stale index {path}: rebuild it with {builder}")
+    return False
+
+
+def load_index(embeddings_path, embeddings, kind='auto', ef_search=HNSW_DEFAULT_EF_SEARCH, nprobe=None):
+    """
+    Return the index saved beside `embeddings_path` for `kind`.
+
+    'auto' prefers HNSW, then IVF-PQ, then int8, and falls back to an exact
+    FlatIndex over `embeddings` when no usable index file exists.
+    """
+    # Imported here: ivfpq_index builds on the helpers of this module
+    from ivfpq_index import IVFPQIndex, ivfpq_index_path
+
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind '{kind}', expected one of {INDEX_KINDS}")
+    digest = embeddings_digest(embeddings_path)
+
+    graph_path, params_path = hnsw_index_paths(embeddings_path)
+    if kind in ('auto', 'hnsw') and hnswlib is not None and os.path.exists(graph_path) \
+            and os.path.exists(params_path):
+        index = HNSWIndex.load(embeddings_path, ef_search=ef_search)
+        if _usable(index, embeddings, graph_path, "create_index.py", digest):
+            return index
+
+    ivfpq_path = ivfpq_index_path(embeddings_path)
+    if kind in ('auto', 'ivfpq') and os.path.exists(ivfpq_path):
+        index = IVFPQIndex.load(embeddings_path, nprobe=nprobe, embeddings=embeddings)
+        if _usable(index, embeddings, ivfpq_path, "create_index.py --type ivfpq", digest):
+            return index
+
+    int8_path = int8_index_path(embeddings_path)
+    if kind in ('auto', 'int8') and os.path.exists(int8_path):
+        index = Int8Index.load(embeddings_path, embeddings)
+        if _usable(index, embeddings, int8_path, "create_embeddings.py --int8", digest):
+            return index
+
+    if kind not in ('auto', 'flat'):
+        print(f"⚠️ No usable '{kind}' index found, using exact search")
+    return FlatIndex(embeddings)
+
+
+def sample_queries(embeddings, n_queries, seed=0):
+    """Synthetic queries: corpus rows plus gaussian noise"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+    noise = rng.standard_normal((len(rows), embeddings.shape[1])).astype(np.float32) * 0.05
+    return embeddings[rows] + noise
+
+
+def recall_at_k(index, reference, queries, k=10):
+    """
+    Mean fraction of the exact top-k recovered by `index`, plus the mean
+    latency per query (ms) of both indexes.
+    """
+    queries = normalize_queries(queries)
+
+    def run(idx):
+        # One query at a time, as the app issues them
+        start = time.perf_counter()
+        found = np.concatenate([idx.search(q, k)[0] for q in queries])
+        return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+    exact, reference_ms = run(reference)
+    approx, index_ms = run(index)
+
+    hits = sum(len(np.intersect1d(e, a)) for e, a in zip(exact, approx))
+    return hits / exact.size, index_ms, reference_ms
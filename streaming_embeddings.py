@@ -0,0 +1,206 @@
+"""
+Streaming, multi-process embedding build
+
+For corpora too large to encode in one call. The CSV is read in blocks of
+`block_rows` rows and never held whole, and the matrix is written straight
+into a preallocated .npy memmap (<base>.partial.npy) that replaces the real
+file at the end, so peak memory stays at a few blocks whatever the corpus
+size.
+
+Encoding is sharded across a pool of worker processes, each with its own
+copy of the model and an equal share of the cores. At most
+BLOCKS_IN_FLIGHT_PER_WORKER blocks per worker are queued, so the reader
+never runs far ahead of the encoders.
+
+It is incremental in the same way as incremental_embeddings: rows whose text
+digest is in the sidecar are copied from the old matrix and only the rest go
+to the pool. After every block the memmap is flushed and the block recorded
+in <base>.partial.json, so an interrupted run resumes from the blocks already
+done as long as the CSV and the model are unchanged.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from incremental_embeddings import (embedding_texts, match_rows, open_previous, remove_row_hashes, save_row_hashes,
+                                    text_digests)
+
+BLOCK_ROWS = 4096
+ENCODE_BATCH_SIZE = 32
+BLOCKS_IN_FLIGHT_PER_WORKER = 2
+
+# The model of a worker process, loaded once by _init_worker
+_model = None
+
+
+def partial_paths(embeddings_path):
+    """Matrix being built and its checkpoint, beside the .npy matrix"""
+    base, _ = os.path.splitext(embeddings_path)
+    return f"{base}.partial.npy", f"{base}.partial.json"
+
+
+def _init_worker(model_name, threads):
+    global _model
+    # Ctrl+C reaches the whole process group: only the parent handles it,
+    # and it shuts the pool down after the blocks being encoded
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        import torch
+        torch.set_num_threads(threads)  # workers share the cores instead of each using all of them
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _model = SentenceTransformer(model_name)
+
+
+def _dimension():
+    return _model.get_sentence_embedding_dimension()
+
+
+def _encode(texts, batch_size):
+    vectors = _model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def read_blocks(csv_path, block_rows=BLOCK_ROWS):
+    """embedding_texts of consecutive `block_rows`-row blocks of the CSV"""
+    for chunk in pd.read_csv(csv_path, usecols=['title', 'abstract_text'], chunksize=block_rows):
+        yield embedding_texts(chunk)
+
+
+def csv_digests(csv_path, block_rows=BLOCK_ROWS):
+    """Text digest of every row of the CSV, read block by block"""
+    parts = [text_digests(texts) for texts in read_blocks(csv_path, block_rows)]
+    return np.concatenate(parts) if parts else text_digests([])
+
+
+def _load_checkpoint(path, expected):
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if any(state.get(key) != value for key, value in expected.items()):
+        return None
+    return state
+
+
+def _save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _fill(csv_path, partial_path, checkpoint_path, model_name, digests, source, old, executor, dimension,
+          block_rows, batch_size, in_flight, on_progress):
+    """Write every block into the partial matrix; returns how many blocks were already done"""
+    expected = {
+        'model': model_name,
+        'rows': len(digests),
+        'dimension': dimension,
+        'block_rows': block_rows,
+        'digests': hashlib.sha256(digests.tobytes()).hexdigest(),
+    }
+    state = _load_checkpoint(checkpoint_path, expected) if os.path.exists(partial_path) else None
+    if state is None:
+        out = np.lib.format.open_memmap(partial_path, mode='w+', dtype=np.float32, shape=(len(digests), dimension))
+        state = {**expected, 'done': []}
+        _save_checkpoint(checkpoint_path, state)
+    else:
+        out = np.lib.format.open_memmap(partial_path, mode='r+')
+    done = set(state['done'])
+    resumed = len(done)
+    total = -(-len(digests) // block_rows)
+
+    def mark_done(block):
+        out.flush()
+        done.add(block)
+        state['done'] = sorted(done)
+        _save_checkpoint(checkpoint_path, state)
+        if on_progress is not None:
+            on_progress(len(done), total)
+
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            block, positions = pending.pop(future)
+            out[positions] = future.result()
+            mark_done(block)
+
+    for block, texts in enumerate(read_blocks(csv_path, block_rows)):
+        if block in done:
+            continue
+        positions = np.arange(block * block_rows, block * block_rows + len(texts))
+        rows = source[positions]
+        if old is not None and (rows >= 0).any():
+            out[positions[rows >= 0]] = old[rows[rows >= 0]]
+        missing = np.flatnonzero(rows < 0)
+        if len(missing) == 0:
+            mark_done(block)
+            continue
+        future = executor.submit(_encode, [texts[i] for i in missing], batch_size)
+        pending[future] = (block, positions[missing])
+        while len(pending) >= in_flight:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+    while pending:
+        collect(wait(pending, return_when=FIRST_COMPLETED).done)
+    out.flush()
+    return resumed
+
+
+def stream_embeddings(csv_path, embeddings_path, model_name, workers=None, block_rows=BLOCK_ROWS,
+                      batch_size=ENCODE_BATCH_SIZE, full=False, on_progress=None):
+    """
+    Build the embedding matrix of the CSV at `csv_path` into `embeddings_path`
+    (and its sidecar) with `workers` encoding processes (default: one per
+    core). on_progress(blocks done, total blocks) is called after each block.
+    Returns counts of 'rows', 'reused', 'encoded', 'dropped' rows and of
+    'resumed' blocks.
+    """
+    workers = workers or os.cpu_count() or 1
+    digests = csv_digests(csv_path, block_rows)
+    old, old_digests = open_previous(embeddings_path, model_name) if not full else (None, None)
+    source = match_rows(old_digests, digests) if old is not None else np.full(len(digests), -1, dtype=np.int64)
+    encoded = int(np.count_nonzero(source < 0))
+    counts = {
+        'rows': len(digests),
+        'reused': len(digests) - encoded,
+        'encoded': encoded,
+        'dropped': int(np.count_nonzero(~np.isin(old_digests, digests))) if old is not None else 0,
+    }
+
+    partial_path, checkpoint_path = partial_paths(embeddings_path)
+    executor = None
+    try:
+        if encoded:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # spawn: torch and fork do not mix, and it is the only start method on Windows
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_worker, initargs=(model_name, threads))
+        if old is not None:
+            dimension = old.shape[1]
+        else:
+            dimension = executor.submit(_dimension).result() if executor is not None else 0
+        counts['resumed'] = _fill(csv_path, partial_path, checkpoint_path, model_name, digests, source, old, executor,
+                                  dimension, block_rows, batch_size, workers * BLOCKS_IN_FLIGHT_PER_WORKER,
+                                  on_progress)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    # The old matrix must be unmapped before it is replaced (Windows refuses otherwise)
+    del old
+    remove_row_hashes(embeddings_path)
+    os.replace(partial_path, embeddings_path)
+    save_row_hashes(embeddings_path, digests, model_name)
+    os.remove(checkpoint_path)
+    return counts
@@ -0,0 +1,82 @@
+import pytest
+
+from conversation_memory import ConversationMemory
+
+PREVIOUS_RESULTS = [{'title': 'Bone loss in mice after spaceflight',
+                     'abstract_text': 'Mice flown aboard the ISS lost trabecular bone.',
+                     'similarity_score': 0.62}]
+
+STANDALONE_QUESTIONS = [
+    "Why do astronauts lose bone mass?",
+    "Which studies show that spaceflight causes bone loss?",
+    "What is microgravity and how does it affect cells?",
+    "Effects of spaceflight on mice and their immune system",
+    "How does radiation exposure change gene expression in plants?",
+    "Do these cells recover after returning to Earth?",
+]
+
+FOLLOW_UPS = [
+    "What did paper 2 measure?",
+    "Summarize the above",
+    "What did those studies find?",
+    "Why?",
+    "How so?",
+    "Tell me more",
+    "And what about them?",
+    "What about the second study?",
+    "Was the first paper done on the ISS?",
+    "Which methods did you mention?",
+]
+
+
+@pytest.fixture
+def memory():
+    memory = ConversationMemory()
+    memory.add_turn("How does spaceflight affect bone?", "Mice lose bone in orbit.", [], PREVIOUS_RESULTS)
+    return memory
+
+
+def fresh_results(question, score):
+    """A fresh search whose top hit repeats the question's words"""
+    return [{'title': question, 'abstract_text': '', 'similarity_score': score}]
+
+
+@pytest.mark.parametrize("question", STANDALONE_QUESTIONS)
+def test_standalone_questions_are_not_follow_ups(memory, question):
+    assert not memory.is_follow_up(question)
+    assert not memory.is_follow_up(question, fresh_results=fresh_results(question, 0.55))
+
+
+@pytest.mark.parametrize("question", FOLLOW_UPS)
+def test_explicit_references_are_follow_ups(memory, question):
+    assert memory.is_follow_up(question)
+
+
+def test_question_a_fresh_search_barely_matches_is_a_follow_up(memory):
+    unrelated = [{'title': 'Plant root growth in microgravity', 'abstract_text': 'Roots grew randomly.',
+                  'similarity_score': 0.12}]
+    assert memory.is_follow_up("Was it significant?", fresh_results=unrelated)
+    assert memory.is_follow_up("Was it significant?", fresh_results=[])
+
+
+def test_question_a_fresh_search_matches_is_not_a_follow_up(memory):
+    related = [{'title': 'Significant bone loss in astronauts', 'abstract_text': '',
+                'similarity_score': 0.18}]
+    assert not memory.is_follow_up("Was the bone loss significant?", fresh_results=related)
+
+
+@pytest.mark.parametrize("question", ["And what about rats?", "How about plants grown on the ISS?"])
+def test_what_about_a_new_topic_is_searched_again(memory, question):
+    assert not memory.is_follow_up(question)
+    assert not memory.is_follow_up(question, fresh_results=fresh_results(question, 0.45))
+
+
+def test_long_questions_are_searched_again(memory):
+    question = "Was it significant for the crew members on long missions to the station and beyond?"
+    assert not memory.is_follow_up(question, fresh_results=[])
+
+
+def test_nothing_to_follow_up_without_previous_results():
+    memory = ConversationMemory()
+    assert not memory.is_follow_up("What did paper 2 measure?")
+    assert not memory.is_follow_up("Why?")
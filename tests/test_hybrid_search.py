@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from corpus_store import KEYWORD, SIMILARITY, CorpusStore
+from facet_index import FacetIndex
+from lexical_index import BM25Index
+from search_kernel import FlatIndex, prepare_embeddings
+
+N_DOCS = 600
+DIMENSION = 16
+
+
+@pytest.fixture(scope="module")
+def store():
+    rng = np.random.default_rng(0)
+    vocabulary = [f"w{i}" for i in range(300)]
+    abstracts = [" ".join(rng.choice(vocabulary, size=20)) for _ in range(N_DOCS)]
+    for row in (3, 7, 11):
+        abstracts[row] += " CDKN1a"
+    abstracts[42] += " Mice in the Bion-M 1 mission"
+    for row in range(100, 110):
+        abstracts[row] += " Bion-M 2 launch"
+    for row in range(200, 400):
+        abstracts[row] += " microgravity"
+
+    metadata = pd.DataFrame({'title': [f"t{i}" for i in range(N_DOCS)], 'authors': ['A'] * N_DOCS,
+                             'year': rng.integers(2000, 2020, N_DOCS), 'source_url': ['u'] * N_DOCS})
+    embeddings = prepare_embeddings(rng.standard_normal((N_DOCS, DIMENSION)).astype(np.float32))
+    lexical = BM25Index.build(f"{metadata['title'].iat[i]} {abstracts[i]}" for i in range(N_DOCS))
+    return CorpusStore(metadata, embeddings, FlatIndex(embeddings), np.array(abstracts, dtype=object), 'test',
+                       lexical=lexical, facets=FacetIndex.build(metadata))
+
+
+class Encoder:
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
+
+    def __call__(self, query):
+        self.calls.append(query)
+        return self.store.embeddings[0]
+
+
+def test_rare_term_skips_the_encoder_even_below_top_k(store):
+    encode = Encoder(store)
+    hits = store.hybrid_search("CDKN1a", 5, encode)
+    assert encode.calls == []
+    assert sorted(row for row, _, _ in hits) == [3, 7, 11]
+    assert all(kind == KEYWORD for _, _, kind in hits)
+
+
+def test_identifier_with_single_character_tokens_matches_exactly(store):
+    encode = Encoder(store)
+    hits = store.hybrid_search("Bion-M 1", 5, encode)
+    assert encode.calls == []
+    assert hits[0][0] == 42
+
+
+def test_common_term_runs_the_encoder(store):
+    encode = Encoder(store)
+    hits = store.hybrid_search("microgravity", 5, encode)
+    assert encode.calls == ["microgravity"]
+    assert len(hits) == 5 and all(kind == SIMILARITY for _, _, kind in hits)
+
+
+def test_decisive_match_respects_filters(store):
+    encode = Encoder(store)
+    year = int(store.metadata['year'].iat[7])
+    hits = store.hybrid_search("CDKN1a", 5, encode, filters={'year': [year]})
+    assert encode.calls == []
+    assert 7 in [row for row, _, _ in hits]
+    assert all(int(store.metadata['year'].iat[row]) == year for row, _, _ in hits)
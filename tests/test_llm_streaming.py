@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+from groq import Groq
+
+from llm_gateway import LLMGateway
+from mock_groq_server import make_server, mock_completion, tokenize
+
+FIRST_TOKEN_MS = 100
+TOKEN_MS = 10
+MESSAGES = [{'role': 'user', 'content': "Title: Bone loss in mice\nSummarize it."}]
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = make_server(0, FIRST_TOKEN_MS, TOKEN_MS)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gateway(server):
+    client = Groq(api_key='mock', base_url=f"http://127.0.0.1:{server.server_address[1]}", max_retries=0)
+    return LLMGateway(client)
+
+
+def wait_for_outcomes(server, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while len(server.outcomes) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server.outcomes[:count]
+
+
+def test_deltas_arrive_in_order_and_rebuild_the_completion(server, gateway):
+    server.outcomes.clear()
+    with gateway.stream(model='mock', messages=MESSAGES, max_tokens=40) as chunks:
+        deltas = list(chunks)
+    assert deltas == tokenize(mock_completion(MESSAGES, 40))
+    assert wait_for_outcomes(server, 1) == [True]
+
+
+def test_first_token_arrives_before_the_response_ends(server, gateway):
+    start = time.perf_counter()
+    arrivals = []
+    with gateway.stream(model='mock', messages=MESSAGES, max_tokens=40) as chunks:
+        for _ in chunks:
+            arrivals.append(time.perf_counter() - start)
+    # 40 tokens at TOKEN_MS each come after the first one
+    assert arrivals[-1] - arrivals[0] > 30 * TOKEN_MS / 1000
+    assert arrivals[0] < arrivals[-1] / 2
+
+
+def test_closing_the_iterator_early_closes_the_upstream_request(server, gateway):
+    server.outcomes.clear()
+    chunks = gateway.stream(model='mock', messages=MESSAGES, max_tokens=200)
+    assert next(chunks)
+    chunks.close()
+    assert wait_for_outcomes(server, 1) == [False]
+
+
+def test_upstream_stays_open_while_a_coalesced_caller_reads(server, gateway):
+    server.outcomes.clear()
+    first = gateway.stream(model='mock', messages=MESSAGES, max_tokens=60)
+    second = gateway.stream(model='mock', messages=MESSAGES, max_tokens=60)
+    assert next(first)
+    first.close()
+    with second:
+        text = "".join(second)
+    assert text == mock_completion(MESSAGES, 60)
+    assert wait_for_outcomes(server, 1) == [True]
+    assert gateway.coalesced == 1
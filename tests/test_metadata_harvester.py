@@ -0,0 +1,86 @@
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+import metadata_harvester
+from extract_authors_simple import parse_ncbi_page
+from metadata_harvester import harvest_to_jsonl, load_harvest
+from mock_pmc_server import MockPMCHandler, make_server
+
+N_ARTICLES = 12
+PER_HOST = 2
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata_harvester, 'BACKOFF_SECONDS', 0.01)
+    csv_path = tmp_path / 'publicaciones.csv'
+    pd.DataFrame({
+        'title': [f"Paper {i}" for i in range(N_ARTICLES)],
+        'authors': [f"Author {i}, Coauthor {i}" for i in range(N_ARTICLES)],
+        'year': [2000 + i for i in range(N_ARTICLES)],
+        'source_url': [f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{1000 + i}/" for i in range(N_ARTICLES)],
+        'abstract_text': [f"Abstract of paper {i}" for i in range(N_ARTICLES)],
+    }).to_csv(csv_path, index=False)
+    server = make_server(0, 30, 0.0, str(csv_path))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def urls():
+    return [f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{1000 + i}/" for i in range(N_ARTICLES)]
+
+
+def harvest(server, urls, path, **options):
+    options = dict(concurrency=8, per_host=PER_HOST, rate=0, retries=2,
+                   base_url=f"http://127.0.0.1:{server.server_address[1]}", **options)
+    return harvest_to_jsonl(urls, parse_ncbi_page, str(path), **options)
+
+
+def test_requests_in_flight_stay_within_per_host(server, tmp_path):
+    assert harvest(server, urls(), tmp_path / 'harvest.jsonl') == (N_ARTICLES, 0)
+    assert MockPMCHandler.peak_in_flight == PER_HOST
+
+
+def test_throttled_and_unavailable_pages_are_retried(server, tmp_path):
+    MockPMCHandler.scripted = {'/pmc/articles/PMC1000/': [503], '/pmc/articles/PMC1001/': [429, 503]}
+    path = tmp_path / 'harvest.jsonl'
+    assert harvest(server, urls()[:3], path) == (3, 0)
+    assert MockPMCHandler.hits['/pmc/articles/PMC1000/'] == 2
+    assert MockPMCHandler.hits['/pmc/articles/PMC1001/'] == 3
+    assert load_harvest(path)[urls()[1]]['title'] == "Paper 1"
+
+
+def test_each_result_is_appended_as_it_completes(server, tmp_path):
+    path = tmp_path / 'harvest.jsonl'
+    lines_seen = []
+
+    def on_progress(url, error):
+        with open(path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        lines_seen.append(len(lines))
+        assert lines[-1]['url'] == url
+
+    harvest(server, urls(), path, on_progress=on_progress)
+    assert lines_seen == list(range(1, N_ARTICLES + 1))
+
+
+def test_rerun_skips_recorded_urls_and_retries_failed_ones(server, tmp_path):
+    failing = '/pmc/articles/PMC1003/'
+    MockPMCHandler.scripted = {failing: [503, 503, 503]}
+    path = tmp_path / 'harvest.jsonl'
+    assert harvest(server, urls(), path) == (N_ARTICLES - 1, 1)
+    assert MockPMCHandler.hits[failing] == 3
+
+    done = load_harvest(path)
+    pending = [url for url in urls() if url not in done]
+    assert pending == [urls()[3]]
+    MockPMCHandler.hits.clear()
+    assert harvest(server, pending, path) == (1, 0)
+    assert dict(MockPMCHandler.hits) == {failing: 1}
+    assert len(load_harvest(path)) == N_ARTICLES
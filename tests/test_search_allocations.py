@@ -0,0 +1,54 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from corpus_store import load_corpus_store
+
+N_DOCS = 20_000
+DIMENSION = 384
+N_QUERIES = 30
+TOP_K = 5
+
+
+def unit_rows(rng, rows):
+    block = rng.standard_normal((rows, DIMENSION), dtype=np.float32)
+    return block / np.linalg.norm(block, axis=1, keepdims=True)
+
+
+def test_hybrid_search_allocates_no_corpus_sized_buffer(tmp_path):
+    rng = np.random.default_rng(0)
+    vocabulary = np.array([f"term{i}" for i in range(5000)])
+    csv_path = tmp_path / 'publicaciones.csv'
+    embeddings_path = tmp_path / 'corpus_embeddings.npy'
+    pd.DataFrame({
+        'title': [f"Paper {i}" for i in range(N_DOCS)],
+        'authors': [f"Author {i % 500}" for i in range(N_DOCS)],
+        'year': 2000 + np.arange(N_DOCS) % 25,
+        'source_url': [f"https://example.org/{i}" for i in range(N_DOCS)],
+        'abstract_text': [" ".join(words) for words in rng.choice(vocabulary, size=(N_DOCS, 20))],
+    }).to_csv(csv_path, index=False)
+    np.save(embeddings_path, unit_rows(rng, N_DOCS))
+
+    store = load_corpus_store(str(csv_path), str(embeddings_path), str(tmp_path / 'missing.bundle'),
+                              'synthetic', index_kind='flat')
+    assert not store.embeddings.flags.owndata
+    assert not store.embeddings.flags.writeable
+
+    # Multi-term queries of common words, so the dense side always runs
+    queries = [" ".join(rng.choice(vocabulary, size=4)) for _ in range(N_QUERIES)]
+    vectors = dict(zip(queries, unit_rows(rng, N_QUERIES)))
+    filters = [None, {'year': [2003, 2010]}, {'year': list(range(2000, 2020))}]
+    store.hybrid_search(queries[0], TOP_K, vectors.get)  # warm-up
+
+    tracemalloc.start()
+    try:
+        for i, query in enumerate(queries):
+            hits = store.hybrid_search(query, TOP_K, vectors.get, filters=filters[i % len(filters)])
+            assert len(hits) == TOP_K
+            [store.row(idx) for idx, _, _ in hits]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < store.embeddings.nbytes // 10